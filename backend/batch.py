@@ -0,0 +1,58 @@
+from typing import Dict, List, Optional, Tuple
+
+from query_backends import XSD, query_plan
+
+# Dimensions merged queries must share; the one they may differ in is the year
+MERGE_FILTERS = ["causeName", "measure", "location"]
+
+
+def merge_key(analysis: Dict) -> Optional[Tuple]:
+    """ Questions with the same key differ only in their year and can share one VALUES query """
+    plan = query_plan(analysis)
+    filters = plan["filters"]
+    if "year" not in filters or not all(var in filters for var in MERGE_FILTERS):
+        return None
+    return (plan["aggregation"], tuple(plan["group_by"])) + tuple(
+        tuple(filters[var]) if isinstance(filters[var], list) else filters[var] for var in MERGE_FILTERS)
+
+
+def merge_groups(analyses: List[Dict]) -> List[List[int]]:
+    """ Indices of analyses grouped into mergeable sets; unmergeable ones are groups of one """
+    groups, singles = {}, []
+    for i, analysis in enumerate(analyses):
+        key = merge_key(analysis)
+        if key is None:
+            singles.append([i])
+        else:
+            groups.setdefault(key, []).append(i)
+    return singles + list(groups.values())
+
+
+def merged_analysis(analysis: Dict) -> Dict:
+    """ The analysis without its year filter; aggregates also group by year so rows can be split back """
+    merged = {**analysis, "time_period": None}
+    if merged.get("aggregation") in ["sum", "avg"] and "year" not in merged.get("grouping", []):
+        merged["grouping"] = merged.get("grouping", []) + ["year"]
+    return merged
+
+
+def split_rows(result: Dict, analysis: Dict, year: str, limit: int = 20) -> Dict:
+    """ The rows of a merged result that answer analysis, shaped like its own query's result """
+    if "error" in result:
+        return result
+    plan = query_plan(analysis)
+    keep_year = not plan["aggregation"] or "year" in plan["group_by"]
+    variables = [var for var in result["head"]["vars"] if keep_year or var != "year"]
+
+    bindings = []
+    for binding in result["results"]["bindings"]:
+        if binding.get("year", {}).get("value") != year:
+            continue
+        bindings.append(binding if keep_year else {var: term for var, term in binding.items() if var != "year"})
+        if len(bindings) == limit:
+            break
+
+    if plan["aggregation"] and not plan["group_by"] and not bindings:
+        # SUM/AVG over no records is 0 in SPARQL, an xsd:integer the way GraphDB returns it
+        bindings = [{"value": {"type": "literal", "datatype": XSD + "integer", "value": "0"}}]
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
@@ -0,0 +1,153 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+WARM_CACHE_DB = os.getenv("WARM_CACHE_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_cache.sqlite"))
+
+WARM_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    body TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+
+def analysis_key(analysis: Dict, sparql_query: str) -> str:
+    """ Canonical cache key: differently worded questions with the same analysis and query share it """
+    return json.dumps(analysis, sort_keys=True, ensure_ascii=False) + "\n" + sparql_query
+
+
+class ResultCache:
+    """ Thread-safe LRU cache with a per-entry TTL and hit/miss counters """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Dict):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """ Drop every entry, e.g. after the ingest scripts loaded new data """
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class WarmCache:
+    """ Disk-backed /ask answers precomputed by the warm-up job (scripts/warm_cache.py).
+
+    Keys are analysis_key()s, like ResultCache. The file is only opened on first use and
+    entries are read one key at a time, so the API starts as fast with a large cache as with
+    none; a file the job creates after startup is picked up on the next lookup. Entries expire
+    ttl seconds after they were computed (None keeps them), and invalidate(), which the ingest
+    scripts trigger after loading new data, drops them all at once.
+    """
+
+    def __init__(self, db_path: str = WARM_CACHE_DB, ttl: Optional[float] = None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self, create: bool = False) -> Optional[sqlite3.Connection]:
+        if self._conn is None:
+            if not create and not os.path.exists(self.db_path):
+                return None
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            # the warm-up job writes while API workers read
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(WARM_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _oldest(self) -> float:
+        """ Earliest creation time of an entry that has not expired """
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT body FROM answers WHERE key = ? AND created >= ?",
+                               (key, self._oldest())).fetchone() if conn else None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            conn = self._connection()
+            return conn is not None and conn.execute("SELECT 1 FROM answers WHERE key = ? AND created >= ?",
+                                                     (key, self._oldest())).fetchone() is not None
+
+    def put(self, key: str, value: Dict):
+        body = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            conn = self._connection(create=True)
+            conn.execute("INSERT OR REPLACE INTO answers (key, body, created) VALUES (?, ?, ?)", (key, body, time.time()))
+            conn.commit()
+
+    def invalidate(self):
+        with self._lock:
+            conn = self._connection()
+            if conn is not None:
+                conn.execute("DELETE FROM answers")
+                conn.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connection()
+            size = conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] if conn else 0
+            return {"size": size, "ttl_seconds": self.ttl, "hits": self.hits, "misses": self.misses, "path": self.db_path}
@@ -0,0 +1,89 @@
+import io
+import json
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from query_backends import XSD
+
+COLUMNAR_JSON = "application/vnd.disease-kg.columnar+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+# SPARQL datatype -> column dtype; every other term becomes a string column
+NUMERIC_DATATYPES = {
+    XSD + "float": "float64",
+    XSD + "double": "float64",
+    XSD + "decimal": "float64",
+    XSD + "integer": "int64",
+    XSD + "int": "int64",
+    XSD + "long": "int64",
+    XSD + "gYear": "int64",
+}
+
+
+def _column(cells: List) -> Tuple[str, np.ndarray, Optional[np.ndarray]]:
+    """ One variable's bindings as (type, values, missing mask); numbers are parsed in one numpy call """
+    datatypes = {cell.get("datatype") for cell in cells if cell}
+    kind = NUMERIC_DATATYPES.get(datatypes.pop(), "string") if len(datatypes) == 1 else "string"
+    if kind == "string":
+        values = np.array([cell["value"] if cell else None for cell in cells], dtype=object)
+        missing = values == None  # noqa: E711
+        return kind, values, missing if missing.any() else None
+
+    try:
+        numbers = np.array([cell["value"] if cell else "nan" for cell in cells]).astype("float64")
+    except ValueError:
+        # a malformed lexical value; fall back to per-cell coercion
+        numbers = pd.to_numeric(pd.Series([cell["value"] if cell else None for cell in cells]),
+                                errors="coerce").to_numpy("float64")
+    missing = np.isnan(numbers)
+    if kind == "int64" and not missing.any():
+        numbers = numbers.astype("int64")
+    return kind, numbers, missing if missing.any() else None
+
+
+def _columns(result: Dict) -> Dict[str, Tuple[str, np.ndarray, Optional[np.ndarray]]]:
+    bindings = result["results"]["bindings"]
+    return {var: _column([b.get(var) for b in bindings]) for var in result["head"]["vars"]}
+
+
+def result_frame(result: Dict) -> pd.DataFrame:
+    """ SPARQL JSON results as a DataFrame with one typed column per variable """
+    frame = {}
+    for var, (kind, values, missing) in _columns(result).items():
+        if kind == "string":
+            frame[var] = pd.Series(values, dtype="string")
+        elif kind == "int64":
+            frame[var] = pd.Series(values).astype("Int64")
+        else:
+            frame[var] = pd.Series(values, dtype="float64")
+    return pd.DataFrame(frame, index=pd.RangeIndex(len(result["results"]["bindings"])))
+
+
+def to_columns(result: Dict) -> Dict:
+    """ Column-oriented result: numbers as JSON numbers, missing values (and NaN) as null """
+    columns, types = {}, {}
+    for var, (kind, values, missing) in _columns(result).items():
+        types[var] = kind
+        values = values.tolist()
+        if missing is not None:
+            for i in np.flatnonzero(missing).tolist():
+                values[i] = None
+            if kind == "int64":
+                values = [int(v) if v is not None else None for v in values]
+        columns[var] = values
+    return {"vars": list(columns), "types": types, "columns": columns,
+            "rows": len(result["results"]["bindings"])}
+
+
+def to_arrow_ipc(result: Dict, metadata: Dict = None) -> bytes:
+    """ Arrow IPC stream of the result; metadata (the rest of the /ask body) goes in the schema as JSON """
+    table = pa.Table.from_pandas(result_frame(result), preserve_index=False)
+    table = table.replace_schema_metadata({"ask": json.dumps(metadata or {}, ensure_ascii=False)})
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
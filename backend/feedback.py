@@ -0,0 +1,64 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Dict, Optional
+
+
+class FeedbackJobs:
+    """ Model feedback computed in the background after /ask has already returned its data.
+
+    Jobs are asyncio tasks on the server loop, kept for ttl seconds so clients can poll
+    /ask/feedback/{id}. Beyond max_jobs the oldest are dropped, and cancelled if still running.
+    """
+
+    def __init__(self, max_jobs: int = 1024, ttl: float = 600):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs = OrderedDict()
+        self.submitted = 0
+        self.dropped = 0
+
+    def submit(self, awaitable: Awaitable) -> str:
+        """ Start awaitable in the background; must be called from the event loop """
+        self._expire()
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = (time.monotonic() + self.ttl, asyncio.ensure_future(awaitable))
+        self.submitted += 1
+        while len(self._jobs) > self.max_jobs:
+            _, (_, task) = self._jobs.popitem(last=False)
+            task.cancel()
+            self.dropped += 1
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        self._expire()
+        entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        task = entry[1]
+        if not task.done():
+            return {"id": job_id, "status": "pending", "model_feedback": None}
+        if task.cancelled():
+            return {"id": job_id, "status": "cancelled", "model_feedback": None}
+        error = task.exception()
+        if error is not None:
+            return {"id": job_id, "status": "failed", "model_feedback": f"Error calling Hugging Face API: {error}"}
+        return {"id": job_id, "status": "done", "model_feedback": task.result()}
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._jobs:
+            job_id, (expires, task) = next(iter(self._jobs.items()))
+            if expires >= now:
+                break
+            del self._jobs[job_id]
+            task.cancel()
+
+    def stats(self) -> Dict:
+        return {
+            "jobs": len(self._jobs),
+            "pending": sum(1 for _, task in self._jobs.values() if not task.done()),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+        }
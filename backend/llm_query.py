@@ -1,13 +1,20 @@
+import atexit
 import os
 import re
+import threading
 import uvicorn
 import requests
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 from huggingface_hub import InferenceClient
+from metrics import StageMetrics, RequestTimer, with_timings
+from matcher import PhraseMatcher, build_phrases, load_vocabulary
+from semantic_cache import SemanticSparqlCache
 
-GRAPHDB_URL = "http://localhost:7200/repositories/disease-kg/sparql"
+GRAPHDB_URL = os.getenv("GRAPHDB_SPARQL_URL", "http://localhost:7200/repositories/disease-kg/sparql")
 
 HF_API_TOKEN = "can't share it sorry :D"  
 HF_MODEL = "meta-llama/Llama-3.1-8B-Instruct"
@@ -18,6 +25,47 @@ client = InferenceClient(
     timeout=60,
 )
 
+def get_model():
+    """ ask_huggingface, or the local stub when LLM_MODEL=stub (latency from STUB_LLM_LATENCY) """
+    if os.getenv("LLM_MODEL", "hf").lower() == "stub":
+        from stub_llm import StubModel
+        return StubModel(latency=float(os.getenv("STUB_LLM_LATENCY", "0")))
+    return ask_huggingface
+
+stage_metrics = StageMetrics()
+
+VOCABULARY_FILE = os.getenv("VOCABULARY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabulary.tsv"))
+
+# Earlier question -> cleaned SPARQL; a hit skips the model call entirely.
+# Opened on first use, so importing this module creates no database (SPARQL_CACHE_DB).
+# Entities come from the ingest vocabulary unless main.py hands over its analyzer's matcher.
+_sparql_cache = None
+_cache_matcher = None
+_cache_lock = threading.Lock()
+
+
+def get_sparql_cache() -> SemanticSparqlCache:
+    global _sparql_cache
+    with _cache_lock:
+        if _sparql_cache is None:
+            _sparql_cache = SemanticSparqlCache(
+                threshold=float(os.getenv("SPARQL_CACHE_THRESHOLD", "0.9")),
+                max_entries=int(os.getenv("SPARQL_CACHE_MAX_ENTRIES", "5000")),
+                matcher=_cache_matcher or PhraseMatcher(build_phrases(load_vocabulary(VOCABULARY_FILE))))
+            atexit.register(_sparql_cache.flush)
+        return _sparql_cache
+
+
+def use_matcher(matcher: PhraseMatcher):
+    """ Recognize semantic cache entities with matcher, now or once the cache is opened """
+    global _cache_matcher
+    with _cache_lock:
+        _cache_matcher = matcher
+        cache = _sparql_cache
+    if cache is not None:
+        cache.use_matcher(matcher)
+
+
 app = FastAPI()
 app.add_middleware(
     CORSMiddleware,
@@ -32,12 +80,16 @@ class AskRequest(BaseModel):
     question: str
 
 
-def ask_huggingface(question: str) -> str:
-    prompt = f"""
-You are an expert in SPARQL and semantic knowledge graphs. 
-We have a knowledge graph with namespace DIS: <http://diseases.org/disease-kg/> and SNOMED: <http://snomed.info/id/>.
+class PinRequest(BaseModel):
+    question: str
+    sparql: Optional[str] = None
+    visualization: str = "bar"
+
+
+# The record model the prompt describes; must match how the graph was loaded (scripts/normalize.py)
+GRAPH_ENCODING = os.getenv("GRAPH_ENCODING", "literal")
 
-The graph contains HealthRecord entities with the following structure:
+LITERAL_SCHEMA = """The graph contains HealthRecord entities with the following structure:
 
 DIS:HealthRecord
   - dis:location          (string)      : e.g., "Europe"
@@ -67,7 +119,37 @@ DIS:HealthRecord
   - dis:metric             (string)      : e.g., "Number"
   - dis:value              (float)       : the numeric value
   - dis:measure            (string)      : e.g., "Deaths", "Prevalence", "Incidence"
-  - dis:measureDescription (string)      : textual description of the measure
+  - dis:measureDescription (string)      : textual description of the measure"""
+
+DIMENSION_SCHEMA = """The graph contains HealthRecord entities that link to shared dimension entities:
+
+DIS:HealthRecord
+  - dis:year              (gYear)       : e.g., "2015"^^xsd:gYear
+  - dis:value             (float)       : the numeric value
+  - dis:hasCause          (IRI)         : a dis:Cause
+  - dis:hasLocation       (IRI)         : a dis:Location
+  - dis:hasMeasure        (IRI)         : a dis:Measure
+  - dis:hasSex            (IRI)         : a dis:Sex
+  - dis:hasAge            (IRI)         : a dis:Age
+  - dis:hasMetric         (IRI)         : a dis:Metric
+
+Every dimension entity (dis:Cause, dis:Location, dis:Measure, dis:Sex, dis:Age, dis:Metric) has
+  - rdfs:label            (string)      : e.g., "Tuberculosis", "Europe", "Deaths", "Female", "Number"
+  - dis:id                (integer)     : the IHME id
+A dis:Cause also has dis:cause, its SNOMED IRI.
+Match names through the label, e.g. ?record dis:hasLocation ?loc . ?loc rdfs:label ?location .
+HealthRecords of the cause of deaths table (all ages, both sexes, Deaths) have no dimension links; they
+keep dis:causeName, dis:location, dis:measure and dis:sex as strings. Cover them with a UNION branch."""
+
+RECORD_SCHEMA = DIMENSION_SCHEMA if GRAPH_ENCODING == "dimensions" else LITERAL_SCHEMA
+
+
+def ask_huggingface(question: str) -> str:
+    prompt = f"""
+You are an expert in SPARQL and semantic knowledge graphs. 
+We have a knowledge graph with namespace DIS: <http://diseases.org/disease-kg/> and SNOMED: <http://snomed.info/id/>.
+
+{RECORD_SCHEMA}
 
 All literals are simple types (string, integer, float) and do NOT contain language tags like @en. SNOMED IDs are used as IRIs.
 
@@ -90,6 +172,13 @@ Question: {question}
     return completion.choices[0].message["content"]
 
 
+# the model behind the LLM path; the stub needs no network or API key
+llm_model = get_model()
+
+
+SOLUTION_MODIFIER = re.compile(r"\s*(GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET)\b", re.IGNORECASE)
+
+
 def clean_sparql(llm_output: str) -> str:
     """Извлекува валиден SPARQL query од LLM output."""
     match = re.search(r"```sparql\s*(.*?)```", llm_output, re.DOTALL | re.IGNORECASE)
@@ -108,48 +197,110 @@ def clean_sparql(llm_output: str) -> str:
     lines = query.splitlines()
     valid_lines = []
     brace_count = 0
-    for line in lines:
+    end = len(lines)
+    for i, line in enumerate(lines):
         brace_count += line.count("{")
         brace_count -= line.count("}")
         valid_lines.append(line)
         if brace_count <= 0 and "}" in line:
+            end = i + 1
+            break
+    # GROUP BY / ORDER BY / LIMIT after the closing brace are part of the query
+    for line in lines[end:]:
+        if not SOLUTION_MODIFIER.match(line):
             break
+        valid_lines.append(line)
     query = "\n".join(valid_lines).strip()
 
     return query
 
 
-@app.post("/ask")
-def ask_llm(req: AskRequest):
+def generate_sparql(question: str, timer: RequestTimer) -> dict:
+    """ Question -> cleaned SPARQL and visualization, from the semantic cache or the model """
+    with timer.stage("semantic_cache"):
+        cached = get_sparql_cache().lookup(question)
+    if cached:
+        return {"sparql": cached["sparql"], "visualization": cached["visualization"], "cached": cached}
+
     try:
-        llm_output = ask_huggingface(req.question)
+        with timer.stage("llm"):
+            llm_output = llm_model(question)
     except Exception as e:
         return {"error": f"Failed to call Hugging Face API: {e}"}
 
-    sparql_query = clean_sparql(llm_output)
+    with timer.stage("sparql_cleaning"):
+        sparql_query = clean_sparql(llm_output)
 
-    vis_match = re.search(r"VISUALIZATION:\s*(\w+)", llm_output, re.IGNORECASE)
-    visualization = vis_match.group(1).strip() if vis_match else "bar"
+        vis_match = re.search(r"VISUALIZATION:\s*(\w+)", llm_output, re.IGNORECASE)
+        visualization = vis_match.group(1).strip() if vis_match else "bar"
 
     if not sparql_query:
         return {"error": "Could not parse SPARQL from LLM output", "llm_output": llm_output}
+    return {"sparql": sparql_query, "visualization": visualization, "cached": None}
+
+
+def cache_info(cached: dict) -> dict:
+    return {k: cached[k] for k in ["match", "similarity", "matched_question", "pinned"]}
+
+
+@app.post("/ask")
+def ask_llm(req: AskRequest, request: Request, response: Response):
+    timer = RequestTimer(stage_metrics)
+
+    generated = generate_sparql(req.question, timer)
+    if "error" in generated:
+        return with_timings(generated, timer, request, response)
+    sparql_query, visualization, cached = generated["sparql"], generated["visualization"], generated["cached"]
 
     headers = {
     "Accept": "application/sparql-results+json"
     }
 
+    r = None
     try:
-        r = requests.get(GRAPHDB_URL, params={"query": sparql_query}, headers=headers, timeout=120)
-        r.raise_for_status()
-        result = r.json()
+        with timer.stage("graphdb"):
+            r = requests.get(GRAPHDB_URL, params={"query": sparql_query}, headers=headers, timeout=120)
+            r.raise_for_status()
+            result = r.json()
     except Exception as e:
         result = {"error": "GraphDB returned invalid response", "details": str(e), "text": getattr(r, "text", "")}
 
-    return {
+    # only queries GraphDB accepted are worth reusing
+    if not cached and "error" not in result:
+        get_sparql_cache().store(req.question, sparql_query, visualization)
+
+    body = {
         "sparql": sparql_query,
         "result": result,
         "visualization": visualization
     }
+    if cached:
+        body["cache"] = cache_info(cached)
+    return with_timings(body, timer, request, response)
+
+
+@app.post("/cache/pin")
+def pin_query(req: PinRequest):
+    """ Pin a verified query: with sparql it is stored as the answer, without it the cached one is pinned """
+    if req.sparql:
+        get_sparql_cache().store(req.question, req.sparql, req.visualization, pinned=True)
+        return {"status": "OK", "pinned": True}
+    return {"status": "OK", "pinned": get_sparql_cache().pin(req.question)}
+
+
+@app.post("/cache/unpin")
+def unpin_query(req: PinRequest):
+    return {"status": "OK", "unpinned": get_sparql_cache().pin(req.question, pinned=False)}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return get_sparql_cache().stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return stage_metrics.render()
 
 
 
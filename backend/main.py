@@ -1,12 +1,32 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-import requests
+import asyncio
+import hmac
+import itertools
+import httpx
 import re
+import time
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
+from rollups import RollupStore
+from timeseries import TimeSeriesStore
+from query_backends import GraphDBBackend, get_backend, query_plan
+from sparql_planner import SparqlPlanner
+from cache import ResultCache, WarmCache, analysis_key
+from matcher import PhraseMatcher, build_phrases, load_vocabulary
+from metrics import StageMetrics, RequestTimer, with_timings
+from router import Router, LLM
+from warmup import history_questions, warmup_questions
+from feedback import FeedbackJobs
+from columnar import ARROW_STREAM, COLUMNAR_JSON, to_arrow_ipc, to_columns
+from batch import merge_groups, merged_analysis, split_rows
+from paging import NDJSON, decode_cursor, ndjson_lines, page_info, result_items
+import llm_query
 
 # Load HF API key from .env
 #load_dotenv()
@@ -17,7 +37,34 @@ HF_MODEL = "meta-llama/Llama-3.1-8B-Instruct"
 #HF_API_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL_NAME}"
 #HF_HEADERS = {"Authorization": f"Bearer {HF_API_KEY}"}
 
-app = FastAPI()
+GRAPHDB_URL = os.getenv("GRAPHDB_URL", "http://localhost:7200/repositories/disease-kg")
+GRAPHDB_TIMEOUT = float(os.getenv("GRAPHDB_TIMEOUT_SECONDS", "120"))
+HF_TIMEOUT = float(os.getenv("HF_TIMEOUT_SECONDS", "120"))
+
+graphdb_backend = GraphDBBackend(GRAPHDB_URL, timeout=GRAPHDB_TIMEOUT)
+# "graphdb" (default) or "local" for the in-process pandas table, set with QUERY_BACKEND
+query_backend = get_backend(graphdb=graphdb_backend)
+
+# Keep-alive connection pool shared by all requests, opened on startup
+http_client: Optional[httpx.AsyncClient] = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global http_client
+    http_client = httpx.AsyncClient(limits=httpx.Limits(max_connections=100, max_keepalive_connections=20))
+    graphdb_backend.client = http_client
+    warmup_task = None
+    if WARMUP_ON_STARTUP:
+        # in the background: questions asked meanwhile are answered as usual
+        warmup_task = asyncio.create_task(warm_up(startup_questions()))
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    graphdb_backend.client = None
+    await http_client.aclose()
+    http_client = None
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],
@@ -26,13 +73,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-GRAPHDB_URL = "http://localhost:7200/repositories/disease-kg"
+# Pre-aggregated sum/avg tables written at ingest by scripts/build_rollups.py
+rollup_store = RollupStore()
+
+# Daily COVID series for trend questions, written by scripts/build_timeseries.py
+timeseries_store = TimeSeriesStore()
+
+stage_metrics = StageMetrics()
+
+# /ask responses keyed on the canonical analysis + SPARQL text
+result_cache = ResultCache(max_size=int(os.getenv("CACHE_MAX_SIZE", "1024")),
+                           ttl=float(os.getenv("CACHE_TTL_SECONDS", "600")))
+
+# Answers the warm-up job precomputed (scripts/warm_cache.py), read from disk on a result_cache miss;
+# older than WARM_CACHE_TTL_SECONDS (0 for never) they are computed again
+WARM_CACHE_TTL = float(os.getenv("WARM_CACHE_TTL_SECONDS", "86400"))
+warm_cache = WarmCache(ttl=WARM_CACHE_TTL or None)
+# Shared secret the ingest scripts send to /cache/invalidate; unset, only local callers may invalidate
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+CACHE_TOKEN_HEADER = "X-Cache-Token"
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+# Also warm up in the background at startup, for deployments without the cron job
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "0").lower() in ["1", "true", "yes"]
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+
+# Optional model feedback, computed after /ask returns and fetched from /ask/feedback/{id}
+feedback_jobs = FeedbackJobs(max_jobs=int(os.getenv("FEEDBACK_MAX_JOBS", "1024")),
+                             ttl=float(os.getenv("FEEDBACK_TTL_SECONDS", "600")))
+
+# /ask/batch: most questions per call, and backend queries in flight at once
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Rows per question in a batch answer, the unpaginated /ask page size
+MERGED_PAGE = 20
+
+# Largest page a client may ask for with page_size
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "10000"))
 
 class AskRequest(BaseModel):
     question: str
+    feedback: bool = False
+    # Pagination: page_size for the first page, then the next_cursor of the previous response
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    # Stream every row (or the requested page) as NDJSON; also chosen by "Accept: application/x-ndjson"
+    stream: bool = False
+
+# Entity index built from the datasets at ingest by scripts/build_vocabulary.py
+VOCABULARY_FILE = os.getenv("VOCABULARY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabulary.tsv"))
 
 class QueryAnalysis:
-    def __init__(self):
+    def __init__(self, vocabulary_file: str = VOCABULARY_FILE):
         self.diseases = {
             'malaria': 'Malaria', 'маларија': 'Malaria',
             'lung cancer': 'Lung Cancer', 'белодробен рак': 'Lung Cancer',
@@ -68,9 +159,67 @@ class QueryAnalysis:
             'incidence': 'Incidence', 'инциденција': 'Incidence', 'new cases': 'Incidence'
         }
 
+        self.genders = {
+            'women': 'Female', 'female': 'Female', 'жени': 'Female', 'females': 'Female',
+            'men': 'Male', 'male': 'Male', 'мажи': 'Male', 'males': 'Male'
+        }
+
+        self.groupings = {
+            'by sex': 'sex', 'by gender': 'sex', 'grouped by sex': 'sex', 'по пол': 'sex',
+            'by location': 'location', 'by country': 'location', 'by region': 'location', 'по локација': 'location',
+            'by age': 'age', 'age groups': 'age', 'по возраст': 'age',
+            'over time': 'year', 'by year': 'year', 'trend': 'year', 'trends': 'year', 'низ години': 'year'
+        }
+
+        # Periods of a trend; only the daily COVID series has more than one value per year
+        self.intervals = {
+            'daily': 'day', 'per day': 'day', 'by day': 'day', 'дневно': 'day',
+            'weekly': 'week', 'per week': 'week', 'by week': 'week', 'неделно': 'week',
+            'monthly': 'month', 'per month': 'month', 'by month': 'month', 'месечно': 'month'
+        }
+
+        self.smoothing = {
+            'rolling average': 'rolling', 'moving average': 'rolling', 'rolling mean': 'rolling',
+            'подвижен просек': 'rolling'
+        }
+
+        self.aggregations = {
+            'total': 'sum', 'sum': 'sum', 'вкупно': 'sum',
+            'average': 'avg', 'mean': 'avg', 'просек': 'avg'
+        }
+
+        self.intents = {
+            'compare': 'comparison', 'comparison': 'comparison', 'vs': 'comparison', 'versus': 'comparison', 'спореди': 'comparison',
+            'top': 'ranking', 'highest': 'ranking', 'most': 'ranking', 'најмногу': 'ranking', 'највисоки': 'ranking', 'ranking': 'ranking',
+            'distribution': 'distribution', 'breakdown': 'distribution', 'дистрибуција': 'distribution',
+            'map': 'map', 'geographic': 'map', 'geography': 'map', 'карта': 'map'
+        }
+
+        self.ages = {}
+
+        # Values and aliases found in the data extend (and override) the built-in entries above
+        entity_vocabularies = {
+            'diseases': self.diseases,
+            'locations': self.locations,
+            'measures': self.measures,
+            'gender': self.genders,
+            'ages': self.ages,
+        }
+        for category, entries in load_vocabulary(vocabulary_file).items():
+            if category in entity_vocabularies:
+                entity_vocabularies[category].update(entries)
+
+        # One compiled matcher for every vocabulary, built once and shared by all requests
+        self.matcher = PhraseMatcher(build_phrases({
+            **entity_vocabularies,
+            'grouping': self.groupings,
+            'interval': self.intervals,
+            'smoothing': self.smoothing,
+            'aggregation': self.aggregations,
+            'intent': self.intents,
+        }))
+
     def analyze_question(self, question: str) -> Dict:
-        question_lower = question.lower()
-        
         analysis = {
             'diseases': [],
             'locations': [],
@@ -82,28 +231,28 @@ class QueryAnalysis:
             'query_type': 'general',
             'grouping': [],
             'aggregation': None,
+            'interval': None,
+            'rolling_window': None,
             'visualization': 'table'
         }
-        
-        for key, value in self.diseases.items():
-            if key in question_lower:
-                if value not in analysis['diseases']:
-                    analysis['diseases'].append(value)
-        
-        for key, value in self.locations.items():
-            if key in question_lower:
-                if value not in analysis['locations']:
-                    analysis['locations'].append(value)
-        
-        for key, value in self.measures.items():
-            if key in question_lower:
-                if value not in analysis['measures']:
-                    analysis['measures'].append(value)
-        
-        if any(word in question_lower for word in ['women', 'female', 'жени', 'females']):
+
+        found = {}
+        for category, value in self.matcher.find(question):
+            values = found.setdefault(category, [])
+            if value not in values:
+                values.append(value)
+
+        for category in ['diseases', 'locations', 'measures']:
+            analysis[category] = found.get(category, [])
+
+        genders = found.get('gender', [])
+        if 'Female' in genders:
             analysis['gender'] = 'Female'
-        elif any(word in question_lower for word in ['men', 'male', 'мажи', 'males']):
+        elif 'Male' in genders:
             analysis['gender'] = 'Male'
+
+        if found.get('ages'):
+            analysis['age_group'] = found['ages'][0]
         
         years = re.findall(r'\b(?:19|20)\d{2}\b', question)
         if len(years) >= 2:
@@ -113,36 +262,44 @@ class QueryAnalysis:
         elif len(years) == 1:
             analysis['time_period'] = years[0]
         
-        if any(phrase in question_lower for phrase in ['by sex', 'by gender', 'grouped by sex', 'по пол']):
-            analysis['grouping'].append('sex')
-        if any(phrase in question_lower for phrase in ['by location', 'by country', 'by region', 'по локација']):
-            analysis['grouping'].append('location')
-        if any(phrase in question_lower for phrase in ['by age', 'age groups', 'по возраст']):
-            analysis['grouping'].append('age')
-        if any(phrase in question_lower for phrase in ['over time', 'by year', 'trend', 'низ години']):
-            analysis['grouping'].append('year')
+        groupings = found.get('grouping', [])
+        for group in ['sex', 'location', 'age', 'year']:
+            if group in groupings:
+                analysis['grouping'].append(group)
+        if 'year' in groupings:
+            analysis['query_type'] = 'trend'
+            analysis['visualization'] = 'line'
+
+        if found.get('interval'):
+            analysis['interval'] = found['interval'][0]
+        if found.get('smoothing'):
+            window = re.search(r'\b(\d+)[- ]?(?:day|ден)', question.lower())
+            analysis['rolling_window'] = int(window.group(1)) if window else 7
+        if analysis['interval'] or analysis['rolling_window']:
             analysis['query_type'] = 'trend'
             analysis['visualization'] = 'line'
         
-        if any(word in question_lower for word in ['total', 'sum', 'вкупно']):
+        aggregations = found.get('aggregation', [])
+        if 'sum' in aggregations:
             analysis['aggregation'] = 'sum'
             analysis['query_type'] = 'total'
             if not analysis['grouping']:
                 analysis['visualization'] = 'metric'
-        elif any(word in question_lower for word in ['average', 'mean', 'просек']):
+        elif 'avg' in aggregations:
             analysis['aggregation'] = 'avg'
             analysis['query_type'] = 'average'
             analysis['visualization'] = 'metric'
         
-        if any(word in question_lower for word in ['compare', 'comparison', 'vs', 'versus', 'спореди']):
+        intents = found.get('intent', [])
+        if 'comparison' in intents:
             analysis['query_type'] = 'comparison'
             analysis['visualization'] = 'bar'
-        elif any(word in question_lower for word in ['top', 'highest', 'most', 'најмногу', 'највисоки', 'ranking']):
+        elif 'ranking' in intents:
             analysis['query_type'] = 'ranking'
             analysis['visualization'] = 'bar'
-        elif any(word in question_lower for word in ['distribution', 'breakdown', 'дистрибуција']):
+        elif 'distribution' in intents:
             analysis['visualization'] = 'pie'
-        elif any(word in question_lower for word in ['map', 'geographic', 'geography', 'карта']):
+        elif 'map' in intents:
             analysis['visualization'] = 'map'
         
         if 'sex' in analysis['grouping'] and len(analysis['grouping']) == 1:
@@ -154,30 +311,69 @@ class QueryAnalysis:
 
 # ----------------- SPARQL Generator -----------------
 class SPARQLGenerator:
-    def __init__(self):
+    def __init__(self, optimize: bool = True, planner: Optional[SparqlPlanner] = None):
         self.prefixes = """
 PREFIX dis: <http://diseases.org/disease-kg/>
 PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
 """
+        # optimize=False keeps the original FILTER templates, filtering on the same query_plan
+        self.planner = (planner or SparqlPlanner()) if optimize else None
+
+    def page_clause(self, limit: Optional[int], offset: int, order_vars: List[str], paged: bool = False) -> str:
+        """ LIMIT/OFFSET for one page; paginated requests add ORDER BY so every page sees the same row order """
+        clause = ""
+        if order_vars and (paged or offset):
+            clause += "ORDER BY " + " ".join(order_vars) + "\n"
+        if limit is not None:
+            clause += f"LIMIT {limit}"
+        if offset:
+            clause += f" OFFSET {offset}"
+        return clause.strip()
 
-    def generate_query(self, analysis: Dict) -> Tuple[str, str]:
-        if analysis.get("aggregation") in ["sum", "avg"]:
-            group_vars = []
-            select_vars = []
-
-            if "sex" in analysis.get("grouping", []):
-                group_vars.append("?sex")
-                select_vars.append("?sex")
-            if "location" in analysis.get("grouping", []):
-                group_vars.append("?location")
-                select_vars.append("?location")
-            if "year" in analysis.get("grouping", []):
-                group_vars.append("?year")
-                select_vars.append("?year")
+    def filter_clause(self, filters: Dict) -> str:
+        """ FILTER of the original templates; a variable the question names several values for matches any of them """
+        conditions = []
+        for var in ["causeName", "measure", "location"]:
+            values = filters.get(var)
+            if isinstance(values, list):
+                conditions.append("(" + " || ".join(f'?{var} = "{value}"' for value in values) + ")")
+            elif values is not None:
+                conditions.append(f'?{var} = "{values}"')
+        if "year" in filters:
+            conditions.append(f'?year = "{filters["year"]}"^^xsd:gYear')
+        if not conditions:
+            return ""
+        return "    FILTER(" + " && ".join(conditions) + ")\n"
+
+    def values_clause(self, years: Optional[List[str]]) -> str:
+        """ VALUES block that runs one query for several years (merged /ask/batch questions) """
+        if not years:
+            return ""
+        return "    VALUES ?year { " + " ".join(f'"{year}"^^xsd:gYear' for year in years) + " }\n"
+
+    def generate_query(self, analysis: Dict, limit: Optional[int] = 20, offset: int = 0,
+                       years: Optional[List[str]] = None, paged: bool = False) -> Tuple[str, str]:
+        """ SPARQL and visualization for the analysis; limit=None returns every row (streaming).
+        paged (a page_size or cursor request) orders the rows, so pages neither skip nor repeat any """
+        if self.planner is not None:
+            plan = query_plan(analysis, limit, offset)
+            if years:
+                plan["filters"]["year"] = [int(year) for year in years] if len(years) > 1 else int(years[0])
+            order_vars = [f"?{var}" for var in plan["group_by"]] if plan["aggregation"] else ["?record"]
+            page_clause = self.page_clause(limit, offset, order_vars, paged)
+            sparql_query = self.planner.render(plan, self.prefixes.strip(), page_clause)
+            if plan["aggregation"]:
+                return sparql_query, "bar" if plan["group_by"] else "metric"
+            return sparql_query, analysis.get("visualization", "table")
+
+        plan = query_plan(analysis, limit, offset)
+        if plan["aggregation"]:
+            group_vars = [f"?{var}" for var in plan["group_by"]]
 
             # SELECT clause
-            agg_func = "SUM" if analysis["aggregation"] == "sum" else "AVG"
-            select_clause = "SELECT " + " ".join(select_vars) + f" ({agg_func}(?value) AS ?value)"
+            agg_func = "SUM" if plan["aggregation"] == "sum" else "AVG"
+            select_clause = "SELECT " + " ".join(group_vars) + f" ({agg_func}(?value) AS ?value)"
 
             # WHERE clause
             where_clause = "WHERE {\n"
@@ -188,19 +384,8 @@ PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
             where_clause += "            dis:measure ?measure .\n"
             where_clause += "    OPTIONAL { ?record dis:year ?year }\n"
             where_clause += "    OPTIONAL { ?record dis:sex ?sex }\n"
-
-            # Build FILTER dynamically
-            filters = []
-            if analysis.get("diseases"):
-                filters.append(f'?causeName = "{analysis["diseases"][0]}"')
-            if analysis.get("measures"):
-                filters.append(f'?measure = "{analysis["measures"][0]}"')
-            if analysis.get("locations") and "location" not in analysis.get("grouping", []):
-                filters.append(f'?location = "{analysis["locations"][0]}"')
-            if analysis.get("time_period"):
-                filters.append(f'?year = "{analysis["time_period"]}"^^xsd:gYear')
-            if filters:
-                where_clause += "    FILTER(" + " && ".join(filters) + ")\n"
+            where_clause += self.filter_clause(plan["filters"])
+            where_clause += self.values_clause(years)
 
             where_clause += "}"
 
@@ -209,7 +394,8 @@ PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
             if group_vars:
                 group_by_clause = "GROUP BY " + " ".join(group_vars)
 
-            sparql_query = f"{self.prefixes.strip()}\n{select_clause}\n{where_clause}\n{group_by_clause}\nLIMIT 20"
+            page_clause = self.page_clause(limit, offset, group_vars, paged)
+            sparql_query = f"{self.prefixes.strip()}\n{select_clause}\n{where_clause}\n{group_by_clause}\n{page_clause}"
             return sparql_query, "bar" if group_vars else "metric"
 
         # --- Default query (no aggregation) ---
@@ -223,40 +409,22 @@ PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
             where_clause += "            dis:measure ?measure .\n"
             where_clause += "    OPTIONAL { ?record dis:year ?year }\n"
             where_clause += "    OPTIONAL { ?record dis:sex ?sex }\n"
-
-            filters = []
-            if analysis.get("diseases"):
-                filters.append(f'?causeName = "{analysis["diseases"][0]}"')
-            if analysis.get("measures"):
-                filters.append(f'?measure = "{analysis["measures"][0]}"')
-            if analysis.get("locations"):
-                filters.append(f'?location = "{analysis["locations"][0]}"')
-            if analysis.get("time_period"):
-                filters.append(f'?year = "{analysis["time_period"]}"^^xsd:gYear')
-            if filters:
-                where_clause += "    FILTER(" + " && ".join(filters) + ")\n"
+            where_clause += self.filter_clause(plan["filters"])
+            where_clause += self.values_clause(years)
 
             where_clause += "}"
 
-            sparql_query = f"{self.prefixes.strip()}\n{select_clause}\n{where_clause}\nLIMIT 20"
+            page_clause = self.page_clause(limit, offset, ["?record"], paged)
+            sparql_query = f"{self.prefixes.strip()}\n{select_clause}\n{where_clause}\n{page_clause}"
             return sparql_query, analysis.get("visualization", "table")
 
 
 # ----------------- Execute Query -----------------
 def execute_sparql_query(query: str) -> Dict:
-    try:
-        headers = {"Accept": "application/sparql-results+json"}
-        response = requests.post(GRAPHDB_URL, data={"query": query}, headers=headers, timeout=120)
-        if response.status_code == 200:
-            result = response.json()
-            return result
-        else:
-            return {"error": f"GraphDB HTTP {response.status_code}", "text": response.text, "query": query}
-    except requests.exceptions.RequestException as e:
-        return {"error": f"GraphDB connection failed: {e}", "query": query}
+    return graphdb_backend.execute(query)
     
 
-def call_hf_model(question: str) -> str:
+async def call_hf_model(question: str) -> str:
     try:
         payload = {
         "inputs": question,
@@ -264,7 +432,11 @@ def call_hf_model(question: str) -> str:
         }
         API_URL = f"https://api-inference.huggingface.co/models/{HF_MODEL}"
         headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-        response = requests.post(API_URL, headers=headers, json=payload, timeout=120)
+        if http_client is None:
+            async with httpx.AsyncClient() as client:
+                response = await client.post(API_URL, headers=headers, json=payload, timeout=HF_TIMEOUT)
+        else:
+            response = await http_client.post(API_URL, headers=headers, json=payload, timeout=HF_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         if isinstance(data, list) and "generated_text" in data[0]:
@@ -274,31 +446,422 @@ def call_hf_model(question: str) -> str:
     except Exception as e:
         return f"Error calling Hugging Face API: {e}"
 
+async def model_feedback(question: str) -> str:
+    """ call_hf_model with the timeout, timed into the llm_feedback histogram """
+    start = time.perf_counter()
+    try:
+        return await with_timeout(call_hf_model(question), HF_TIMEOUT,
+                                  f"Error calling Hugging Face API: timed out after {HF_TIMEOUT}s")
+    finally:
+        stage_metrics.observe("llm_feedback", time.perf_counter() - start)
+
+def request_feedback(question: str) -> Dict:
+    job_id = feedback_jobs.submit(model_feedback(question))
+    return {"id": job_id, "status": "pending", "url": f"/ask/feedback/{job_id}"}
+
+async def with_timeout(coro, seconds: float, on_timeout):
+    """ Await coro, cancelling it after seconds and returning on_timeout instead """
+    try:
+        return await asyncio.wait_for(coro, timeout=seconds)
+    except asyncio.TimeoutError:
+        return on_timeout
+
 # ----------------- API Endpoints -----------------
+analyzer = QueryAnalysis()
+# SPARQL_PLANNER=off falls back to the FILTER templates
+generator = SPARQLGenerator(optimize=os.getenv("SPARQL_PLANNER", "on").lower() != "off")
+# Template fast path for confident analyses, LLM (llm_query) for the rest; ROUTER_THRESHOLD in [0, 1]
+router = Router(analyzer.matcher, threshold=float(os.getenv("ROUTER_THRESHOLD", "0.6")))
+# The semantic cache compares the same entities the analyzer recognizes
+llm_query.use_matcher(analyzer.matcher)
+
+async def answer_with_llm(question: str, analysis: Dict, timer: RequestTimer) -> Dict:
+    """ SPARQL from the model (or its semantic cache), run on GraphDB """
+    generated = await asyncio.to_thread(llm_query.generate_sparql, question, timer)
+    if "error" in generated:
+        return generated
+    sparql_query = generated["sparql"]
+    result = await timer.timed(graphdb_backend.name, with_timeout(graphdb_backend.execute_async(sparql_query), GRAPHDB_TIMEOUT,
+                               {"error": f"Query timed out after {GRAPHDB_TIMEOUT}s", "query": sparql_query}))
+    if not generated["cached"] and "error" not in result:
+        llm_query.get_sparql_cache().store(question, sparql_query, generated["visualization"])
+
+    body = {
+        "sparql": sparql_query,
+        "result": result,
+        "visualization": generated["visualization"],
+        "analysis": analysis,
+        "source": graphdb_backend.name,
+        "model_feedback": None
+    }
+    if generated["cached"]:
+        body["cache"] = llm_query.cache_info(generated["cached"])
+    return body
+
+def requested_page(req: AskRequest) -> Tuple[Optional[int], int]:
+    """ (page size, offset) of the request; (None, 0) when it is not paginated """
+    if req.cursor:
+        try:
+            offset, page_size = decode_cursor(req.cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif req.page_size is not None:
+        offset, page_size = 0, req.page_size
+    else:
+        return None, 0
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size, offset
+
+def negotiate(body: Dict, timer: RequestTimer, request: Request, response: Response):
+    """ The /ask body in the format the Accept header asks for: SPARQL JSON (default),
+    columnar JSON, or an Arrow IPC stream with the rest of the body in its schema metadata """
+    accept = request.headers.get("accept", "")
+    result = body.get("result", {})
+    wants = ARROW_STREAM if ARROW_STREAM in accept else COLUMNAR_JSON if COLUMNAR_JSON in accept else None
+    if wants is None or "error" in result or "results" not in result:
+        return with_timings(body, timer, request, response)
+
+    with timer.stage("serialization"):
+        if wants == ARROW_STREAM:
+            content = to_arrow_ipc(result, {k: v for k, v in body.items() if k != "result"})
+        else:
+            body = {**body, "result": to_columns(result)}
+    body = with_timings(body, timer, request, response)
+    headers = {k: v for k, v in response.headers.items() if k.lower() == "server-timing"}
+    if wants == ARROW_STREAM:
+        # the stage breakdown travels in the Server-Timing header only
+        return Response(content=content, media_type=ARROW_STREAM, headers=headers)
+    return JSONResponse(body, media_type=COLUMNAR_JSON, headers=headers)
+
+def stream_response(header: Dict, items, timer: RequestTimer) -> StreamingResponse:
+    return StreamingResponse(ndjson_lines(header, items, on_finish=timer.finish), media_type=NDJSON)
+
 @app.post("/ask")
-def ask_llm(req: AskRequest):
-    analyzer = QueryAnalysis()
-    generator = SPARQLGenerator()
+async def ask_llm(req: AskRequest, request: Request, response: Response):
+    timer = RequestTimer(stage_metrics)
+    page_size, offset = requested_page(req)
+    stream = req.stream or NDJSON in request.headers.get("accept", "")
 
-    analysis = analyzer.analyze_question(req.question)
-    
-    sparql_query, visualization = generator.generate_query(analysis)
-    
-    result = execute_sparql_query(sparql_query)
-    
-    model_feedback = call_hf_model(req.question)
+    with timer.stage("analysis"):
+        analysis = analyzer.analyze_question(req.question)
+
+    with timer.stage("routing"):
+        route = router.route(req.question, analysis)
+    if route["path"] == LLM:
+        body = await answer_with_llm(req.question, analysis, timer)
+        if "error" not in body:
+            if stream:
+                result = body.pop("result")
+                return stream_response({**body, "route": route}, result_items(result), timer)
+            return negotiate({**body, "route": route}, timer, request, response)
+        # the model could not produce a query; the templates still give an approximate answer
+        router.fallback(route, body["error"])
+
+    # unpaginated requests keep the 20-row answer; a stream without page_size returns every row
+    limit = page_size if page_size is not None else (None if stream else 20)
+    with timer.stage("sparql_generation"):
+        sparql_query, visualization = generator.generate_query(analysis, limit, offset, paged=page_size is not None)
+
+    if stream:
+        header = {"sparql": sparql_query, "visualization": visualization, "analysis": analysis, "route": route}
+        with timer.stage("timeseries"):
+            result = timeseries_store.answer(analysis, limit, offset)
+        if result is not None:
+            return stream_response({**header, "source": "timeseries"}, result_items(result), timer)
+        with timer.stage("rollup"):
+            result = rollup_store.answer(analysis, limit, offset)
+        if result is not None:
+            return stream_response({**header, "source": "rollup"}, result_items(result), timer)
+        return stream_response({**header, "source": query_backend.name},
+                               query_backend.stream_async(analysis, sparql_query, limit, offset), timer)
+
+    with timer.stage("cache_lookup"):
+        cache_key = analysis_key(analysis, sparql_query)
+        cached = cached_answer(cache_key)
+    if cached is not None:
+        feedback = request_feedback(req.question) if req.feedback else None
+        return negotiate({**cached, "model_feedback": feedback, "route": route}, timer, request, response)
+
+    body = await answer_template(analysis, sparql_query, visualization, limit, offset, timer)
+    result = body["result"]
+    if page_size is not None:
+        body["page"] = page_info(result, page_size, offset)
+    if "error" not in result:
+        result_cache.put(cache_key, body)
+    # the data goes out as soon as it is ready; feedback is polled from /ask/feedback/{id} if wanted
+    feedback = request_feedback(req.question) if req.feedback else None
+    return negotiate({**body, "model_feedback": feedback, "route": route}, timer, request, response)
+
+def cached_answer(cache_key: str) -> Optional[Dict]:
+    """ The result_cache entry, else the warm-up job's answer from disk (kept in result_cache from then on) """
+    cached = result_cache.get(cache_key)
+    if cached is None:
+        cached = warm_cache.get(cache_key)
+        if cached is not None:
+            result_cache.put(cache_key, cached)
+    return cached
+
+async def answer_template(analysis: Dict, sparql_query: str, visualization: str, limit: Optional[int], offset: int,
+                          timer: RequestTimer) -> Dict:
+    """ /ask body of the template path: the daily series, the rollups, or else the query backend """
+    with timer.stage("timeseries"):
+        result = timeseries_store.answer(analysis, limit, offset)
+    source = "timeseries"
+    if result is None:
+        with timer.stage("rollup"):
+            result = rollup_store.answer(analysis, limit, offset)
+        source = "rollup"
+    if result is None:
+        source = query_backend.name
+        query_call = timer.timed(source, with_timeout(query_backend.run_async(analysis, sparql_query, limit, offset),
+                                 GRAPHDB_TIMEOUT, {"error": f"Query timed out after {GRAPHDB_TIMEOUT}s", "query": sparql_query}))
+        result = await query_call
 
     return {
         "sparql": sparql_query,
         "result": result,
         "visualization": visualization,
         "analysis": analysis,
-        "model_feedback": model_feedback
+        "source": source,
+        "model_feedback": None
     }
 
+def startup_questions():
+    """ warmup_questions with the history read lazily, so the sqlite read happens wherever it is iterated """
+    yield from warmup_questions(analyzer, history_questions())
+
+async def warm_up(questions, concurrency: int = WARMUP_CONCURRENCY, batch_size: int = 64) -> Dict:
+    """ Precompute the unpaginated /ask answers of questions into warm_cache.
+
+    Only template questions the query backend would answer are run, at most concurrency at a
+    time, so a cold start does not send every common query to GraphDB at once. The daily
+    series and rollups answer from local data anyway. Answers already on disk are skipped,
+    so a repeated or interrupted run only computes what is missing.
+
+    Questions are read, analyzed and checked against the disk cache in a worker thread,
+    batch_size at a time, and answers are written from one, so requests arriving meanwhile
+    are served as usual.
+    """
+    timer = RequestTimer(StageMetrics())  # kept out of /metrics
+    semaphore = asyncio.Semaphore(concurrency)
+    stats = {"questions": 0, "queries": 0, "cached": 0, "skipped": 0, "errors": 0}
+    seen = set()
+    questions = iter(questions)
+
+    async def run(cache_key: str, analysis: Dict, sparql_query: str, visualization: str):
+        async with semaphore:
+            body = await answer_template(analysis, sparql_query, visualization, 20, 0, timer)
+        if "error" in body["result"]:
+            stats["errors"] += 1
+        else:
+            await asyncio.to_thread(warm_cache.put, cache_key, body)
+
+    def next_batch() -> List[Tuple[str, Dict, str, str]]:
+        """ (cache key, analysis, SPARQL, visualization) to compute for the next batch_size questions """
+        batch = []
+        for question in itertools.islice(questions, batch_size):
+            stats["questions"] += 1
+            analysis = analyzer.analyze_question(question)
+            if (router.score(question, analysis)["confidence"] < router.threshold
+                    or timeseries_store.can_answer(analysis) or rollup_store.can_answer(analysis)):
+                stats["skipped"] += 1
+                continue
+            sparql_query, visualization = generator.generate_query(analysis, 20, 0)
+            cache_key = analysis_key(analysis, sparql_query)
+            if cache_key in seen:
+                continue
+            seen.add(cache_key)
+            if cache_key in warm_cache:
+                stats["cached"] += 1
+                continue
+            batch.append((cache_key, analysis, sparql_query, visualization))
+        return batch
+
+    tasks = []
+    while True:
+        asked = stats["questions"]
+        batch = await asyncio.to_thread(next_batch)
+        stats["queries"] += len(batch)
+        tasks.extend(asyncio.create_task(run(*job)) for job in batch)
+        if stats["questions"] - asked < batch_size:
+            break
+    await asyncio.gather(*tasks)
+    return stats
+
+class BatchRequest(BaseModel):
+    questions: List[str]
+
+@app.post("/ask/batch")
+async def ask_batch(req: BatchRequest, request: Request, response: Response):
+    """ Answers many questions at once, in input order.
+
+    Questions with the same SPARQL run once; template questions that differ only in their
+    year are merged into one VALUES query on GraphDB and split back. Everything left runs
+    concurrently, at most BATCH_CONCURRENCY backend calls at a time.
+    """
+    if len(req.questions) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} questions per batch")
+    timer = RequestTimer(stage_metrics)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    stats = {"questions": len(req.questions), "unique_queries": 0, "cache_hits": 0, "timeseries": 0, "rollup": 0,
+             "merged_queries": 0, "backend_queries": 0, "llm": 0}
+
+    async def limited(coro):
+        async with semaphore:
+            return await coro
+
+    with timer.stage("analysis"):
+        analyses = [analyzer.analyze_question(question) for question in req.questions]
+    with timer.stage("routing"):
+        routes = [router.route(question, analysis) for question, analysis in zip(req.questions, analyses)]
+
+    bodies: List[Optional[Dict]] = [None] * len(req.questions)
+
+    async def answer_templates(indices: List[int]):
+        """ Template answers for the questions at indices, written into bodies """
+        # answered per question: the interval and rolling window of a trend are not in its SPARQL
+        with timer.stage("timeseries"):
+            for i in indices:
+                result = timeseries_store.answer(analyses[i])
+                if result is not None:
+                    sparql_query, visualization = generator.generate_query(analyses[i])
+                    bodies[i] = {"sparql": sparql_query, "result": result, "visualization": visualization,
+                                 "analysis": analyses[i], "source": "timeseries", "model_feedback": None,
+                                 "route": routes[i]}
+                    stats["timeseries"] += 1
+
+        # identical SPARQL is run once for every question that produced it
+        queries, visualizations = {}, {}
+        with timer.stage("sparql_generation"):
+            for i in indices:
+                if bodies[i] is None:
+                    sparql_query, visualizations[i] = generator.generate_query(analyses[i])
+                    queries.setdefault(sparql_query, []).append(i)
+        stats["unique_queries"] += len(queries)
+
+        results, pending = {}, []
+        with timer.stage("cache_lookup"):
+            for sparql_query, query_indices in queries.items():
+                cached = cached_answer(analysis_key(analyses[query_indices[0]], sparql_query))
+                if cached is not None:
+                    results[sparql_query] = (cached["result"], cached["source"])
+                    stats["cache_hits"] += 1
+                else:
+                    pending.append(sparql_query)
+        with timer.stage("rollup"):
+            for sparql_query in list(pending):
+                result = rollup_store.answer(analyses[queries[sparql_query][0]])
+                if result is not None:
+                    results[sparql_query] = (result, "rollup")
+                    pending.remove(sparql_query)
+                    stats["rollup"] += 1
+
+        # merging only saves round trips on GraphDB; the local backend has none
+        if query_backend is graphdb_backend:
+            groups = [[pending[j] for j in group] for group in merge_groups([analyses[queries[q][0]] for q in pending])]
+        else:
+            groups = [[sparql_query] for sparql_query in pending]
+
+        async def run_single(sparql_query: str):
+            analysis = analyses[queries[sparql_query][0]]
+            result = await limited(with_timeout(query_backend.run_async(analysis, sparql_query), GRAPHDB_TIMEOUT,
+                                                {"error": f"Query timed out after {GRAPHDB_TIMEOUT}s", "query": sparql_query}))
+            results[sparql_query] = (result, query_backend.name)
+            stats["backend_queries"] += 1
+
+        async def run_group(group: List[str]):
+            if len(group) == 1:
+                await run_single(group[0])
+                return
+            members = [analyses[queries[sparql_query][0]] for sparql_query in group]
+            years = [analysis["time_period"] for analysis in members]
+            # every member needs at most a page of rows; the extra row tells whether any were cut off
+            bound = MERGED_PAGE * len(group)
+            merged_query, _ = generator.generate_query(merged_analysis(members[0]), limit=bound + 1, years=years)
+            result = await limited(with_timeout(graphdb_backend.execute_async(merged_query), GRAPHDB_TIMEOUT,
+                                                {"error": f"Query timed out after {GRAPHDB_TIMEOUT}s", "query": merged_query}))
+            stats["merged_queries"] += 1
+            stats["backend_queries"] += 1
+            truncated = "error" not in result and len(result["results"]["bindings"]) > bound
+            rerun = []
+            for sparql_query, analysis, year in zip(group, members, years):
+                rows = split_rows(result, analysis, year, MERGED_PAGE)
+                # other years filled the bound, so this year may be missing rows: ask for it alone
+                if truncated and len(rows["results"]["bindings"]) < MERGED_PAGE:
+                    rerun.append(sparql_query)
+                else:
+                    results[sparql_query] = (rows, graphdb_backend.name)
+            await asyncio.gather(*(run_single(sparql_query) for sparql_query in rerun))
+
+        await timer.timed(query_backend.name, asyncio.gather(*(run_group(group) for group in groups)))
+
+        for sparql_query, query_indices in queries.items():
+            result, source = results[sparql_query]
+            for i in query_indices:
+                body = {
+                    "sparql": sparql_query,
+                    "result": result,
+                    "visualization": visualizations[i],
+                    "analysis": analyses[i],
+                    "source": source,
+                    "model_feedback": None
+                }
+                if "error" not in result:
+                    result_cache.put(analysis_key(analyses[i], sparql_query), body)
+                bodies[i] = {**body, "route": routes[i]}
+
+    # model and template questions share the semaphore, so a slow model call delays only its own answer
+    llm_indices = [i for i, route in enumerate(routes) if route["path"] == LLM]
+    template_indices = [i for i, route in enumerate(routes) if route["path"] != LLM]
+    answers, _ = await asyncio.gather(
+        asyncio.gather(*(limited(answer_with_llm(req.questions[i], analyses[i], RequestTimer(stage_metrics)))
+                         for i in llm_indices)),
+        answer_templates(template_indices))
+    fallback = []
+    for i, body in zip(llm_indices, answers):
+        if "error" in body:
+            router.fallback(routes[i], body["error"])
+            fallback.append(i)
+        else:
+            bodies[i] = {**body, "route": routes[i]}
+            stats["llm"] += 1
+    if fallback:
+        await answer_templates(fallback)
+
+    return with_timings({"results": bodies, "batch": stats}, timer, request, response)
+
+@app.get("/ask/feedback/{job_id}")
+async def get_feedback(job_id: str):
+    job = feedback_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired feedback id")
+    return job
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return stage_metrics.render()
+
+@app.post("/cache/invalidate")
+def invalidate_cache(request: Request):
+    """ Called by the ingest scripts after new data is loaded.
+
+    With CACHE_ADMIN_TOKEN set the caller must send it in X-Cache-Token; without it only
+    local callers may invalidate.
+    """
+    if CACHE_ADMIN_TOKEN:
+        if not hmac.compare_digest(request.headers.get(CACHE_TOKEN_HEADER, ""), CACHE_ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid cache token")
+    elif request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Cache invalidation is local only without CACHE_ADMIN_TOKEN")
+    result_cache.invalidate()
+    warm_cache.invalidate()
+    return {"status": "OK", "cache": result_cache.stats(), "warm_cache": warm_cache.stats()}
+
 @app.get("/health")
 def health_check():
-    return {"status": "OK", "version": "2.1"}
+    return {"status": "OK", "version": "2.1", "cache": result_cache.stats(), "warm_cache": warm_cache.stats(),
+            "router": router.stats(), "feedback": feedback_jobs.stats()}
 
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True) 
\ No newline at end of file
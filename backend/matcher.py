@@ -0,0 +1,92 @@
+import os
+import re
+from typing import Dict, Iterable, List, Tuple
+
+
+def _trie_pattern(terms: Iterable[str]) -> str:
+    """ Regex alternation for terms, factored into a trie so matching cost does not grow with vocabulary size.
+
+    Longer terms are tried first at every branch, so the longest term wins.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node) -> str:
+        terminal = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if terminal else body
+
+    return build(trie)
+
+
+class PhraseMatcher:
+    """ Finds every known phrase in a text in a single regex pass.
+
+    Phrases only match at a word start, so "men" is not found inside "women".
+    English (ASCII) phrases must also end on a word boundary; Macedonian phrases
+    may carry an inflection suffix ("маларија" matches "маларијата").
+    """
+
+    def __init__(self, phrases: Dict[str, List[Tuple[str, str]]]):
+        # phrase -> [(category, value), ...]
+        self.phrases = {phrase.lower(): tags for phrase, tags in phrases.items()}
+        ascii_terms = [p for p in self.phrases if p.isascii()]
+        other_terms = [p for p in self.phrases if not p.isascii()]
+
+        alternatives = []
+        if ascii_terms:
+            alternatives.append(f"({_trie_pattern(ascii_terms)})(?!\\w)")
+        if other_terms:
+            alternatives.append(f"({_trie_pattern(other_terms)})\\w*")
+        pattern = "(?<!\\w)(?:" + "|".join(alternatives) + ")" if alternatives else "(?!)"
+        self.regex = re.compile(pattern)
+
+    def find(self, text: str) -> List[Tuple[str, str]]:
+        """ (category, value) tags in order of appearance in text """
+        found = []
+        for match in self.regex.finditer(text.lower()):
+            phrase = match.group(match.lastindex)
+            found.extend(self.phrases[phrase])
+        return found
+
+    def unmatched_words(self, text: str) -> List[str]:
+        """ Words of text not covered by any known phrase """
+        text = text.lower()
+        words, start = [], 0
+        for match in self.regex.finditer(text):
+            words.extend(re.findall(r"\w+", text[start:match.start()]))
+            start = match.end()
+        words.extend(re.findall(r"\w+", text[start:]))
+        return words
+
+
+def build_phrases(vocabularies: Dict[str, Dict[str, str]]) -> Dict[str, List[Tuple[str, str]]]:
+    """ Merge {category: {phrase: value}} into {phrase: [(category, value), ...]} """
+    phrases = {}
+    for category, vocabulary in vocabularies.items():
+        for phrase, value in vocabulary.items():
+            tags = phrases.setdefault(phrase.lower(), [])
+            if (category, value) not in tags:
+                tags.append((category, value))
+    return phrases
+
+
+def load_vocabulary(path: str) -> Dict[str, Dict[str, str]]:
+    """ Read the entity index written by scripts/build_vocabulary.py into {category: {phrase: value}} """
+    vocabularies = {}
+    if not os.path.exists(path):
+        return vocabularies
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) == 3:
+                category, phrase, value = parts
+                vocabularies.setdefault(category, {})[phrase] = value
+    return vocabularies
@@ -0,0 +1,97 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+# Upper bounds in seconds, from sub-millisecond cache hits to GraphDB/LLM timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Request header that asks for the per-request timing breakdown in the response
+TIMING_HEADER = "X-Debug-Timing"
+
+
+class StageMetrics:
+    """ Per-stage latency histograms, rendered in the Prometheus text exposition format """
+
+    def __init__(self, name: str = "ask_stage_duration_seconds", buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._sums = {}
+        self._totals = {}
+
+    def observe(self, stage: str, seconds: float):
+        with self._lock:
+            counts = self._counts.setdefault(stage, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            self._sums[stage] = self._sums.get(stage, 0.0) + seconds
+            self._totals[stage] = self._totals.get(stage, 0) + 1
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} Time spent in each /ask pipeline stage.",
+                 f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for stage in sorted(self._counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets, self._counts[stage]):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {self._totals[stage]}')
+                lines.append(f'{self.name}_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+                lines.append(f'{self.name}_count{{stage="{stage}"}} {self._totals[stage]}')
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """ Times the stages of one request and feeds them into the shared histograms """
+
+    def __init__(self, metrics: StageMetrics):
+        self.metrics = metrics
+        self.timings: Dict[str, float] = {}
+        self._start = time.perf_counter()
+
+    def record(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+        self.metrics.observe(stage, seconds)
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    async def timed(self, name: str, awaitable):
+        """ Await and time a call that may run concurrently with other stages """
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def finish(self) -> Dict[str, float]:
+        self.record("total", time.perf_counter() - self._start)
+        return self.breakdown()
+
+    def breakdown(self) -> Dict[str, float]:
+        """ Stage timings in milliseconds """
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.timings.items()}
+
+    def server_timing(self) -> str:
+        """ Value for the standard Server-Timing response header """
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.breakdown().items())
+
+
+def with_timings(body: Dict, timer: RequestTimer, request, response) -> Dict:
+    """ Record the request total; add the stage breakdown when the client sent the timing header """
+    timer.finish()
+    if request.headers.get(TIMING_HEADER, "").lower() not in ["1", "true", "yes"]:
+        return body
+    response.headers["Server-Timing"] = timer.server_timing()
+    return {**body, "timings": timer.breakdown()}
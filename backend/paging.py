@@ -0,0 +1,71 @@
+import base64
+import json
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+NDJSON = "application/x-ndjson"
+
+
+def encode_cursor(offset: int, page_size: int) -> str:
+    """ Opaque cursor for the page starting at offset """
+    raw = json.dumps({"offset": offset, "page_size": page_size}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """ (offset, page_size) of a cursor from encode_cursor; ValueError if it is not one """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        offset, page_size = int(data["offset"]), int(data["page_size"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if offset < 0 or page_size < 1:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset, page_size
+
+
+def page_info(result: Dict, limit: int, offset: int) -> Dict:
+    """ The "page" field of a paginated /ask response; next_cursor is None on the last page """
+    rows = len(result.get("results", {}).get("bindings", []))
+    next_cursor = encode_cursor(offset + limit, limit) if "error" not in result and rows == limit else None
+    return {"offset": offset, "size": limit, "rows": rows, "next_cursor": next_cursor}
+
+
+def is_error(item: Dict) -> bool:
+    # binding values are term dicts, so a string "error" can only be a backend error
+    return isinstance(item.get("error"), str)
+
+
+async def result_items(result: Dict) -> AsyncIterator[Dict]:
+    """ A complete SPARQL JSON result in the item order of QueryBackend.stream_async """
+    if is_error(result):
+        yield result
+        return
+    yield {"head": result["head"]}
+    for binding in result["results"]["bindings"]:
+        yield binding
+
+
+async def ndjson_lines(header: Dict, items: AsyncIterator[Dict], on_finish=None) -> AsyncIterator[bytes]:
+    """ Streamed /ask body: header + SPARQL head, one line per binding, then a trailer with the row count """
+    rows = 0
+    error: Optional[Dict] = None
+    try:
+        async for item in items:
+            if is_error(item):
+                error = item
+                break
+            if rows == 0 and "head" in item and header is not None:
+                yield (json.dumps({**header, "head": item["head"]}, ensure_ascii=False) + "\n").encode()
+                header = None
+                continue
+            rows += 1
+            yield (json.dumps(item, ensure_ascii=False) + "\n").encode()
+        if header is not None and error is not None:
+            yield (json.dumps(header, ensure_ascii=False) + "\n").encode()
+        trailer = {"done": error is None, "rows": rows}
+        if error is not None:
+            trailer["error"] = error
+        yield (json.dumps(trailer, ensure_ascii=False) + "\n").encode()
+    finally:
+        if on_finish is not None:
+            on_finish()
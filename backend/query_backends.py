@@ -0,0 +1,365 @@
+import asyncio
+import os
+import re
+import sys
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import requests
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data"))
+# The ingest scripts, whose dataset discovery the local backend reads data/ with
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts")
+
+# SPARQL variable -> IHME CSV column
+IHME_COLUMNS = {
+    "causeName": "cause_name",
+    "location": "location_name",
+    "measure": "measure_name",
+    "year": "year",
+    "sex": "sex_name",
+    "value": "val",
+}
+
+
+# Rows per chunk when a backend streams results it holds in memory
+STREAM_CHUNK_ROWS = 10000
+
+
+# Order of GROUP BY (and SELECT) variables in aggregated queries
+GROUP_ORDER = ["causeName", "measure", "sex", "location", "year"]
+
+
+def query_plan(analysis: Dict, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+    """ The filter/group/aggregate plan SPARQLGenerator encodes in its query, as plain data.
+
+    Keys of "filters" and entries of "group_by" are the SPARQL variable names. A filter is a
+    single value, or a list when the question names several (which aggregates then group by).
+    A limit of None means every row from offset on.
+    """
+    aggregation = analysis.get("aggregation") if analysis.get("aggregation") in ["sum", "avg"] else None
+    grouping = list(analysis.get("grouping", [])) if aggregation else []
+
+    def one_or_many(values: List):
+        return values[0] if len(values) == 1 else list(values)
+
+    filters = {}
+    if analysis.get("diseases"):
+        filters["causeName"] = one_or_many(analysis["diseases"])
+    if analysis.get("measures"):
+        filters["measure"] = one_or_many(analysis["measures"])
+    if analysis.get("locations") and "location" not in grouping:
+        filters["location"] = one_or_many(analysis["locations"])
+    if analysis.get("time_period"):
+        filters["year"] = int(analysis["time_period"])
+
+    # several diseases, measures or locations are compared, not summed together
+    multiple = [var for var in ["causeName", "measure", "location"] if isinstance(filters.get(var), list)]
+    group_by = [var for var in GROUP_ORDER if var in grouping or (aggregation and var in multiple)]
+
+    return {
+        "filters": filters,
+        "group_by": group_by,
+        "aggregation": aggregation,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+# Variables of the non-aggregated SPARQLGenerator query, in SELECT order
+RAW_VARIABLES = ["value", "causeName", "location", "measure", "year", "sex"]
+
+
+def literal_binding(var: str, value) -> Dict:
+    """ SPARQL JSON binding for a value the way GraphDB returns it for our records """
+    if var == "value":
+        return {"type": "literal", "datatype": XSD + "float", "value": repr(float(value))}
+    if var == "year":
+        return {"type": "literal", "datatype": XSD + "gYear", "value": str(int(value))}
+    if var == "date":
+        return {"type": "literal", "datatype": XSD + "date", "value": str(value)}
+    return {"type": "literal", "value": str(value)}
+
+
+_TSV_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", '"': '"', "'": "'", "\\": "\\"}
+_TSV_LITERAL = re.compile(r'^"(.*)"(?:@([\w-]+)|\^\^<([^>]*)>)?$', re.DOTALL)
+
+
+def parse_tsv_term(term: str) -> Optional[Dict]:
+    """ SPARQL JSON binding for one field of a text/tab-separated-values result row; None if unbound """
+    if term == "":
+        return None
+    if term.startswith("<") and term.endswith(">"):
+        return {"type": "uri", "value": term[1:-1]}
+    if term.startswith("_:"):
+        return {"type": "bnode", "value": term[2:]}
+    match = _TSV_LITERAL.match(term)
+    if match:
+        value = re.sub(r"\\(.)", lambda m: _TSV_ESCAPES.get(m.group(1), m.group(1)), match.group(1))
+        binding = {"type": "literal", "value": value}
+        if match.group(2):
+            binding["xml:lang"] = match.group(2)
+        elif match.group(3):
+            binding["datatype"] = match.group(3)
+        return binding
+    # Turtle shorthand for numbers and booleans
+    if term in ["true", "false"]:
+        datatype = "boolean"
+    elif re.fullmatch(r"[+-]?\d+", term):
+        datatype = "integer"
+    elif "e" in term.lower():
+        datatype = "double"
+    else:
+        datatype = "decimal"
+    return {"type": "literal", "datatype": XSD + datatype, "value": term}
+
+
+class QueryBackend:
+    """ Runs the question plan and returns SPARQL JSON results ({"head": ..., "results": ...}).
+
+    limit/offset select the page; the SPARQL text SPARQLGenerator built for the same page
+    already carries them, backends that do not run the SPARQL apply them to the plan.
+    """
+    name = "base"
+
+    def run(self, analysis: Dict, sparql_query: str, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+        raise NotImplementedError
+
+    async def run_async(self, analysis: Dict, sparql_query: str, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+        """ Non-blocking run; backends without native async IO use a worker thread """
+        return await asyncio.to_thread(self.run, analysis, sparql_query, limit, offset)
+
+    async def stream_async(self, analysis: Dict, sparql_query: str, limit: Optional[int] = None,
+                           offset: int = 0) -> AsyncIterator[Dict]:
+        """ Yields {"head": {"vars": [...]}} first, then one SPARQL JSON binding per row.
+
+        An {"error": ...} item ends the stream early. This default runs the whole query;
+        backends override it to produce rows incrementally.
+        """
+        result = await self.run_async(analysis, sparql_query, limit, offset)
+        if "error" in result:
+            yield result
+            return
+        yield {"head": result["head"]}
+        for binding in result["results"]["bindings"]:
+            yield binding
+
+
+class GraphDBBackend(QueryBackend):
+    name = "graphdb"
+
+    def __init__(self, url: str, timeout: float = 120, client: httpx.AsyncClient = None):
+        self.url = url
+        self.timeout = timeout
+        # shared keep-alive pool, set by the app on startup
+        self.client = client
+
+    def run(self, analysis: Dict, sparql_query: str, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+        return self.execute(sparql_query)
+
+    async def run_async(self, analysis: Dict, sparql_query: str, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+        return await self.execute_async(sparql_query)
+
+    async def stream_async(self, analysis: Dict, sparql_query: str, limit: Optional[int] = None,
+                           offset: int = 0) -> AsyncIterator[Dict]:
+        async for item in self.stream_query(sparql_query):
+            yield item
+
+    async def stream_query(self, query: str) -> AsyncIterator[Dict]:
+        """ Rows of a SELECT query parsed line by line from GraphDB's TSV results, never buffered whole """
+        headers = {"Accept": "text/tab-separated-values"}
+        client = self.client or httpx.AsyncClient()
+        try:
+            async with client.stream("POST", self.url, data={"query": query}, headers=headers,
+                                     timeout=self.timeout) as response:
+                if response.status_code != 200:
+                    text = (await response.aread()).decode("utf-8", "replace")
+                    yield {"error": f"GraphDB HTTP {response.status_code}", "text": text, "query": query}
+                    return
+                variables = None
+                async for line in response.aiter_lines():
+                    line = line.rstrip("\r\n")
+                    if variables is None:
+                        variables = [var.lstrip("?$") for var in line.split("\t")]
+                        yield {"head": {"vars": variables}}
+                        continue
+                    if not line:
+                        continue
+                    binding = {}
+                    for var, term in zip(variables, line.split("\t")):
+                        parsed = parse_tsv_term(term)
+                        if parsed is not None:
+                            binding[var] = parsed
+                    yield binding
+        except httpx.HTTPError as e:
+            yield {"error": f"GraphDB connection failed: {e}", "query": query}
+        finally:
+            if client is not self.client:
+                await client.aclose()
+
+    async def execute_async(self, query: str) -> Dict:
+        headers = {"Accept": "application/sparql-results+json"}
+        try:
+            if self.client is None:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(self.url, data={"query": query}, headers=headers, timeout=self.timeout)
+            else:
+                response = await self.client.post(self.url, data={"query": query}, headers=headers, timeout=self.timeout)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"GraphDB HTTP {response.status_code}", "text": response.text, "query": query}
+        except httpx.HTTPError as e:
+            return {"error": f"GraphDB connection failed: {e}", "query": query}
+
+    def execute(self, query: str) -> Dict:
+        try:
+            headers = {"Accept": "application/sparql-results+json"}
+            response = requests.post(self.url, data={"query": query}, headers=headers, timeout=self.timeout)
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {"error": f"GraphDB HTTP {response.status_code}", "text": response.text, "query": query}
+        except requests.exceptions.RequestException as e:
+            return {"error": f"GraphDB connection failed: {e}", "query": query}
+
+
+def _dataset_frames(data_dir: str) -> List:
+    """ Records of every dataset under data_dir the /ask templates match, with the IHME GBD columns.
+
+    Datasets are found and read by the ingest scripts' own discovery (scripts/datasets.py). The
+    malaria and lung cancer records have no dis:measure, so no template query matches them in
+    GraphDB either; the daily COVID series are answered by the timeseries store.
+    """
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.append(SCRIPTS_DIR)
+    from datasets import discover, read_csv
+    from cause_of_deaths import health_records
+
+    sources = discover(data_dir)
+    frames = [read_csv(source, usecols=list(IHME_COLUMNS.values())) for source in sources.get("ihme", [])]
+    frames.extend(health_records(read_csv(source)) for source in sources.get("cause_of_deaths", []))
+    return frames
+
+
+class LocalBackend(QueryBackend):
+    """ In-process pandas table of the health records, queried without a triple store.
+
+    Text dimensions are categoricals, so filters compare small integer codes
+    instead of strings. The table is loaded on first use. A question about a cause the
+    table does not hold gets an error result rather than an empty answer.
+    """
+    name = "local"
+
+    def __init__(self, data_dir: str = DATA_DIR, frame=None):
+        self.data_dir = data_dir
+        self._frame = frame
+        self._causes = None
+
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self.load(self.data_dir)
+        return self._frame
+
+    @staticmethod
+    def load(data_dir: str):
+        import pandas as pd
+
+        frames = _dataset_frames(data_dir)
+        usecols = list(IHME_COLUMNS.values())
+        if frames:
+            df = pd.concat(frames, ignore_index=True)
+        else:
+            df = pd.DataFrame({col: [] for col in usecols})
+        df = df.rename(columns={col: var for var, col in IHME_COLUMNS.items()})
+        for var in ["causeName", "location", "measure", "sex"]:
+            df[var] = df[var].astype("category")
+        df["year"] = df["year"].astype("int16")
+        df["value"] = df["value"].astype("float64")
+        return df
+
+    def _matched(self, plan: Dict):
+        df = self.frame
+        mask = None
+        for var, value in plan["filters"].items():
+            condition = df[var].isin(value) if isinstance(value, list) else df[var] == value
+            mask = condition if mask is None else mask & condition
+        return df[mask] if mask is not None else df
+
+    @staticmethod
+    def _page(frame, plan: Dict):
+        end = plan["offset"] + plan["limit"] if plan["limit"] is not None else None
+        return frame.iloc[plan["offset"]:end]
+
+    @staticmethod
+    def _bindings(frame, variables: List[str]) -> List[Dict]:
+        columns = [frame[var].tolist() for var in variables]
+        return [{var: literal_binding(var, val) for var, val in zip(variables, values)}
+                for values in zip(*columns)]
+
+    def uncovered(self, plan: Dict) -> Optional[Dict]:
+        """ Error result for a plan naming causes the table does not hold, else None """
+        value = plan["filters"].get("causeName")
+        causes = value if isinstance(value, list) else [value] if value is not None else []
+        if self._causes is None:
+            self._causes = set(self.frame["causeName"].unique())
+        missing = [cause for cause in causes if cause not in self._causes]
+        if missing:
+            return {"error": f"Not covered by the local backend: {', '.join(missing)}", "causes": missing}
+        return None
+
+    def run(self, analysis: Dict, sparql_query: str, limit: Optional[int] = 20, offset: int = 0) -> Dict:
+        plan = query_plan(analysis, limit, offset)
+        error = self.uncovered(plan)
+        if error is not None:
+            return error
+        matched = self._matched(plan)
+
+        if plan["aggregation"]:
+            return self._aggregate(matched, plan)
+
+        rows = self._page(matched, plan)
+        return {"head": {"vars": RAW_VARIABLES}, "results": {"bindings": self._bindings(rows, RAW_VARIABLES)}}
+
+    async def stream_async(self, analysis: Dict, sparql_query: str, limit: Optional[int] = None,
+                           offset: int = 0) -> AsyncIterator[Dict]:
+        plan = query_plan(analysis, limit, offset)
+        if plan["aggregation"] or self.uncovered(plan) is not None:
+            async for item in super().stream_async(analysis, sparql_query, limit, offset):
+                yield item
+            return
+
+        # binding dicts are built one chunk at a time, not for the whole match at once
+        rows = await asyncio.to_thread(lambda: self._page(self._matched(plan), plan))
+        yield {"head": {"vars": RAW_VARIABLES}}
+        for start in range(0, len(rows), STREAM_CHUNK_ROWS):
+            for binding in self._bindings(rows.iloc[start:start + STREAM_CHUNK_ROWS], RAW_VARIABLES):
+                yield binding
+            await asyncio.sleep(0)
+
+    def _aggregate(self, matched, plan: Dict) -> Dict:
+        group_by = plan["group_by"]
+        func = "sum" if plan["aggregation"] == "sum" else "mean"
+        variables = group_by + ["value"]
+
+        if not group_by:
+            # SUM/AVG over no records is 0 in SPARQL
+            value = getattr(matched["value"], func)() if len(matched) else 0
+            bindings = [{"value": literal_binding("value", value)}] if plan["offset"] == 0 else []
+            return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+        grouped = self._page(matched.groupby(group_by, observed=True)["value"].agg(func), plan).reset_index()
+        return {"head": {"vars": variables}, "results": {"bindings": self._bindings(grouped, variables)}}
+
+
+def get_backend(name: Optional[str] = None, graphdb: GraphDBBackend = None) -> QueryBackend:
+    """ Backend selected by name or the QUERY_BACKEND env var ("graphdb" or "local") """
+    name = (name or os.getenv("QUERY_BACKEND", "graphdb")).lower()
+    if name == LocalBackend.name:
+        return LocalBackend()
+    if name == GraphDBBackend.name:
+        return graphdb
+    raise ValueError(f"Unknown query backend: {name}")
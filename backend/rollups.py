@@ -0,0 +1,110 @@
+import os
+import sqlite3
+from typing import Dict, Optional
+
+from query_backends import query_plan, literal_binding
+
+ROLLUP_DB = os.getenv("ROLLUP_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "rollups.sqlite"))
+
+# SPARQL variable -> rollup column
+ROLLUP_COLUMNS = {
+    "causeName": "cause",
+    "measure": "measure",
+    "location": "location",
+    "year": "year",
+    "sex": "sex",
+}
+
+
+# SPARQL variable -> rollup_coverage dimension; a filter on any other value is left to GraphDB
+COVERED_FILTERS = {
+    "causeName": "cause",
+    "location": "location",
+}
+
+
+class RollupStore:
+    """ Answers sum/avg analyses from the rollup tables written by scripts/build_rollups.py.
+
+    Only the datasets rolled up at ingest are in the tables, so a question about a cause or
+    location they do not cover is not answered here. Results use the SPARQL JSON results
+    layout so /ask clients see the same shape whether the answer came from here or from GraphDB.
+    """
+
+    def __init__(self, db_path: str = ROLLUP_DB):
+        self.db_path = db_path
+        self.conn = None
+        # dimension -> values rolled up; None for tables written before coverage was recorded
+        self.covered = None
+        if os.path.exists(db_path):
+            self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+            try:
+                rows = self.conn.execute("SELECT dimension, value FROM rollup_coverage").fetchall()
+            except sqlite3.Error:
+                rows = None
+            if rows is not None:
+                self.covered = {dimension: set() for dimension in COVERED_FILTERS.values()}
+                for dimension, value in rows:
+                    self.covered.setdefault(dimension, set()).add(value)
+
+    @property
+    def available(self) -> bool:
+        return self.conn is not None
+
+    def covers(self, plan: Dict) -> bool:
+        if self.covered is None:
+            return False
+        for var, dimension in COVERED_FILTERS.items():
+            value = plan["filters"].get(var)
+            values = value if isinstance(value, list) else [value] if value is not None else []
+            if not set(map(str, values)) <= self.covered[dimension]:
+                return False
+        return True
+
+    def can_answer(self, analysis: Dict) -> bool:
+        return (self.available and analysis.get("aggregation") in ["sum", "avg"]
+                and self.covers(query_plan(analysis)))
+
+    def answer(self, analysis: Dict, limit: Optional[int] = 20, offset: int = 0) -> Optional[Dict]:
+        """ Same rows the SPARQLGenerator aggregation query returns, or None to fall back to GraphDB """
+        if not self.can_answer(analysis):
+            return None
+
+        plan = query_plan(analysis, limit, offset)
+        group_by = plan["group_by"]
+        group_cols = [ROLLUP_COLUMNS[var] for var in group_by]
+
+        where, params = [], []
+        for var, value in plan["filters"].items():
+            if isinstance(value, list):
+                where.append(f"{ROLLUP_COLUMNS[var]} IN ({', '.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                where.append(f"{ROLLUP_COLUMNS[var]} = ?")
+                params.append(value)
+
+        agg = "SUM(value_sum)" if plan["aggregation"] == "sum" else "SUM(value_sum) / SUM(value_count)"
+        sql = f"SELECT {', '.join(group_cols + [agg])} FROM rollup"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if group_cols:
+            # same order as the paged SPARQL query; SQLite reads LIMIT -1 as no limit
+            limit = int(plan["limit"]) if plan["limit"] is not None else -1
+            sql += f" GROUP BY {', '.join(group_cols)} ORDER BY {', '.join(group_cols)}"
+            sql += f" LIMIT {limit} OFFSET {int(plan['offset'])}"
+        elif plan["offset"]:
+            return {"head": {"vars": ["value"]}, "results": {"bindings": []}}
+
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.Error:
+            return None
+
+        bindings = []
+        for row in rows:
+            binding = {var: literal_binding(var, val) for var, val in zip(group_by, row)}
+            # SUM/AVG over no records is 0 in SPARQL
+            binding["value"] = literal_binding("value", row[-1] if row[-1] is not None else 0)
+            bindings.append(binding)
+
+        return {"head": {"vars": group_by + ["value"]}, "results": {"bindings": bindings}}
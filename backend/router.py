@@ -0,0 +1,90 @@
+import threading
+from typing import Dict, List
+
+from matcher import PhraseMatcher
+
+# Question words that carry no entity, in English and Macedonian
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "at", "for", "to", "from", "and", "or", "with", "per",
+    "what", "which", "how", "many", "much", "is", "are", "was", "were", "be", "been", "do", "does", "did",
+    "show", "me", "give", "list", "tell", "get", "find", "all", "between", "during", "year", "years",
+    "number", "people", "there", "s",
+    "колку", "која", "кои", "што", "каде", "во", "на", "од", "за", "и", "или", "со", "по", "помеѓу",
+    "прикажи", "покажи", "ми", "е", "се", "беа", "биле", "година", "години", "луѓе", "број",
+}
+
+# How much each recognized signal adds to the confidence of the template path
+WEIGHTS = {
+    "disease": 0.45,
+    "measure": 0.2,
+    "location": 0.15,
+    "coverage": 0.2,
+}
+
+TEMPLATE = "template"
+LLM = "llm"
+
+
+class Router:
+    """ Decides per question whether the template fast path can answer it or the LLM is needed.
+
+    Confidence is built from what analyze_question recognized (disease, measure, location) and
+    how much of the question the vocabulary covers. Questions at or above threshold go to the
+    template path; the rest go to the model.
+    """
+
+    def __init__(self, matcher: PhraseMatcher, threshold: float = 0.6):
+        self.matcher = matcher
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.counts = {TEMPLATE: 0, LLM: 0}
+        self.fallbacks = 0
+
+    def unmatched_words(self, question: str) -> List[str]:
+        """ Content words of the question that no vocabulary phrase explains """
+        return [word for word in self.matcher.unmatched_words(question)
+                if word not in STOPWORDS and not word.isdigit()]
+
+    def score(self, question: str, analysis: Dict) -> Dict:
+        matched = sum(1 for _ in self.matcher.regex.finditer(question.lower()))
+        unmatched = self.unmatched_words(question)
+        coverage = matched / (matched + len(unmatched)) if matched + len(unmatched) else 0.0
+
+        signals = {
+            "disease": bool(analysis.get("diseases")),
+            "measure": bool(analysis.get("measures")),
+            "location": bool(analysis.get("locations")) or "location" in analysis.get("grouping", []),
+            "coverage": round(coverage, 3),
+            "unmatched": unmatched,
+        }
+        confidence = sum(WEIGHTS[name] for name in ["disease", "measure", "location"] if signals[name])
+        confidence += WEIGHTS["coverage"] * coverage
+        return {"confidence": round(confidence, 3), "signals": signals}
+
+    def route(self, question: str, analysis: Dict) -> Dict:
+        decision = self.score(question, analysis)
+        decision["path"] = TEMPLATE if decision["confidence"] >= self.threshold else LLM
+        with self._lock:
+            self.counts[decision["path"]] += 1
+        return decision
+
+    def fallback(self, decision: Dict, reason: str):
+        """ The LLM path failed and the question was answered by the templates after all """
+        with self._lock:
+            self.counts[LLM] -= 1
+            self.counts[TEMPLATE] += 1
+            self.fallbacks += 1
+        decision["path"] = TEMPLATE
+        decision["fallback"] = reason
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = sum(self.counts.values())
+            return {
+                "threshold": self.threshold,
+                "total": total,
+                **self.counts,
+                "fallbacks": self.fallbacks,
+                "template_rate": round(self.counts[TEMPLATE] / total, 4) if total else 0.0,
+                "llm_rate": round(self.counts[LLM] / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,234 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from matcher import PhraseMatcher
+
+SPARQL_CACHE_DB = os.getenv("SPARQL_CACHE_DB",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "sparql_cache.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sparql_cache (
+    id INTEGER PRIMARY KEY,
+    normalized TEXT NOT NULL UNIQUE,
+    question TEXT NOT NULL,
+    sparql TEXT NOT NULL,
+    visualization TEXT NOT NULL,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    hits INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+"""
+
+
+def normalize_question(question: str) -> str:
+    """ Lowercase, drop punctuation and collapse whitespace: "Malaria deaths?" == "malaria  deaths" """
+    return " ".join(re.findall(r"\w+", question.lower()))
+
+
+def _trigrams(text: str) -> Counter:
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _numbers(text: str) -> frozenset:
+    return frozenset(re.findall(r"\d+", text))
+
+
+# PhraseMatcher categories that change the answer; a similar question must name exactly the same ones
+ENTITY_CATEGORIES = frozenset(["diseases", "locations", "measures", "gender", "ages"])
+
+
+class SemanticSparqlCache:
+    """ Persistent question -> (cleaned SPARQL, visualization) cache for the LLM service.
+
+    Lookups first try the normalized question, then the most similar earlier question by
+    character-trigram cosine similarity. Similar questions only match when they mention the
+    same numbers and the same entities (matcher tags in ENTITY_CATEGORIES), so "deaths in 2015"
+    never reuses the query for "deaths in 2016", nor "deaths among men" the one for "among women".
+    Least recently used entries are evicted beyond max_entries; pinned (verified) ones never are.
+
+    Hits are counted in memory and written every flush_every hits or flush_interval seconds
+    (and on store, pin, stats and flush), so lookups do not take the database write lock.
+    """
+
+    def __init__(self, db_path: str = SPARQL_CACHE_DB, threshold: float = 0.9, max_entries: int = 5000,
+                 matcher: Optional[PhraseMatcher] = None, flush_every: int = 100, flush_interval: float = 60.0):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.matcher = matcher or PhraseMatcher({})
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+        # unwritten hits: id -> (hit count, last used)
+        self._pending = {}
+        self._pending_hits = 0
+        self._flushed = time.monotonic()
+
+        # in-memory similarity index: trigram -> ids, id -> (vector, norm, numbers, entities)
+        self._postings = {}
+        self._vectors = {}
+        self._ids = {}
+        self._reindex()
+
+    def use_matcher(self, matcher: PhraseMatcher):
+        """ Recognize entities with matcher from now on, e.g. the /ask analyzer's so both agree """
+        with self._lock:
+            self.matcher = matcher
+            self._reindex()
+
+    def _reindex(self):
+        self._postings, self._vectors, self._ids = {}, {}, {}
+        for entry_id, normalized, question in self.conn.execute("SELECT id, normalized, question FROM sparql_cache"):
+            self._index(entry_id, normalized, question)
+
+    def _entities(self, question: str) -> frozenset:
+        return frozenset(tag for tag in self.matcher.find(question) if tag[0] in ENTITY_CATEGORIES)
+
+    def _index(self, entry_id: int, normalized: str, question: str):
+        vector = _trigrams(normalized)
+        norm = math.sqrt(sum(c * c for c in vector.values()))
+        self._vectors[entry_id] = (vector, norm, _numbers(normalized), self._entities(question))
+        self._ids[normalized] = entry_id
+        for gram in vector:
+            self._postings.setdefault(gram, set()).add(entry_id)
+
+    def _unindex(self, entry_id: int, normalized: str):
+        vector = self._vectors.pop(entry_id, (Counter(),))[0]
+        self._ids.pop(normalized, None)
+        self._pending.pop(entry_id, None)
+        for gram in vector:
+            ids = self._postings.get(gram)
+            if ids:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def _most_similar(self, normalized: str, question: str):
+        vector = _trigrams(normalized)
+        norm = math.sqrt(sum(c * c for c in vector.values()))
+        numbers = _numbers(normalized)
+        entities = self._entities(question)
+        scores = Counter()
+        for gram, count in vector.items():
+            for entry_id in self._postings.get(gram, ()):
+                scores[entry_id] += count * self._vectors[entry_id][0][gram]
+
+        best_id, best_score = None, 0.0
+        for entry_id, dot in scores.items():
+            _, other_norm, other_numbers, other_entities = self._vectors[entry_id]
+            if other_numbers != numbers or other_entities != entities or not norm or not other_norm:
+                continue
+            score = dot / (norm * other_norm)
+            if score > best_score:
+                best_id, best_score = entry_id, score
+        return best_id, best_score
+
+    def lookup(self, question: str) -> Optional[Dict]:
+        normalized = normalize_question(question)
+        with self._lock:
+            entry_id = self._ids.get(normalized)
+            match, score = "exact", 1.0
+            if entry_id is None:
+                entry_id, score = self._most_similar(normalized, question)
+                match = "similar"
+                if entry_id is None or score < self.threshold:
+                    self.misses += 1
+                    return None
+
+            row = self.conn.execute("SELECT question, sparql, visualization, pinned FROM sparql_cache WHERE id = ?",
+                                    (entry_id,)).fetchone()
+            hits, _ = self._pending.get(entry_id, (0, None))
+            self._pending[entry_id] = (hits + 1, time.time())
+            self._pending_hits += 1
+            if (self._pending_hits >= self.flush_every
+                    or time.monotonic() - self._flushed >= self.flush_interval):
+                self._flush()
+            if match == "exact":
+                self.exact_hits += 1
+            else:
+                self.similar_hits += 1
+
+        return {"sparql": row[1], "visualization": row[2], "matched_question": row[0],
+                "pinned": bool(row[3]), "match": match, "similarity": round(score, 4)}
+
+    def store(self, question: str, sparql: str, visualization: str, pinned: bool = False):
+        normalized = normalize_question(question)
+        now = time.time()
+        with self._lock:
+            self._flush()
+            self.conn.execute("""
+                INSERT INTO sparql_cache (normalized, question, sparql, visualization, pinned, created, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (normalized) DO UPDATE SET
+                    sparql = excluded.sparql, visualization = excluded.visualization,
+                    pinned = MAX(pinned, excluded.pinned), last_used = excluded.last_used
+                WHERE NOT sparql_cache.pinned OR excluded.pinned
+            """, (normalized, question, sparql, visualization, int(pinned), now, now))
+            entry_id = self.conn.execute("SELECT id FROM sparql_cache WHERE normalized = ?", (normalized,)).fetchone()[0]
+            if entry_id not in self._vectors:
+                self._index(entry_id, normalized, question)
+            self._evict()
+            self.conn.commit()
+
+    def pin(self, question: str, pinned: bool = True) -> bool:
+        """ Mark a verified query so it is never evicted or overwritten by model output """
+        with self._lock:
+            self._flush()
+            cursor = self.conn.execute("UPDATE sparql_cache SET pinned = ? WHERE normalized = ?",
+                                       (int(pinned), normalize_question(question)))
+            self.conn.commit()
+            return cursor.rowcount > 0
+
+    def flush(self):
+        """ Write the hit counts and last-used times collected since the last flush """
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.conn.executemany("UPDATE sparql_cache SET hits = hits + ?, last_used = MAX(last_used, ?) WHERE id = ?",
+                                  [(hits, last_used, entry_id) for entry_id, (hits, last_used) in self._pending.items()])
+            self.conn.commit()
+        self._pending = {}
+        self._pending_hits = 0
+        self._flushed = time.monotonic()
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM sparql_cache").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        victims = self.conn.execute("""
+            SELECT id, normalized FROM sparql_cache WHERE NOT pinned
+            ORDER BY last_used LIMIT ?
+        """, (count - self.max_entries,)).fetchall()
+        for entry_id, normalized in victims:
+            self.conn.execute("DELETE FROM sparql_cache WHERE id = ?", (entry_id,))
+            self._unindex(entry_id, normalized)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._flush()
+            entries, pinned = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(pinned), 0) FROM sparql_cache").fetchone()
+            return {
+                "entries": entries,
+                "pinned": pinned,
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+            }
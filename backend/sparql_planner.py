@@ -0,0 +1,261 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+STATISTICS_FILE = os.getenv("STATISTICS_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "statistics.json"))
+DIMENSIONS_FILE = os.getenv("DIMENSIONS_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "dimensions.tsv"))
+
+# How the IHME records were loaded, see scripts/normalize.py: "literal" or "dimensions"
+GRAPH_ENCODING = os.getenv("GRAPH_ENCODING", "literal")
+
+DIS = "http://diseases.org/disease-kg/"
+
+# SPARQL variable -> dis: predicate of a HealthRecord
+PREDICATES = {
+    "causeName": "dis:causeName",
+    "location": "dis:location",
+    "measure": "dis:measure",
+    "year": "dis:year",
+    "sex": "dis:sex",
+    "value": "dis:value",
+}
+
+# With GRAPH_ENCODING=dimensions: SPARQL variable -> (dimension, record -> entity predicate)
+DIMENSION_PREDICATES = {
+    "causeName": ("cause", "dis:hasCause"),
+    "location": ("location", "dis:hasLocation"),
+    "measure": ("measure", "dis:hasMeasure"),
+    "sex": ("sex", "dis:hasSex"),
+}
+
+# Variables every record the templates return must have; year and sex are optional
+REQUIRED = ["causeName", "location", "measure", "value"]
+
+# Variables of the non-aggregated query, in SELECT order
+RAW_SELECT = ["value", "causeName", "location", "measure", "year", "sex"]
+
+# Without statistics: fewer distinct values means more records per value, so match the
+# dimensions with the most distinct values first
+DEFAULT_DISTINCT = {"location": 200, "year": 40, "causeName": 15, "measure": 6, "sex": 3}
+
+
+def sparql_literal(var: str, value) -> str:
+    """ The literal exactly as ingested, so it can be matched as a term in a triple pattern """
+    if var == "year":
+        return f'"{int(value)}"^^xsd:gYear'
+    escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"^^xsd:string'
+
+
+class CardinalityStats:
+    """ Ingest-time record counts per predicate value, written by scripts/build_statistics.py """
+
+    def __init__(self, path: str = STATISTICS_FILE, data: Optional[Dict] = None):
+        if data is None and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        data = data or {}
+        self.records = data.get("records", 0)
+        self.predicates = data.get("predicates", {})
+
+    @property
+    def available(self) -> bool:
+        return self.records > 0
+
+    def estimate(self, var: str, values: Optional[List] = None) -> float:
+        """ Expected number of records matching var (restricted to values, if given) """
+        if not self.available:
+            total = 1_000_000
+            if values is None:
+                return total
+            return total * len(values) / DEFAULT_DISTINCT.get(var, 10)
+        predicate = self.predicates.get(var)
+        if predicate is None:
+            return self.records
+        if values is None:
+            return predicate["records"]
+        # a value never seen at ingest matches nothing, so it is the best pattern to start from
+        return sum(predicate["values"].get(str(value), 0) for value in values)
+
+
+class DimensionIndex:
+    """ Label -> dimension entity IRIs, from the table scripts/build_dimensions.py writes at ingest """
+
+    def __init__(self, path: str = DIMENSIONS_FILE):
+        self.iris = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    dimension, entity_id, label = line.rstrip("\n").split("\t")
+                    self.iris.setdefault(dimension, {}).setdefault(label, []).append(f"<{DIS}{dimension}/{entity_id}>")
+
+    def lookup(self, dimension: str, labels: List) -> Optional[List[str]]:
+        """ IRIs of the entities with these labels; None when the dimension was not indexed """
+        if dimension not in self.iris:
+            return None
+        return [iri for label in labels for iri in self.iris[dimension].get(str(label), [])]
+
+
+class SparqlPlanner:
+    """ Renders a query_plan as SPARQL the store can answer from its indexes.
+
+    - single-valued filters become constant triple patterns instead of a trailing FILTER
+    - several values (multi-entity questions, batched years) become VALUES blocks
+    - patterns are ordered by estimated matching records, most selective first
+    - OPTIONAL year/sex are only added when the query returns or groups by them
+    - with encoding="dimensions" records are matched on dimension entity IRIs and labels are
+      only joined in for the variables the query returns; a UNION branch still matches the
+      records every encoding stores with literals (the Kaggle cause_of_deaths table)
+    """
+
+    def __init__(self, stats: CardinalityStats = None, encoding: str = GRAPH_ENCODING,
+                 dimensions: DimensionIndex = None):
+        self.stats = stats or CardinalityStats()
+        self.dimensions = (dimensions or DimensionIndex()) if encoding == "dimensions" else None
+
+    def dimension_patterns(self, var: str, value, needed: List[str]) -> Dict[str, List[str]]:
+        """ Patterns matching var on dimension entities: "values", "record", "labels" and "binds" lines """
+        dimension, predicate = DIMENSION_PREDICATES[var]
+        entity = f"?{var}Entity"
+        patterns = {"values": [], "record": [], "labels": [], "binds": []}
+        if value is None:
+            patterns["record"].append(f"    ?record {predicate} {entity} .")
+            if var in needed:
+                patterns["labels"].append(f"    {entity} rdfs:label ?{var} .")
+            return patterns
+
+        values = value if isinstance(value, list) else [value]
+        iris = self.dimensions.lookup(dimension, values)
+        if not iris:
+            # dimension not indexed, or labels never ingested: match the entity on its label
+            patterns["record"].append(f"    ?record {predicate} {entity} .")
+            if isinstance(value, list):
+                literals = " ".join(sparql_literal(var, v) for v in values)
+                patterns["values"].append(f"    VALUES ?{var} {{ {literals} }}")
+                patterns["labels"].append(f"    {entity} rdfs:label ?{var} .")
+            else:
+                patterns["labels"].append(f"    {entity} rdfs:label {sparql_literal(var, value)} .")
+        elif len(iris) == 1 and not isinstance(value, list):
+            patterns["record"].append(f"    ?record {predicate} {iris[0]} .")
+        else:
+            # several labels, or one label shared by several entities
+            patterns["values"].append(f"    VALUES {entity} {{ {' '.join(iris)} }}")
+            patterns["record"].append(f"    ?record {predicate} {entity} .")
+
+        if var in needed:
+            if not isinstance(value, list):
+                patterns["binds"].append(f"    BIND({sparql_literal(var, value)} AS ?{var})")
+            elif iris:
+                patterns["labels"].append(f"    {entity} rdfs:label ?{var} .")
+        return patterns
+
+    def where_clause(self, plan: Dict, needed: List[str]) -> str:
+        if self.dimensions is not None:
+            return self.dimension_where_clause(plan, needed)
+        return "WHERE {\n" + "\n".join(self.literal_patterns(plan, needed)) + "\n}"
+
+    def literal_patterns(self, plan: Dict, needed: List[str]) -> List[str]:
+        """ Group pattern lines matching records that store their dimensions as literals """
+        filters = plan["filters"]
+        values_blocks, bound, free, optional, binds = [], [], [], [], []
+        for var, value in filters.items():
+            values = value if isinstance(value, list) else [value]
+            estimate = self.stats.estimate(var, values)
+            if isinstance(value, list):
+                # VALUES goes first so it binds the variable for the whole group; one in the
+                # middle would split the basic graph pattern in two on some stores
+                literals = " ".join(sparql_literal(var, v) for v in values)
+                values_blocks.append(f"    VALUES ?{var} {{ {literals} }}")
+                pattern = f"    ?record {PREDICATES[var]} ?{var} ."
+            else:
+                pattern = f"    ?record {PREDICATES[var]} {sparql_literal(var, value)} ."
+                if var in needed:
+                    binds.append(f"    BIND({sparql_literal(var, value)} AS ?{var})")
+            bound.append((estimate, pattern))
+
+        for var in REQUIRED:
+            if var not in filters:
+                free.append((self.stats.estimate(var), f"    ?record {PREDICATES[var]} ?{var} ."))
+        for var in ["year", "sex"]:
+            if var not in filters and var in needed:
+                optional.append(f"    OPTIONAL {{ ?record {PREDICATES[var]} ?{var} }}")
+
+        lines = list(values_blocks)
+        lines.extend(pattern for _, pattern in sorted(bound, key=lambda item: item[0]))
+        lines.append("    ?record a dis:HealthRecord .")
+        lines.extend(pattern for _, pattern in sorted(free, key=lambda item: item[0]))
+        lines.extend(optional)
+        lines.extend(binds)
+        return lines
+
+    def dimension_where_clause(self, plan: Dict, needed: List[str]) -> str:
+        """ where_clause for dictionary-encoded records, UNION the records still stored with literals.
+
+        Only the IHME extracts carry the GBD ids the dimension entities are keyed on; the
+        cause_of_deaths records keep literals in either encoding. No record has both, so the
+        branches never match the same record twice.
+        """
+        branches = [self.encoded_patterns(plan, needed), self.literal_patterns(plan, needed)]
+        groups = ["    {\n" + "\n".join("    " + line for line in lines) + "\n    }" for lines in branches]
+        return "WHERE {\n" + "\n    UNION\n".join(groups) + "\n}"
+
+    def encoded_patterns(self, plan: Dict, needed: List[str]) -> List[str]:
+        """ Group pattern lines matching dictionary-encoded records, in the same selectivity order """
+        filters = plan["filters"]
+        patterns = {"values": [], "labels": [], "binds": []}
+        bound, free, optional = [], [], []
+
+        def add(var, value):
+            if var in DIMENSION_PREDICATES:
+                found = self.dimension_patterns(var, value, needed)
+            elif isinstance(value, list):
+                # year is still a literal on the record
+                literals = " ".join(sparql_literal(var, v) for v in value)
+                found = {"values": [f"    VALUES ?{var} {{ {literals} }}"],
+                         "record": [f"    ?record {PREDICATES[var]} ?{var} ."], "labels": [], "binds": []}
+            else:
+                term = f"?{var}" if value is None else sparql_literal(var, value)
+                found = {"values": [], "record": [f"    ?record {PREDICATES[var]} {term} ."], "labels": [],
+                         "binds": [f"    BIND({term} AS ?{var})"] if value is not None and var in needed else []}
+            for key in patterns:
+                patterns[key].extend(found[key])
+            return found["record"]
+
+        for var, value in filters.items():
+            bound.append((self.stats.estimate(var, value if isinstance(value, list) else [value]), add(var, value)))
+        for var in REQUIRED:
+            if var not in filters:
+                free.append((self.stats.estimate(var), add(var, None)))
+        for var in ["year", "sex"]:
+            if var not in filters and var in needed:
+                if var in DIMENSION_PREDICATES:
+                    _, predicate = DIMENSION_PREDICATES[var]
+                    optional.append(f"    OPTIONAL {{ ?record {predicate} ?{var}Entity . ?{var}Entity rdfs:label ?{var} }}")
+                else:
+                    optional.append(f"    OPTIONAL {{ ?record {PREDICATES[var]} ?{var} }}")
+
+        lines = list(patterns["values"])
+        for _, record in sorted(bound, key=lambda item: item[0]):
+            lines.extend(record)
+        lines.append("    ?record a dis:HealthRecord .")
+        for _, record in sorted(free, key=lambda item: item[0]):
+            lines.extend(record)
+        lines.extend(patterns["labels"])
+        lines.extend(optional)
+        lines.extend(patterns["binds"])
+        return lines
+
+    def render(self, plan: Dict, prefixes: str, page_clause: str) -> str:
+        if plan["aggregation"]:
+            group_vars = plan["group_by"]
+            agg_func = "SUM" if plan["aggregation"] == "sum" else "AVG"
+            select_clause = "SELECT " + " ".join([f"?{var}" for var in group_vars] + [f"({agg_func}(?value) AS ?value)"])
+            group_by_clause = ("GROUP BY " + " ".join(f"?{var}" for var in group_vars)) if group_vars else ""
+            where_clause = self.where_clause(plan, group_vars)
+            return f"{prefixes}\n{select_clause}\n{where_clause}\n{group_by_clause}\n{page_clause}"
+
+        select_clause = "SELECT " + " ".join(f"?{var}" for var in RAW_SELECT)
+        where_clause = self.where_clause(plan, RAW_SELECT)
+        return f"{prefixes}\n{select_clause}\n{where_clause}\n{page_clause}"
@@ -0,0 +1,38 @@
+import time
+from typing import Dict, Optional
+
+DEFAULT_SPARQL = """PREFIX dis: <http://diseases.org/disease-kg/>
+SELECT ?value ?causeName ?location ?measure ?year
+WHERE {
+    ?record a dis:HealthRecord ;
+            dis:value ?value ;
+            dis:causeName ?causeName ;
+            dis:location ?location ;
+            dis:measure ?measure .
+    OPTIONAL { ?record dis:year ?year }
+}
+LIMIT 20"""
+
+
+class StubModel:
+    """ Local stand-in for ask_huggingface with a fixed latency, for tests and load runs.
+
+    Answers in the same "SPARQL: ... VISUALIZATION: ..." format the real prompt asks for.
+    Canned answers can be given per question; anything else gets a generic query.
+    """
+
+    def __init__(self, latency: float = 0.0, answers: Optional[Dict[str, str]] = None,
+                 sparql: str = DEFAULT_SPARQL, visualization: str = "bar"):
+        self.latency = latency
+        self.answers = answers or {}
+        self.sparql = sparql
+        self.visualization = visualization
+        self.calls = 0
+
+    def __call__(self, question: str) -> str:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if question in self.answers:
+            return self.answers[question]
+        return f"SPARQL: {self.sparql}\nVISUALIZATION: {self.visualization}"
@@ -0,0 +1,166 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from query_backends import literal_binding
+
+TIMESERIES_FILE = os.getenv("TIMESERIES_FILE",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "timeseries.npz"))
+
+DISEASE = "COVID-19"
+GLOBAL = "Global"
+
+# /ask measure -> daily series its trend is drawn from
+MEASURE_METRICS = {"Deaths": "New deaths", "Incidence": "New cases", "Prevalence": "Active"}
+DEFAULT_METRIC = "New cases"
+
+# Counts at a point in time: a period takes its last day. The other metrics count events
+# per day and a period sums its days.
+STOCK_METRICS = {"Confirmed", "Deaths", "Recovered", "Active"}
+
+# /ask location -> name in the series (WHO regions)
+LOCATION_ALIASES = {"America": "Americas"}
+
+# Periods a trend is downsampled to: "day", "week", "month" or "year"
+DEFAULT_INTERVAL = "month"
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """ Trailing mean of the last window days along the last axis; the first days average the days there are """
+    sums = np.cumsum(values, axis=-1, dtype=float)
+    sums[..., window:] = sums[..., window:] - sums[..., :-window]
+    return sums / np.minimum(np.arange(1, values.shape[-1] + 1), window)
+
+
+def period_starts(dates: np.ndarray, interval: str) -> np.ndarray:
+    """ First day of the day, week (from Monday), month or year every date falls in """
+    if interval == "day":
+        return dates
+    if interval == "week":
+        # day 0, 1970-01-01, was a Thursday
+        return dates - (dates.astype(np.int64) + 3) % 7
+    unit = {"month": "M", "year": "Y"}[interval]
+    return dates.astype(f"datetime64[{unit}]").astype("datetime64[D]")
+
+
+def downsample(dates: np.ndarray, values: np.ndarray, interval: str, how: str = "sum") -> Tuple[np.ndarray, np.ndarray]:
+    """ One value per period along the last axis of values: the sum of its days, or its last day's value """
+    starts = period_starts(dates, interval)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    if how == "last":
+        return starts[first], values[..., np.r_[first[1:], len(dates)] - 1]
+    return starts[first], np.add.reduceat(values, first, axis=-1)
+
+
+class TimeSeriesStore:
+    """ Daily COVID series per location and metric, written by scripts/build_timeseries.py.
+
+    Each metric is a locations x days array indexed by the day offset from the first date, so
+    a date range is a slice and rolling means and week/month/year totals are computed for all
+    asked locations at once. Answers trend analyses in the SPARQL JSON results layout, one row
+    per location, metric and period, instead of GraphDB returning every daily record.
+    """
+
+    def __init__(self, path: str = TIMESERIES_FILE):
+        self.values = None
+        if os.path.exists(path):
+            with np.load(path) as data:
+                self.values = data["values"]
+                self.locations = {str(location): i for i, location in enumerate(data["locations"])}
+                self.metrics = {str(metric): i for i, metric in enumerate(data["metrics"])}
+                self.dates = data["start"].astype("datetime64[D]") + np.arange(self.values.shape[-1])
+
+    @property
+    def available(self) -> bool:
+        return self.values is not None
+
+    def day_slice(self, first: Optional[str] = None, last: Optional[str] = None) -> slice:
+        """ Day offsets from first to last (ISO dates, both included) """
+        start = 0 if first is None else int(np.searchsorted(self.dates, np.datetime64(first, "D")))
+        stop = len(self.dates) if last is None else int(np.searchsorted(self.dates, np.datetime64(last, "D"), "right"))
+        return slice(start, stop)
+
+    def series(self, locations: List[str], metric: str, first: Optional[str] = None,
+               last: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Dates and the daily values of metric between first and last, one row per location """
+        days = self.day_slice(first, last)
+        rows = [self.locations[location] for location in locations]
+        return self.dates[days], self.values[self.metrics[metric], rows, days]
+
+    def trend(self, locations: List[str], metric: str, first: Optional[str] = None, last: Optional[str] = None,
+              interval: str = DEFAULT_INTERVAL, window: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """ Period start dates and one value per location and period.
+
+        With a window, every day is first replaced by the mean of the window days up to it
+        (days before first included) and a period takes its last day's mean.
+        """
+        if not window:
+            dates, values = self.series(locations, metric, first, last)
+            return downsample(dates, values, interval, "last" if metric in STOCK_METRICS else "sum")
+        dates, values = self.series(locations, metric)
+        days = self.day_slice(first, last)
+        return downsample(dates[days], rolling_mean(values, window)[:, days], interval, "last")
+
+    def request(self, analysis: Dict) -> Optional[Dict]:
+        """ trend() arguments for a trend analysis, or None if the series cannot answer it """
+        if analysis.get("query_type") != "trend" or analysis.get("diseases") != [DISEASE]:
+            return None
+        if analysis.get("gender") or analysis.get("age_group"):
+            return None
+        locations = [LOCATION_ALIASES.get(location, location) for location in analysis.get("locations") or [GLOBAL]]
+        metrics = [MEASURE_METRICS.get(measure) for measure in analysis.get("measures") or []] or [DEFAULT_METRIC]
+        if any(location not in self.locations for location in locations) or None in metrics:
+            return None
+
+        first, last = None, None
+        years = analysis.get("time_range") or ([analysis["time_period"]] if analysis.get("time_period") else [])
+        if years:
+            # years outside the daily data are left to the yearly records in the graph
+            covered = self.dates[[0, -1]].astype("datetime64[Y]").astype(int) + 1970
+            if int(years[0]) < covered[0] or int(years[-1]) > covered[1]:
+                return None
+            first, last = f"{int(years[0])}-01-01", f"{int(years[-1])}-12-31"
+
+        window = analysis.get("rolling_window")
+        interval = analysis.get("interval") or ("day" if window else DEFAULT_INTERVAL)
+        return {"locations": locations, "metrics": metrics, "first": first, "last": last,
+                "interval": interval, "window": window}
+
+    def can_answer(self, analysis: Dict) -> bool:
+        return self.available and self.request(analysis) is not None
+
+    def answer(self, analysis: Dict, limit: Optional[int] = 20, offset: int = 0) -> Optional[Dict]:
+        """ Rows ordered by location, metric and period, or None to fall back to GraphDB.
+
+        Yearly trends have a year column like the graph's records. Shorter periods have a date
+        column instead, an xsd:date holding the first day of the day, week or month.
+        """
+        request = self.request(analysis) if self.available else None
+        if request is None:
+            return None
+
+        blocks = []
+        for metric in request["metrics"]:
+            periods, values = self.trend(request["locations"], metric, request["first"], request["last"],
+                                         request["interval"], request["window"])
+            blocks.append(values)
+        values = np.stack(blocks, axis=1)
+
+        period_var = "year" if request["interval"] == "year" else "date"
+        if period_var == "year":
+            periods = periods.astype("datetime64[Y]").astype(int) + 1970
+
+        flat = values.reshape(-1)
+        rows = np.arange(flat.size)[offset:None if limit is None else offset + limit]
+        bindings = []
+        for row, (location, metric, period) in zip(rows, zip(*np.unravel_index(rows, values.shape))):
+            bindings.append({
+                "causeName": literal_binding("causeName", DISEASE),
+                "location": literal_binding("location", request["locations"][location]),
+                "measure": literal_binding("measure", request["metrics"][metric]),
+                period_var: literal_binding(period_var, periods[period]),
+                "value": literal_binding("value", flat[row]),
+            })
+        return {"head": {"vars": ["causeName", "location", "measure", period_var, "value"]},
+                "results": {"bindings": bindings}}
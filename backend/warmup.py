@@ -0,0 +1,77 @@
+import os
+import sqlite3
+from typing import Dict, Iterator, List
+
+from semantic_cache import SPARQL_CACHE_DB
+
+# What the warm-up job precomputes besides the diseases: the measures and locations most
+# questions name, and the years a single-year question usually asks about
+WARMUP_MEASURES = ["Deaths", "Prevalence", "Incidence"]
+WARMUP_LOCATIONS = ["Global", "Europe", "Asia", "Africa", "America"]
+WARMUP_YEARS = range(2010, 2022)
+
+# Aggregations and groupings the templates answer, phrased the way QueryAnalysis reads them
+AGGREGATE_TEMPLATES = [
+    "total {disease} {measure} by sex",
+    "total {disease} {measure} by location",
+    "total {disease} {measure} over time",
+    "average {disease} {measure} in {location}",
+]
+
+
+def phrases_by_value(vocabulary: Dict[str, str]) -> Dict[str, str]:
+    """ Canonical value -> the shortest English phrase that QueryAnalysis maps to it """
+    phrases = {}
+    for phrase, value in vocabulary.items():
+        if phrase.isascii() and (value not in phrases or len(phrase) < len(phrases[value])):
+            phrases[value] = phrase
+    return phrases
+
+
+def history_questions(db_path: str = SPARQL_CACHE_DB, limit: int = 500) -> List[str]:
+    """ The questions asked most often, from the LLM service's semantic cache hit counts """
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute("SELECT question FROM sparql_cache ORDER BY hits DESC LIMIT ?", (limit,))]
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+def warmup_questions(analyzer, history: List[str] = ()) -> Iterator[str]:
+    """ Questions whose answers the warm-up job precomputes, most asked first.
+
+    Real questions from history come first, then the template combinations from the general
+    to the specific: disease, disease x measure, x location, the aggregations, and last every
+    single-year variant. Questions with the same analysis are answered once by the job.
+    """
+    diseases = phrases_by_value(analyzer.diseases)
+    measures = phrases_by_value(analyzer.measures)
+    locations = phrases_by_value(analyzer.locations)
+    measure_phrases = [measures[m] for m in WARMUP_MEASURES if m in measures]
+    location_phrases = [locations[loc] for loc in WARMUP_LOCATIONS if loc in locations]
+
+    yield from history
+    for disease in diseases.values():
+        yield disease
+    for disease in diseases.values():
+        for measure in measure_phrases:
+            yield f"{disease} {measure}"
+    for disease in diseases.values():
+        for measure in measure_phrases:
+            for location in location_phrases:
+                yield f"{disease} {measure} in {location}"
+    for template in AGGREGATE_TEMPLATES:
+        for disease in diseases.values():
+            for measure in measure_phrases:
+                for location in (location_phrases if "{location}" in template else [None]):
+                    yield template.format(disease=disease, measure=measure, location=location)
+    for year in reversed(WARMUP_YEARS):
+        for disease in diseases.values():
+            for measure in measure_phrases:
+                yield f"{disease} {measure} in {year}"
+                for location in location_phrases:
+                    yield f"{disease} {measure} in {location} in {year}"
@@ -0,0 +1,66 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from main import GRAPHDB_URL, QueryAnalysis, SPARQLGenerator  # noqa: E402
+from query_backends import GraphDBBackend, LocalBackend  # noqa: E402
+
+QUESTIONS = [
+    "tuberculosis deaths in Europe",
+    "diabetes deaths in 2015",
+    "total covid deaths by sex",
+    "total stroke deaths by location",
+    "average breast cancer prevalence in world",
+    "total leukemia deaths over time",
+    "prostate cancer incidence in Spain 2010",
+    "total stomach cancer deaths in Asia",
+]
+
+
+def bench(backend, plans, repeat: int):
+    timings, results = [], []
+    for analysis, sparql_query in plans:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = backend.run(analysis, sparql_query)
+        timings.append((time.perf_counter() - start) / repeat)
+        results.append(result)
+    return timings, results
+
+
+def rows_of(result):
+    return sorted(tuple(sorted((k, v["value"]) for k, v in b.items()))
+                  for b in result.get("results", {}).get("bindings", []))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /ask query backends side by side")
+    parser.add_argument("--graphdb", default=GRAPHDB_URL)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    analyzer, generator = QueryAnalysis(), SPARQLGenerator()
+    plans = []
+    for question in QUESTIONS:
+        analysis = analyzer.analyze_question(question)
+        plans.append((analysis, generator.generate_query(analysis)[0]))
+
+    local = LocalBackend()
+    start = time.perf_counter()
+    rows = len(local.frame)
+    print(f"local backend loaded {rows} records in {time.perf_counter() - start:.2f}s")
+
+    local_times, local_results = bench(local, plans, args.repeat)
+    graphdb_times, graphdb_results = bench(GraphDBBackend(args.graphdb), plans, 1)
+    graphdb_up = not any("error" in r for r in graphdb_results)
+
+    print(f"\n{'question':<45} {'local ms':>9} {'graphdb ms':>11} {'same rows':>10}")
+    for i, question in enumerate(QUESTIONS):
+        graphdb_ms = f"{graphdb_times[i] * 1000:.1f}" if graphdb_up else "n/a"
+        same = str(rows_of(local_results[i]) == rows_of(graphdb_results[i])) if graphdb_up else "n/a"
+        print(f"{question:<45} {local_times[i] * 1000:>9.2f} {graphdb_ms:>11} {same:>10}")
+    if not graphdb_up:
+        print(f"\nGraphDB not reachable at {args.graphdb}, only the local backend was timed")
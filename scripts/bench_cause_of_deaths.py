@@ -0,0 +1,56 @@
+import argparse
+import time
+
+from rdflib import Graph
+
+from cause_of_deaths import (CAUSE_OF_DEATHS_CSV, add_cause_of_deaths_rows, cause_of_deaths_frame_to_ntriples,
+                             melt_causes)
+from datasets import read_csv
+from normalize import DIS, SNOMED
+
+
+def bench_graph(df):
+    g = Graph()
+    g.bind("dis", DIS)
+    g.bind("snomed", SNOMED)
+    start = time.perf_counter()
+    g = add_cause_of_deaths_rows(df, g)
+    return g, time.perf_counter() - start
+
+
+def bench_vectorized(df, repeat: int):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        nt_data = cause_of_deaths_frame_to_ntriples(df)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return nt_data, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the wide-to-long cause_of_deaths converter")
+    parser.add_argument("--source", default=None, help="cause_of_deaths .csv (default: found under data/)")
+    parser.add_argument("--graph-rows", type=int, default=500, help="table rows for the per-cell rdflib path")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = read_csv(args.source or CAUSE_OF_DEATHS_CSV)
+    records = len(melt_causes(df))
+
+    nt_data, vector_seconds = bench_vectorized(df, args.repeat)
+    sample = df.head(args.graph_rows)
+    sample_records = len(melt_causes(sample))
+    g, graph_seconds = bench_graph(sample)
+
+    parsed = Graph()
+    parsed.parse(data=cause_of_deaths_frame_to_ntriples(sample), format="nt")
+    identical = set(parsed) == set(g)
+
+    print(f"table:            {len(df)} rows x {len(df.columns) - 3} causes = {records} records")
+    print(f"triples:          {nt_data.count(chr(10)):,} ({len(nt_data.encode('utf-8')) / 1e6:.1f} MB N-Triples)")
+    print(f"identical output: {identical} (first {len(sample)} rows, {len(g)} triples)")
+    graph_rate, vector_rate = sample_records / graph_seconds, records / vector_seconds
+    print(f"graph path:       {graph_rate:,.0f} records/s ({graph_seconds:.2f}s for {sample_records})")
+    print(f"vectorized path:  {vector_rate:,.0f} records/s ({vector_seconds:.2f}s for {records})")
+    print(f"speedup:          {vector_rate / graph_rate:.1f}x")
@@ -0,0 +1,58 @@
+import argparse
+import io
+import time
+import zipfile
+
+import pandas as pd
+from rdflib import Graph
+
+from normalize import DIS, SNOMED, convert_ihme_dataset, ihme_frame_to_ntriples
+
+
+def read_sample(path: str, rows: int) -> pd.DataFrame:
+    """ Read the first rows of an IHME CSV, or of the CSV member inside an IHME .zip """
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            member = next(name for name in archive.namelist() if name.endswith(".csv"))
+            with archive.open(member) as f:
+                return pd.read_csv(f, nrows=rows)
+    return pd.read_csv(path, nrows=rows)
+
+
+def bench_graph(csv_text: str):
+    g = Graph()
+    g.bind("dis", DIS)
+    g.bind("snomed", SNOMED)
+    start = time.perf_counter()
+    g = convert_ihme_dataset(io.StringIO(csv_text), g)
+    return g, time.perf_counter() - start
+
+
+def bench_vectorized(csv_text: str):
+    start = time.perf_counter()
+    nt_data = ihme_frame_to_ntriples(pd.read_csv(io.StringIO(csv_text)))
+    return nt_data, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare iterrows/Graph.add conversion with the vectorized N-Triples path")
+    parser.add_argument("dataset", help="IHME GBD .csv or .zip")
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    sample = read_sample(args.dataset, args.rows)
+    csv_text = sample.to_csv(index=False)
+
+    g, graph_seconds = bench_graph(csv_text)
+    nt_data, vector_seconds = bench_vectorized(csv_text)
+
+    parsed = Graph()
+    parsed.parse(data=nt_data, format="nt")
+    identical = set(parsed) == set(g)
+
+    print(f"rows:             {len(sample)}")
+    print(f"triples:          {len(g)} (graph) / {len(parsed)} (vectorized)")
+    print(f"identical output: {identical}")
+    print(f"graph path:       {len(sample) / graph_seconds:,.0f} rows/s ({graph_seconds:.2f}s)")
+    print(f"vectorized path:  {len(sample) / vector_seconds:,.0f} rows/s ({vector_seconds:.2f}s)")
+    print(f"speedup:          {graph_seconds / vector_seconds:.1f}x")
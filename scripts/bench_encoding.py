@@ -0,0 +1,54 @@
+import argparse
+import gzip
+import os
+import sys
+import time
+import zipfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from normalize import IHME_CONVERTERS  # noqa: E402
+from query_backends import DATA_DIR, _ihme_csv_sources  # noqa: E402
+
+
+def read_source(source, rows: int = None) -> pd.DataFrame:
+    if isinstance(source, tuple):
+        archive, member = source
+        with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+            return pd.read_csv(f, nrows=rows)
+    return pd.read_csv(source, nrows=rows)
+
+
+def measure(df: pd.DataFrame, encoding: str):
+    """ (triples, N-Triples bytes, gzip bytes, seconds) of one frame in one encoding """
+    start = time.perf_counter()
+    nt_data = IHME_CONVERTERS[encoding](df).encode("utf-8")
+    seconds = time.perf_counter() - start
+    return nt_data.count(b"\n"), len(nt_data), len(gzip.compress(nt_data, compresslevel=1)), seconds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Triple count and upload size of the literal and dimension-encoded IHME records")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--rows", type=int, default=None, help="rows per dataset (default all)")
+    args = parser.parse_args()
+
+    totals = {encoding: [0, 0, 0, 0.0] for encoding in IHME_CONVERTERS}
+    print(f"{'dataset':<36} {'rows':>8} {'literal triples':>16} {'encoded triples':>16} {'literal MB':>11} {'encoded MB':>11}")
+    for source in _ihme_csv_sources(args.data_dir):
+        df = read_source(source, args.rows)
+        results = {encoding: measure(df, encoding) for encoding in IHME_CONVERTERS}
+        for encoding, result in results.items():
+            totals[encoding] = [total + value for total, value in zip(totals[encoding], result)]
+        name = os.path.basename(source[0] if isinstance(source, tuple) else os.path.dirname(source))[:36]
+        print(f"{name:<36} {len(df):>8} {results['literal'][0]:>16,} {results['dimensions'][0]:>16,} "
+              f"{results['literal'][1] / 1e6:>11.1f} {results['dimensions'][1] / 1e6:>11.1f}")
+
+    literal, encoded = totals["literal"], totals["dimensions"]
+    print(f"\n{'':<16} {'triples':>14} {'N-Triples MB':>13} {'gzip MB':>9} {'convert s':>10}")
+    for encoding, (triples, size, compressed, seconds) in totals.items():
+        print(f"{encoding:<16} {triples:>14,} {size / 1e6:>13.1f} {compressed / 1e6:>9.1f} {seconds:>10.2f}")
+    print(f"\ntriples: {encoded[0] / literal[0]:.0%} of literal, upload size: {encoded[1] / literal[1]:.0%} "
+          f"({encoded[2] / literal[2]:.0%} gzipped)")
@@ -0,0 +1,50 @@
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from columnar import to_arrow_ipc, to_columns  # noqa: E402
+from query_backends import LocalBackend  # noqa: E402
+
+
+def sparql_json(result) -> bytes:
+    return json.dumps(result).encode()
+
+
+def columnar_json(result) -> bytes:
+    return json.dumps(to_columns(result)).encode()
+
+
+def timed(serialize, result, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload = serialize(result)
+    return (time.perf_counter() - start) / repeat, payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /ask result formats: size and serialization time")
+    parser.add_argument("--question", default="tuberculosis deaths")
+    parser.add_argument("--rows", type=int, nargs="+", default=[20, 1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from main import QueryAnalysis
+
+    analysis = QueryAnalysis().analyze_question(args.question)
+    backend = LocalBackend()
+    formats = [("sparql json", sparql_json), ("columnar json", columnar_json), ("arrow ipc", to_arrow_ipc)]
+
+    print(f"{'rows':>7} {'format':<14} {'bytes':>11} {'gzip bytes':>11} {'ms':>9} {'size vs json':>13}")
+    for rows in args.rows:
+        result = backend.run(analysis, "", limit=rows)
+        baseline = None
+        for name, serialize in formats:
+            seconds, payload = timed(serialize, result, args.repeat)
+            baseline = baseline or len(payload)
+            print(f"{len(result['results']['bindings']):>7} {name:<14} {len(payload):>11} "
+                  f"{len(gzip.compress(payload)):>11} {seconds * 1000:>9.2f} {len(payload) / baseline:>12.2f}x")
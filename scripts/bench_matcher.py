@@ -0,0 +1,62 @@
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from matcher import PhraseMatcher  # noqa: E402
+
+QUESTIONS = [
+    "How many malaria deaths were there in Africa in 2015?",
+    "Compare tuberculosis prevalence in Europe vs Asia by sex",
+    "Total covid deaths over time in the world",
+    "average breast cancer incidence for women in Spain",
+]
+
+
+def synthetic_vocabulary(size: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    vocabulary = {}
+    while len(vocabulary) < size:
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 10))) for _ in range(rng.randint(1, 3))]
+        vocabulary[" ".join(words)] = [("term", str(len(vocabulary)))]
+    for phrase in ["malaria", "tuberculosis", "covid", "breast cancer", "africa", "europe", "asia", "spain", "deaths"]:
+        vocabulary[phrase] = [("term", phrase)]
+    return vocabulary
+
+
+def naive_find(vocabulary: dict, question: str):
+    """ The old analyze_question approach: one substring test per dictionary entry """
+    question_lower = question.lower()
+    return [tag for phrase, tags in vocabulary.items() if phrase in question_lower for tag in tags]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the compiled phrase matcher")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'terms':>7} {'compile ms':>11} {'naive us/q':>11} {'matcher us/q':>13}")
+    for size in args.sizes:
+        vocabulary = synthetic_vocabulary(size)
+        start = time.perf_counter()
+        matcher = PhraseMatcher(vocabulary)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                naive_find(vocabulary, question)
+        naive_us = (time.perf_counter() - start) / (args.repeat * len(QUESTIONS)) * 1e6
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                matcher.find(question)
+        matcher_us = (time.perf_counter() - start) / (args.repeat * len(QUESTIONS)) * 1e6
+
+        print(f"{size:>7} {compile_ms:>11.1f} {naive_us:>11.1f} {matcher_us:>13.1f}")
@@ -0,0 +1,88 @@
+import argparse
+import os
+import sys
+import time
+import zipfile
+
+import pandas as pd
+from rdflib import Graph
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from build_statistics import StatisticsWriter  # noqa: E402
+from normalize import ihme_frame_to_ntriples  # noqa: E402
+from main import QueryAnalysis, SPARQLGenerator  # noqa: E402
+from query_backends import DATA_DIR, _ihme_csv_sources  # noqa: E402
+from sparql_planner import CardinalityStats, SparqlPlanner  # noqa: E402
+
+QUESTIONS = [
+    "tuberculosis deaths in Africa in 2015",
+    "covid deaths in Europe",
+    "total tuberculosis deaths by sex in Europe",
+    "total stroke deaths by location",
+    "average breast cancer prevalence in world",
+    "total diabetes deaths over time in Asia",
+    "compare tuberculosis and covid total deaths in Africa",
+    "prostate cancer deaths in Europe and Asia",
+]
+
+
+def load_sample(data_dir: str, rows: int):
+    frames = []
+    for source in _ihme_csv_sources(data_dir):
+        if isinstance(source, tuple):
+            archive, member = source
+            with zipfile.ZipFile(archive) as zf, zf.open(member) as f:
+                frames.append(pd.read_csv(f, nrows=rows))
+        else:
+            frames.append(pd.read_csv(source, nrows=rows))
+    return pd.concat(frames, ignore_index=True)
+
+
+def comparable(term):
+    # sums over a different join order may differ in the last float digits
+    value = term.toPython() if term is not None else None
+    return f"{value:.9g}" if isinstance(value, float) else str(value)
+
+
+def run(graph: Graph, query: str, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = list(graph.query(query))
+    seconds = (time.perf_counter() - start) / repeat
+    return seconds, sorted(tuple(comparable(term) for term in row) for row in rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FILTER templates with planned SPARQL on a local rdflib store")
+    parser.add_argument("--data", default=DATA_DIR)
+    parser.add_argument("--rows", type=int, default=3000, help="rows loaded from each IHME dataset")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = load_sample(args.data, args.rows)
+    graph = Graph()
+    start = time.perf_counter()
+    graph.parse(data=ihme_frame_to_ntriples(df), format="nt")
+    print(f"{len(df)} records, {len(graph)} triples loaded in {time.perf_counter() - start:.1f}s")
+
+    statistics = StatisticsWriter()
+    statistics.add_frame(df)
+    legacy = SPARQLGenerator(optimize=False)
+    planned = SPARQLGenerator(planner=SparqlPlanner(CardinalityStats(data=statistics.statistics())))
+    analyzer = QueryAnalysis()
+
+    print(f"\n{'question':<52} {'filter ms':>10} {'planned ms':>11} {'speedup':>8} {'same rows':>10}")
+    total_legacy = total_planned = 0.0
+    for question in QUESTIONS:
+        analysis = analyzer.analyze_question(question)
+        # every row, so both plans are compared on the full answer rather than an arbitrary 20
+        legacy_time, legacy_rows = run(graph, legacy.generate_query(analysis, limit=None)[0], args.repeat)
+        planned_time, planned_rows = run(graph, planned.generate_query(analysis, limit=None)[0], args.repeat)
+        total_legacy += legacy_time
+        total_planned += planned_time
+        multi = len(analysis["diseases"]) > 1 or len(analysis["locations"]) > 1
+        same = "first only" if multi else str(legacy_rows == planned_rows)
+        print(f"{question:<52} {legacy_time * 1000:>10.1f} {planned_time * 1000:>11.1f} "
+              f"{legacy_time / planned_time:>7.1f}x {same:>10}")
+    print(f"{'total':<52} {total_legacy * 1000:>10.1f} {total_planned * 1000:>11.1f} {total_legacy / total_planned:>7.1f}x")
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from build_timeseries import TIMESERIES_FILE, country_series, covid_sources, province_series, to_arrays, write
+from datasets import read_csv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from timeseries import STOCK_METRICS, TimeSeriesStore  # noqa: E402
+
+# (locations, metric, interval, rolling window)
+TRENDS = [
+    (["Global"], "New cases", "month", None),
+    (["Spain"], "New deaths", "week", None),
+    (["Italy", "Germany", "France", "United Kingdom"], "New cases", "day", 7),
+    (["Europe", "Americas"], "Active", "month", None),
+    (["United States"], "Confirmed", "week", None),
+    (["Hubei", "Beijing"], "New recovered", "year", 14),
+]
+
+PANDAS_PERIODS = {"day": "D", "week": "W-SUN", "month": "M", "year": "Y"}
+
+
+def pandas_trend(daily: pd.DataFrame, locations, metric: str, interval: str, window):
+    """ The same trend from one row per location and day, the shape the graph returns them in """
+    rows = daily[daily["location"].isin(locations)].sort_values(["location", "date"])
+    values = rows[metric].astype(float)
+    if window:
+        values = values.groupby(rows["location"]).transform(lambda s: s.rolling(window, min_periods=1).mean())
+    periods = rows["date"].dt.to_period(PANDAS_PERIODS[interval]).dt.start_time
+    grouped = values.groupby([rows["location"], periods])
+    result = grouped.last() if window or metric in STOCK_METRICS else grouped.sum()
+    return result.unstack().reindex(locations).to_numpy()
+
+
+def best_of(repeat: int, call):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trend answers from the daily COVID arrays vs per-row pandas")
+    parser.add_argument("--store", default=TIMESERIES_FILE)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    sources = covid_sources()
+    countries = country_series(read_csv(sources["full_grouped"]))
+    daily = pd.concat([countries, province_series(read_csv(sources["covid_19_clean_complete"]),
+                                                  set(countries["location"]))], ignore_index=True)
+    daily["date"] = pd.to_datetime(daily["date"])
+    if not os.path.exists(args.store):
+        write(to_arrays(daily), args.store)
+    store = TimeSeriesStore(args.store)
+
+    print(f"{'trend':58} {'rows in':>8} {'points':>7} {'pandas ms':>10} {'arrays ms':>10} {'same':>5}")
+    totals = [0.0, 0.0]
+    for locations, metric, interval, window in TRENDS:
+        expected, pandas_seconds = best_of(args.repeat, lambda: pandas_trend(daily, locations, metric, interval, window))
+        (_, values), array_seconds = best_of(args.repeat, lambda: store.trend(locations, metric, interval=interval,
+                                                                               window=window))
+        same = expected.shape == values.shape and np.allclose(expected, values)
+        rows_in = int(daily["location"].isin(locations).sum())
+        label = f"{metric} by {interval} in {', '.join(locations)}" + (f", {window}-day mean" if window else "")
+        print(f"{label[:58]:58} {rows_in:>8} {values.size:>7} {pandas_seconds * 1000:>10.2f} "
+              f"{array_seconds * 1000:>10.3f} {str(same):>5}")
+        totals[0] += pandas_seconds
+        totals[1] += array_seconds
+    print(f"total: pandas {totals[0] * 1000:.1f} ms, arrays {totals[1] * 1000:.2f} ms, "
+          f"speedup {totals[0] / totals[1]:.0f}x")
@@ -0,0 +1,56 @@
+import argparse
+import os
+
+import pandas as pd
+
+from datasets import BACKEND_DIR, read_csv
+from normalize import IHME_DIMENSIONS
+
+DIMENSIONS_FILE = os.getenv("DIMENSIONS_FILE", os.path.join(BACKEND_DIR, "dimensions.tsv"))
+
+
+class DimensionWriter:
+    """ Collects the id and label of every dimension entity while datasets load.
+
+    The file is a sorted "dimension<TAB>id<TAB>label" table; with GRAPH_ENCODING=dimensions
+    the backend turns question entities into dimension IRIs with it. A label can have
+    several ids (IHME has more than one "Georgia").
+    """
+
+    def __init__(self):
+        self.entities = set()
+
+    def add_entities(self, dimension: str, ids, labels):
+        pairs = pd.DataFrame({"id": ids, "label": labels}).dropna().drop_duplicates()
+        self.entities.update((dimension, int(i), str(label).strip()) for i, label in pairs.itertuples(index=False))
+
+    def add_frame(self, df: pd.DataFrame):
+        """ Add the dimension columns of an IHME GBD frame """
+        for dimension, (id_col, name_col, _) in IHME_DIMENSIONS.items():
+            if id_col in df.columns and name_col in df.columns:
+                self.add_entities(dimension, df[id_col], df[name_col])
+
+    def write(self, path: str = DIMENSIONS_FILE) -> int:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            for dimension, entity_id, label in sorted(self.entities):
+                f.write(f"{dimension}\t{entity_id}\t{label}\n")
+        os.replace(tmp_path, path)
+        return len(self.entities)
+
+
+if __name__ == "__main__":
+    from normalize import IHME_DATASETS
+
+    parser = argparse.ArgumentParser(description="Build the dimension id/label index for GRAPH_ENCODING=dimensions")
+    parser.add_argument("--out", default=DIMENSIONS_FILE)
+    args = parser.parse_args()
+
+    columns = [col for id_col, name_col, _ in IHME_DIMENSIONS.values() for col in (id_col, name_col)]
+    writer = DimensionWriter()
+    for dataset in IHME_DATASETS:
+        for chunk in read_csv(dataset, usecols=columns, chunksize=200000):
+            writer.add_frame(chunk)
+
+    print(f"{writer.write(args.out)} dimension entities written to {args.out}")
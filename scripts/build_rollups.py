@@ -0,0 +1,102 @@
+import argparse
+import os
+import sqlite3
+
+import pandas as pd
+
+from datasets import BACKEND_DIR, read_csv
+
+ROLLUP_DB = os.getenv("ROLLUP_DB", os.path.join(BACKEND_DIR, "rollups.sqlite"))
+
+ROLLUP_KEYS = ["cause_name", "measure_name", "location_name", "year", "sex_name"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollup (
+    cause TEXT NOT NULL,
+    measure TEXT NOT NULL,
+    location TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    sex TEXT NOT NULL,
+    value_sum REAL NOT NULL,
+    value_count INTEGER NOT NULL,
+    PRIMARY KEY (cause, measure, location, year, sex)
+);
+CREATE INDEX IF NOT EXISTS rollup_location ON rollup (location, measure);
+CREATE TABLE IF NOT EXISTS rollup_sources (path TEXT PRIMARY KEY, rows INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS rollup_coverage (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+"""
+
+
+class RollupWriter:
+    """ Materializes cause x measure x location x year x sex sums and counts while datasets load.
+
+    Sums and counts (rather than averages) are stored so cells can be merged across chunks
+    and files and still give the same SUM/AVG GraphDB computes over the raw records.
+    """
+
+    def __init__(self, db_path: str = ROLLUP_DB, rebuild: bool = False):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        if rebuild:
+            self.conn.executescript("DROP TABLE IF EXISTS rollup; DROP TABLE IF EXISTS rollup_sources; "
+                                    "DROP TABLE IF EXISTS rollup_coverage;")
+        self.conn.executescript(SCHEMA)
+
+    def add_frame(self, df: pd.DataFrame, source: str = None):
+        grouped = (df.groupby(ROLLUP_KEYS, sort=False)["val"]
+                   .agg(["sum", "count"])
+                   .reset_index())
+        rows = zip(grouped["cause_name"].astype(str), grouped["measure_name"].astype(str),
+                   grouped["location_name"].astype(str), grouped["year"].astype(int).tolist(),
+                   grouped["sex_name"].astype(str), grouped["sum"].astype(float).tolist(),
+                   grouped["count"].astype(int).tolist())
+        self.conn.executemany("""
+            INSERT INTO rollup (cause, measure, location, year, sex, value_sum, value_count)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (cause, measure, location, year, sex) DO UPDATE SET
+                value_sum = value_sum + excluded.value_sum,
+                value_count = value_count + excluded.value_count
+        """, rows)
+        if source:
+            self.conn.execute("""
+                INSERT INTO rollup_sources (path, rows) VALUES (?, ?)
+                ON CONFLICT (path) DO UPDATE SET rows = rows + excluded.rows
+            """, (str(source), len(df)))
+        self.conn.commit()
+
+    def close(self):
+        """ Record the causes and locations rolled up; the API leaves questions about any other to GraphDB """
+        self.conn.executescript("""
+            DELETE FROM rollup_coverage;
+            INSERT INTO rollup_coverage SELECT DISTINCT 'cause', cause FROM rollup;
+            INSERT INTO rollup_coverage SELECT DISTINCT 'location', location FROM rollup;
+        """)
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    from normalize import IHME_DATASETS
+    from cause_of_deaths import CAUSE_OF_DEATHS_CSV, health_records
+
+    # Every dataset whose records the /ask templates match: the malaria and lung cancer records
+    # (norm2) have no dis:measure, so no template query ever aggregates them
+    parser = argparse.ArgumentParser(description="Rebuild the /ask rollup tables from the datasets")
+    parser.add_argument("--db", default=ROLLUP_DB)
+    parser.add_argument("--chunksize", type=int, default=100000)
+    args = parser.parse_args()
+
+    writer = RollupWriter(args.db, rebuild=True)
+    for dataset in IHME_DATASETS:
+        for chunk in read_csv(dataset, chunksize=args.chunksize):
+            writer.add_frame(chunk, dataset)
+        print(f"rolled up {dataset}")
+    if CAUSE_OF_DEATHS_CSV is not None:
+        writer.add_frame(health_records(read_csv(CAUSE_OF_DEATHS_CSV)), CAUSE_OF_DEATHS_CSV)
+        print(f"rolled up {CAUSE_OF_DEATHS_CSV}")
+    writer.close()
+    print(f"Rollups written to {args.db}")
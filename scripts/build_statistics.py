@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+
+import pandas as pd
+
+from datasets import BACKEND_DIR, read_csv
+
+STATISTICS_FILE = os.getenv("STATISTICS_FILE", os.path.join(BACKEND_DIR, "statistics.json"))
+
+# IHME column -> SPARQL variable (dis: predicate) it is loaded as
+IHME_STATISTICS_COLUMNS = {
+    "cause_name": "causeName",
+    "location_name": "location",
+    "measure_name": "measure",
+    "sex_name": "sex",
+    "year": "year",
+}
+
+
+class StatisticsWriter:
+    """ Counts HealthRecords per predicate value while datasets load, for the SPARQL planner.
+
+    The file holds the total record count and, per predicate, how many records carry it,
+    how many distinct values it has and how many records have each value.
+    """
+
+    def __init__(self):
+        self.records = 0
+        self.counts = {}
+
+    def add_values(self, predicate: str, values):
+        counts = self.counts.setdefault(predicate, {})
+        for value, count in pd.Series(values).dropna().astype(str).value_counts().items():
+            counts[value] = counts.get(value, 0) + int(count)
+
+    def add_records(self, count: int):
+        self.records += int(count)
+
+    def add_frame(self, df: pd.DataFrame, columns=None):
+        """ Add the records of a frame; columns maps its columns to predicates (IHME GBD by default) """
+        self.add_records(len(df))
+        for column, predicate in (columns or IHME_STATISTICS_COLUMNS).items():
+            if column in df.columns:
+                values = df[column].astype(int) if predicate == "year" else df[column]
+                self.add_values(predicate, values)
+
+    def statistics(self):
+        return {
+            "records": self.records,
+            "predicates": {
+                predicate: {"records": sum(counts.values()), "distinct": len(counts), "values": counts}
+                for predicate, counts in sorted(self.counts.items())
+            },
+        }
+
+    def write(self, path: str = STATISTICS_FILE) -> int:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.statistics(), f, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp_path, path)
+        return self.records
+
+
+if __name__ == "__main__":
+    from normalize import IHME_DATASETS
+    from norm2 import MALARIA_CSV, LUNG_CSV
+    from cause_of_deaths import CAUSE_OF_DEATHS_CSV, health_records
+
+    parser = argparse.ArgumentParser(description="Build the per-predicate cardinality statistics for the SPARQL planner")
+    parser.add_argument("--out", default=STATISTICS_FILE)
+    args = parser.parse_args()
+
+    writer = StatisticsWriter()
+    for dataset in IHME_DATASETS:
+        for chunk in read_csv(dataset, usecols=list(IHME_STATISTICS_COLUMNS), chunksize=200000):
+            writer.add_frame(chunk)
+
+    # one record per row for malaria, one per sex and row for lung cancer (see norm2)
+    if MALARIA_CSV is not None:
+        malaria = read_csv(MALARIA_CSV, usecols=["Entity", "Year"])
+        writer.add_records(len(malaria))
+        writer.add_values("causeName", ["Malaria"] * len(malaria))
+        writer.add_values("location", malaria["Entity"])
+        writer.add_values("year", malaria["Year"])
+
+    if LUNG_CSV is not None:
+        lung = read_csv(LUNG_CSV, usecols=["Entity", "Year"])
+        writer.add_records(2 * len(lung))
+        writer.add_values("causeName", ["Lung Cancer"] * (2 * len(lung)))
+        writer.add_values("location", pd.concat([lung["Entity"], lung["Entity"]]))
+        writer.add_values("year", pd.concat([lung["Year"], lung["Year"]]))
+        writer.add_values("sex", ["female"] * len(lung) + ["male"] * len(lung))
+
+    # one HealthRecord per country, year and cause of the Kaggle table the IHME extracts lack (see cause_of_deaths)
+    if CAUSE_OF_DEATHS_CSV is not None:
+        writer.add_frame(health_records(read_csv(CAUSE_OF_DEATHS_CSV)))
+
+    print(f"statistics for {writer.write(args.out)} records written to {args.out}")
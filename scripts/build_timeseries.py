@@ -0,0 +1,85 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from datasets import BACKEND_DIR, dataset_sources, read_csv, source_name
+
+TIMESERIES_FILE = os.getenv("TIMESERIES_FILE", os.path.join(BACKEND_DIR, "timeseries.npz"))
+
+# Daily series of every location, in this order on the first axis of the array
+METRICS = ["Confirmed", "Deaths", "Recovered", "Active", "New cases", "New deaths", "New recovered"]
+
+# Daily metrics full_grouped.csv derives from the cumulative ones: the day-over-day increase,
+# 0 on the first day and when a count was revised down
+DAILY_METRICS = {"New cases": "Confirmed", "New deaths": "Deaths", "New recovered": "Recovered"}
+
+# Kaggle country names that differ from the ones the /ask vocabulary resolves to
+COUNTRY_NAMES = {"US": "United States", "Taiwan*": "Taiwan"}
+
+GLOBAL = "Global"
+
+
+def covid_sources() -> dict:
+    """ Daily COVID CSVs by file name: full_grouped (per country), covid_19_clean_complete (per province) """
+    return {source_name(source): source for source in dataset_sources("covid_daily")}
+
+
+def country_series(df: pd.DataFrame) -> pd.DataFrame:
+    """ full_grouped.csv -> location, date and METRICS per country, WHO region and the world """
+    df = df.rename(columns={"Country/Region": "location", "Date": "date"})
+    df["location"] = df["location"].replace(COUNTRY_NAMES)
+    regions = df.groupby(["WHO Region", "date"], as_index=False)[METRICS].sum().rename(columns={"WHO Region": "location"})
+    world = df.groupby("date", as_index=False)[METRICS].sum().assign(location=GLOBAL)
+    return pd.concat([df[["location", "date"] + METRICS], regions, world], ignore_index=True)
+
+
+def province_series(df: pd.DataFrame, known) -> pd.DataFrame:
+    """ covid_19_clean_complete.csv -> the same columns per province, except names already in known """
+    df = df[df["Province/State"].notna() & ~df["Province/State"].isin(known)]
+    df = (df.rename(columns={"Province/State": "location", "Date": "date"})
+          .groupby(["location", "date"], as_index=False)[["Confirmed", "Deaths", "Recovered", "Active"]].sum()
+          .sort_values(["location", "date"]))
+    for daily, cumulative in DAILY_METRICS.items():
+        df[daily] = df.groupby("location")[cumulative].diff().fillna(0).clip(lower=0)
+    return df
+
+
+def to_arrays(series: pd.DataFrame) -> dict:
+    """ Long location/date/METRICS frame -> the arrays TimeSeriesStore loads.
+
+    values[metric, location, day] is a count, day being the offset from start; a location
+    without a row for some day gets 0 there.
+    """
+    dates = pd.to_datetime(series["date"]).to_numpy().astype("datetime64[D]")
+    start = dates.min()
+    days = (dates - start).astype(int)
+    locations, location_index = np.unique(series["location"].to_numpy(dtype=str), return_inverse=True)
+    values = np.zeros((len(METRICS), len(locations), int(days.max()) + 1), dtype=np.int32)
+    for i, metric in enumerate(METRICS):
+        values[i, location_index, days] = series[metric].to_numpy()
+    return {"start": np.array(start), "locations": locations, "metrics": np.array(METRICS), "values": values}
+
+
+def write(arrays: dict, path: str = TIMESERIES_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the daily COVID series /ask answers trend questions from")
+    parser.add_argument("--out", default=TIMESERIES_FILE)
+    args = parser.parse_args()
+
+    sources = covid_sources()
+    countries = country_series(read_csv(sources["full_grouped"]))
+    parts = [countries]
+    if "covid_19_clean_complete" in sources:
+        parts.append(province_series(read_csv(sources["covid_19_clean_complete"]), set(countries["location"])))
+    arrays = to_arrays(pd.concat(parts, ignore_index=True))
+    write(arrays, args.out)
+    print(f"{len(arrays['locations'])} locations x {arrays['values'].shape[2]} days from {arrays['start']} "
+          f"written to {args.out}")
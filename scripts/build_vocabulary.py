@@ -0,0 +1,139 @@
+import argparse
+import os
+
+import pandas as pd
+
+from datasets import BACKEND_DIR, read_csv
+
+VOCABULARY_FILE = os.getenv("VOCABULARY_FILE", os.path.join(BACKEND_DIR, "vocabulary.tsv"))
+
+# IHME column -> QueryAnalysis category
+IHME_VOCABULARY_COLUMNS = {
+    "location_name": "locations",
+    "cause_name": "diseases",
+    "measure_name": "measures",
+    "sex_name": "gender",
+    "age_name": "ages",
+}
+
+# Extra English/Macedonian phrases for values found in the data.
+# An alias is only written when its target value exists in the loaded datasets.
+ALIASES = {
+    "diseases": {
+        "маларија": "Malaria",
+        "белодробен рак": "Lung Cancer", "lung cancer": "Lung Cancer",
+        "туберкулоза": "Tuberculosis", "tb": "Tuberculosis",
+        "covid": "COVID-19", "ковид": "COVID-19", "корона": "COVID-19", "coronavirus": "COVID-19",
+        "diabetes": "Diabetes mellitus type 2", "дијабетес": "Diabetes mellitus type 2",
+        "hiv": "HIV/AIDS", "aids": "HIV/AIDS", "сида": "HIV/AIDS",
+        "рак на дојка": "Breast cancer",
+        "рак на простата": "Prostate cancer",
+        "рак на желудник": "Stomach cancer",
+        "леукемија": "Leukemia",
+        "мозочен удар": "Stroke",
+        "anorexia": "Anorexia nervosa", "анорексија": "Anorexia nervosa",
+        "шизофренија": "Schizophrenia",
+        "bipolar": "Bipolar disorder", "биполарно": "Bipolar disorder",
+        "bulimia": "Bulimia nervosa", "булимија": "Bulimia nervosa",
+    },
+    "locations": {
+        "world": "Global", "свет": "Global", "глобално": "Global",
+        "африка": "Africa", "европа": "Europe", "азија": "Asia", "америка": "America",
+        "macedonia": "North Macedonia", "македонија": "North Macedonia",
+        "албанија": "Albania", "данска": "Denmark", "унгарија": "Hungary", "шпанија": "Spain",
+        "србија": "Serbia", "русија": "Russia",
+        "usa": "United States", "uk": "United Kingdom",
+    },
+    "measures": {
+        "смртност": "Deaths", "умрени": "Deaths", "died": "Deaths", "deaths": "Deaths",
+        "cases": "Prevalence", "случаи": "Prevalence", "распространетост": "Prevalence",
+        "new cases": "Incidence", "инциденција": "Incidence",
+        "dalys": "DALYs (Disability-Adjusted Life Years)",
+        "ylds": "YLDs (Years Lived with Disability)",
+        "ylls": "YLLs (Years of Life Lost)",
+    },
+    "gender": {
+        "women": "Female", "females": "Female", "жени": "Female",
+        "men": "Male", "males": "Male", "мажи": "Male",
+    },
+    "ages": {
+        "сите возрасти": "All ages", "all age groups": "All ages",
+    },
+}
+
+
+class VocabularyWriter:
+    """ Collects every distinct dimension value seen at ingest and writes the /ask entity index.
+
+    The index is a sorted "category<TAB>phrase<TAB>value" file: canonical values appear under
+    their own lowercased name, plus the ALIASES whose target was seen in the data. An alias
+    wins over a canonical value with the same phrase ("world" -> Global, not World).
+    """
+
+    def __init__(self):
+        self.values = {category: set() for category in ALIASES}
+        for category in IHME_VOCABULARY_COLUMNS.values():
+            self.values.setdefault(category, set())
+
+    def add_values(self, category: str, values):
+        self.values.setdefault(category, set()).update(
+            str(v).strip() for v in pd.unique(pd.Series(values).dropna()) if str(v).strip())
+
+    def add_frame(self, df: pd.DataFrame):
+        """ Add the dimension columns of an IHME GBD frame """
+        for column, category in IHME_VOCABULARY_COLUMNS.items():
+            if column in df.columns:
+                self.add_values(category, df[column])
+
+    def entries(self):
+        entries = {}
+        for category, values in self.values.items():
+            for value in values:
+                entries[(category, value.lower())] = value
+            for alias, value in ALIASES.get(category, {}).items():
+                if value in values:
+                    entries[(category, alias.lower())] = value
+        return sorted((category, phrase, value) for (category, phrase), value in entries.items())
+
+    def write(self, path: str = VOCABULARY_FILE) -> int:
+        entries = self.entries()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8", newline="\n") as f:
+            for category, phrase, value in entries:
+                f.write(f"{category}\t{phrase}\t{value}\n")
+        os.replace(tmp_path, path)
+        return len(entries)
+
+
+if __name__ == "__main__":
+    from normalize import IHME_DATASETS
+    from norm2 import MALARIA_CSV, LUNG_CSV
+    from cause_of_deaths import CAUSE_OF_DEATHS_CSV, ID_COLUMNS
+    from build_timeseries import country_series, covid_sources
+
+    parser = argparse.ArgumentParser(description="Build the /ask entity index from the datasets")
+    parser.add_argument("--out", default=VOCABULARY_FILE)
+    args = parser.parse_args()
+
+    writer = VocabularyWriter()
+    for dataset in IHME_DATASETS:
+        for chunk in read_csv(dataset, usecols=list(IHME_VOCABULARY_COLUMNS), chunksize=200000):
+            writer.add_frame(chunk)
+
+    for disease, path in [("Malaria", MALARIA_CSV), ("Lung Cancer", LUNG_CSV)]:
+        if path is not None:
+            writer.add_values("diseases", [disease])
+            writer.add_values("locations", read_csv(path, usecols=["Entity"])["Entity"])
+
+    if CAUSE_OF_DEATHS_CSV is not None:
+        causes = read_csv(CAUSE_OF_DEATHS_CSV)
+        writer.add_values("diseases", [column for column in causes.columns if column not in ID_COLUMNS])
+        writer.add_values("locations", causes["Country/Territory"])
+
+    covid = covid_sources()
+    if "full_grouped" in covid:
+        # countries and WHO regions of the daily COVID series, see build_timeseries.py
+        writer.add_values("locations", country_series(read_csv(covid["full_grouped"]))["location"])
+
+    print(f"{writer.write(args.out)} index entries written to {args.out}")
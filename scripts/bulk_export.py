@@ -0,0 +1,231 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+
+from rdflib import Dataset, Graph
+
+from datasets import DATA_DIR, source_name
+from normalize import GRAPH_ENCODING, IHME_CONVERTERS, dataset_graph
+from parallel_ingest import chunk_tasks, convert_chunk
+from stream_ingest import DEFAULT_CHUNKSIZE, dataset_jobs
+
+DEFAULT_OUT_DIR = "bulk_export"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_SHARD_SIZE = 5_000_000
+
+# format -> (file suffix, rdflib parser, one named graph per dataset)
+FORMATS = {
+    "nquads": (".nq.gz", "nquads", True),
+    "ntriples": (".nt.gz", "nt", False),
+}
+
+
+def shard_prefix(source) -> str:
+    """ File-name-safe dataset name, e.g. IHME-GBD_2021_DATA-4b50b8a1-1 """
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", source_name(source))
+
+
+def ntriples_to_nquads(nt_data: str, graph: str) -> str:
+    """ Put every N-Triples statement into graph; the converters write one statement per line ending in ' .' """
+    suffix = f" <{graph}> .\n"
+    return "".join(line[:-2] + suffix for line in nt_data.splitlines() if line)
+
+
+class ShardWriter:
+    """ Gzip-compressed shards of one dataset, a new file every shard_size statements.
+
+    Shards never split a statement, and the converters write no blank nodes, so every
+    shard is a complete document the importer can load on its own and in any order.
+    """
+
+    def __init__(self, out_dir: str, prefix: str, suffix: str, graph: str = None,
+                 shard_size: int = DEFAULT_SHARD_SIZE, compresslevel: int = 6):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.suffix = suffix
+        self.graph = graph
+        self.shard_size = shard_size
+        self.compresslevel = compresslevel
+        self.shards = []
+        self._file = None
+
+    def write(self, nt_data: str):
+        lines = nt_data.splitlines(keepends=True)
+        while lines:
+            if self._file is None or self.shards[-1]["statements"] >= self.shard_size:
+                self._open()
+            shard = self.shards[-1]
+            take = lines[:self.shard_size - shard["statements"]]
+            lines = lines[len(take):]
+            data = "".join(take)
+            if self.graph is not None:
+                data = ntriples_to_nquads(data, self.graph)
+            self._file.write(data)
+            shard["statements"] += len(take)
+
+    def _open(self):
+        self.close()
+        name = f"{self.prefix}-{len(self.shards):05d}{self.suffix}"
+        self._file = gzip.open(os.path.join(self.out_dir, name), "wt", encoding="utf-8",
+                               compresslevel=self.compresslevel)
+        self.shards.append({"file": name, "graph": self.graph, "statements": 0})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def bulk_export(jobs, out_dir: str = DEFAULT_OUT_DIR, fmt: str = "nquads", workers: int = None,
+                chunksize: int = DEFAULT_CHUNKSIZE, shard_size: int = DEFAULT_SHARD_SIZE, compresslevel: int = 6) -> dict:
+    """ Convert every dataset in a process pool and write its statements to shards under out_dir.
+
+    Chunks are written as they finish, so the statement order inside a dataset's shards
+    follows completion order rather than the CSV; at most 2 * workers converted chunks are
+    held in memory. Returns the manifest, which is also written to out_dir/manifest.json.
+    """
+    workers = workers or os.cpu_count() or 1
+    suffix, _, named_graphs = FORMATS[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(out_dir):
+        if name.endswith(suffix):
+            os.remove(os.path.join(out_dir, name))
+
+    writers, rows = {}, defaultdict(int)
+    for path, _ in jobs:
+        graph = dataset_graph(path) if named_graphs else None
+        writers[path] = ShardWriter(out_dir, shard_prefix(path), suffix, graph, shard_size, compresslevel)
+
+    tasks = chunk_tasks(jobs, chunksize)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        task = next(tasks, None)
+        while task or pending:
+            while task and len(pending) < 2 * workers:
+                pending.add(pool.submit(convert_chunk, *task))
+                task = next(tasks, None)
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, index, chunk_rows, nt_data, seconds = future.result()
+                rows[path] += chunk_rows
+                writers[path].write(nt_data)
+
+    manifest = {"format": fmt, "datasets": []}
+    for path, writer in writers.items():
+        writer.close()
+        manifest["datasets"].append({
+            "source": source_name(path),
+            "graph": writer.graph,
+            "rows": rows[path],
+            "statements": sum(shard["statements"] for shard in writer.shards),
+            "shards": writer.shards,
+        })
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def parse_shard(path: str, fmt: str):
+    """ Worker task: parse one shard, return (path, statements, distinct statements, graphs) """
+    _, parser, named_graphs = FORMATS[fmt]
+    with gzip.open(path, "rb") as f:
+        statements = sum(1 for line in f if line.strip())
+    with gzip.open(path, "rb") as f:
+        if named_graphs:
+            ds = Dataset()
+            ds.parse(f, format=parser)
+            graphs = {str(g.identifier): len(g) for g in ds.graphs() if len(g)}
+            return path, statements, sum(graphs.values()), graphs
+        g = Graph()
+        g.parse(f, format=parser)
+        return path, statements, len(g), {}
+
+
+def validate(out_dir: str = DEFAULT_OUT_DIR, workers: int = None) -> bool:
+    """ Parse every shard in the manifest in a process pool and check it against the manifest.
+
+    A shard fails when it does not parse, holds a different number of statements than
+    written, or (N-Quads) puts statements in any graph but its dataset's. Statements the
+    converters wrote twice parse as one, as the store will load them; they are only reported.
+    """
+    with open(os.path.join(out_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+    fmt = manifest["format"]
+    expected = {os.path.join(out_dir, shard["file"]): shard
+                for dataset in manifest["datasets"] for shard in dataset["shards"]}
+
+    ok = True
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        futures = {pool.submit(parse_shard, path, fmt): path for path in expected}
+        for future in as_completed(futures):
+            shard = expected[futures[future]]
+            try:
+                _, statements, distinct, graphs = future.result()
+            except Exception as e:
+                print(f"{shard['file']}: does not parse: {e}")
+                ok = False
+                continue
+            problems = []
+            if statements != shard["statements"]:
+                problems.append(f"{statements} statements, manifest has {shard['statements']}")
+            if shard["graph"] is not None and set(graphs) != {shard["graph"]}:
+                problems.append(f"graphs {sorted(graphs)}, expected {shard['graph']}")
+            if problems:
+                ok = False
+                print(f"{shard['file']}: " + "; ".join(problems))
+            elif distinct < statements:
+                print(f"{shard['file']}: {statements - distinct} duplicate statements")
+    return ok
+
+
+def print_summary(manifest: dict, out_dir: str, wall_seconds: float):
+    print(f"\n{'dataset':<60} {'rows':>9} {'statements':>11} {'shards':>6}")
+    total_rows = total_statements = 0
+    for dataset in manifest["datasets"]:
+        total_rows += dataset["rows"]
+        total_statements += dataset["statements"]
+        print(f"{dataset['source'][-60:]:<60} {dataset['rows']:>9} {dataset['statements']:>11} {len(dataset['shards']):>6}")
+    size = sum(os.path.getsize(os.path.join(out_dir, shard["file"]))
+               for dataset in manifest["datasets"] for shard in dataset["shards"])
+    print(f"\n{total_statements:,} statements from {total_rows:,} rows in {wall_seconds:.2f}s "
+          f"({total_statements / wall_seconds:,.0f} statements/s), {size / 1e6:,.1f} MB compressed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every dataset as gzip-compressed RDF shards for GraphDB's "
+                                                 "offline importer (importrdf load / preload)")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="directory for the shards and manifest.json")
+    parser.add_argument("--format", choices=list(FORMATS), default="nquads",
+                        help="nquads puts each dataset in its named graph, like incremental_ingest.py; "
+                             "ntriples leaves the graph to the importer")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="conversion and validation processes")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="statements per shard")
+    parser.add_argument("--compresslevel", type=int, default=6, help="gzip level, 1 (fast) to 9 (small)")
+    parser.add_argument("--encoding", choices=list(IHME_CONVERTERS), default=GRAPH_ENCODING,
+                        help="IHME record model, must match the backend's GRAPH_ENCODING")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with the dataset .zip archives")
+    parser.add_argument("--validate", action="store_true", help="parse the shards afterwards and check the counts")
+    parser.add_argument("--validate-only", action="store_true", help="check an earlier export without converting")
+    args = parser.parse_args()
+
+    if not args.validate_only:
+        start = time.perf_counter()
+        manifest = bulk_export(dataset_jobs(args.encoding, args.data_dir), args.out, args.format, args.workers,
+                               args.chunksize, args.shard_size, args.compresslevel)
+        print_summary(manifest, args.out, time.perf_counter() - start)
+        pattern = os.path.join(args.out, "*" + FORMATS[args.format][0])
+        print(f"\nLoad with GraphDB stopped: importrdf preload -f -i disease-kg {pattern}")
+
+    if args.validate or args.validate_only:
+        start = time.perf_counter()
+        valid = validate(args.out, args.workers)
+        print(f"Shards {'valid' if valid else 'INVALID'} ({time.perf_counter() - start:.1f}s)")
+        if not valid:
+            sys.exit(1)
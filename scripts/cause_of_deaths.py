@@ -0,0 +1,147 @@
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph, Literal
+from rdflib.namespace import RDF, XSD
+
+from datasets import dataset_sources, read_csv
+from normalize import (CAUSE_TO_SNOMED, DIS, SNOMED, _nt_float_lexical, _nt_iri, _nt_string_literals,
+                       _nt_typed_literals)
+
+# Kaggle "Cause of Deaths around the World": one row per Country/Code/Year, one column per cause,
+# every value a yearly death count for all ages and both sexes
+ID_COLUMNS = ["Country/Territory", "Code", "Year"]
+DATASET_KEY = "cause_of_deaths"
+# dis:datasetLink of every record, as on the malaria and lung cancer records (see norm2)
+DATASET_LINK = "https://diseases.org/cause_of_deaths_data_source"
+
+# Causes of the IHME GBD extracts, which hold them for every sex, age and measure. The table's
+# records for these causes are typed dis:SupplementaryRecord instead of dis:HealthRecord, so the
+# /ask templates, rollups and local backend never add them to the IHME values for the same cause.
+IHME_CAUSES = {
+    "HIV/AIDS", "Leukemia", "Diabetes mellitus type 2", "Tuberculosis", "COVID-19", "Prostate cancer",
+    "Stroke", "Breast cancer", "Stomach cancer", "Anorexia nervosa", "Schizophrenia", "Bipolar disorder",
+    "Bulimia nervosa",
+}
+
+# The table is GBD data, so its records carry the GBD dimensions (and ids) of an all-ages,
+# both-sexes death count, the same as an IHME record with those values
+MEASURE = (1, "Deaths")
+METRIC = (1, "Number")
+SEX = (3, "Both")
+AGE = (22, "All ages")
+
+CAUSE_OF_DEATHS_CSV = next(iter(dataset_sources("cause_of_deaths")), None)
+
+
+def melt_causes(df: pd.DataFrame) -> pd.DataFrame:
+    """ Wide table -> one row per country, year and cause, with columns location, code, year, cause, deaths """
+    long = df.melt(id_vars=ID_COLUMNS, var_name="cause", value_name="deaths")
+    long = long.rename(columns={"Country/Territory": "location", "Code": "code", "Year": "year"})
+    long = long[long["deaths"].notna()].reset_index(drop=True)
+    # regions have no ISO code; their name keeps the record IRI unique
+    long["code"] = long["code"].fillna(long["location"])
+    return long
+
+
+def health_records(df: pd.DataFrame) -> pd.DataFrame:
+    """ The table's HealthRecords under the IHME GBD column names, for the rollups, statistics and local backend """
+    long = melt_causes(df)
+    long = long[~long["cause"].isin(IHME_CAUSES)].reset_index(drop=True)
+    return pd.DataFrame({"cause_name": long["cause"], "measure_name": MEASURE[1], "location_name": long["location"],
+                         "year": long["year"], "sex_name": SEX[1], "val": long["deaths"]})
+
+
+def _quoted(series: pd.Series) -> pd.Series:
+    """ URL-quote a column through its distinct values (a few hundred countries, ~30 causes) """
+    values = series.astype(str)
+    return values.map({value: quote(value, safe="") for value in values.unique()})
+
+
+def record_key(code, year, cause) -> str:
+    return f"record/{quote(str(code), safe='')}/{int(year)}/{quote(str(cause), safe='')}/both/{DATASET_KEY}"
+
+
+def add_cause_of_deaths_rows(df: pd.DataFrame, g: Graph) -> Graph:
+    """ Reference conversion, one cell at a time through rdflib, for checking the vectorized one """
+    for _, row in melt_causes(df).iterrows():
+        record_uri = DIS[record_key(row["code"], row["year"], row["cause"])]
+        g.add((record_uri, DIS.measureId, Literal(MEASURE[0], datatype=XSD.integer)))
+        g.add((record_uri, DIS.metricId, Literal(METRIC[0], datatype=XSD.integer)))
+        g.add((record_uri, DIS.sexId, Literal(SEX[0], datatype=XSD.integer)))
+        g.add((record_uri, DIS.ageId, Literal(AGE[0], datatype=XSD.integer)))
+
+        record_type = DIS.SupplementaryRecord if row["cause"] in IHME_CAUSES else DIS.HealthRecord
+        g.add((record_uri, RDF.type, record_type))
+        g.add((record_uri, DIS.location, Literal(row["location"], datatype=XSD.string)))
+        g.add((record_uri, DIS.year, Literal(int(row["year"]), datatype=XSD.gYear)))
+        g.add((record_uri, DIS.sex, Literal(SEX[1], datatype=XSD.string)))
+        g.add((record_uri, DIS.age, Literal(AGE[1], datatype=XSD.string)))
+        g.add((record_uri, DIS.metric, Literal(METRIC[1], datatype=XSD.string)))
+        g.add((record_uri, DIS.value, Literal(float(row["deaths"]), datatype=XSD.float)))
+        g.add((record_uri, DIS.measure, Literal(MEASURE[1], datatype=XSD.string)))
+        g.add((record_uri, DIS.measureDescription, Literal(f"This record represents {MEASURE[1]} measured in {METRIC[1]}", datatype=XSD.string)))
+        g.add((record_uri, DIS.causeName, Literal(row["cause"], datatype=XSD.string)))
+        g.add((record_uri, DIS.datasetLink, Literal(DATASET_LINK, datatype=XSD.string)))
+
+        cause_name = str(row["cause"]).strip()
+        if cause_name in CAUSE_TO_SNOMED:
+            g.add((record_uri, DIS.cause, SNOMED[CAUSE_TO_SNOMED[cause_name]]))
+    return g
+
+
+def cause_of_deaths_frame_to_ntriples(df: pd.DataFrame) -> str:
+    """ Convert rows of the wide table to N-Triples records, one per country, year and cause (see IHME_CAUSES).
+
+    The table is melted once and every triple is built column-wise, as in
+    ihme_frame_to_ntriples; produces exactly the triples of add_cause_of_deaths_rows.
+    """
+    long = melt_causes(df)
+    if long.empty:
+        return ""
+
+    years = long["year"].astype(int).astype(str)
+    subjects = ("<" + str(DIS) + "record/" + _quoted(long["code"]) + "/" + years + "/" + _quoted(long["cause"])
+                + "/both/" + DATASET_KEY + "> ")
+
+    def triples(predicate, objects) -> str:
+        return (subjects + (_nt_iri(predicate) + " ") + objects + " .\n").str.cat()
+
+    def constant(predicate, obj: str) -> str:
+        return (subjects + f"{_nt_iri(predicate)} {obj} .\n").str.cat()
+
+    def string_literal(value: str) -> str:
+        return _nt_string_literals(pd.Series([value])).iloc[0]
+
+    parts = []
+    for predicate, (dimension_id, _) in [(DIS.measureId, MEASURE), (DIS.metricId, METRIC),
+                                         (DIS.sexId, SEX), (DIS.ageId, AGE)]:
+        parts.append(constant(predicate, f'"{dimension_id}"^^{_nt_iri(XSD.integer)}'))
+
+    record_types = np.where(long["cause"].isin(IHME_CAUSES), _nt_iri(DIS.SupplementaryRecord), _nt_iri(DIS.HealthRecord))
+    parts.append(triples(RDF.type, pd.Series(record_types, index=long.index)))
+    parts.append(triples(DIS.location, _nt_string_literals(long["location"])))
+    parts.append(triples(DIS.year, _nt_typed_literals(years, XSD.gYear)))
+    for predicate, (_, label) in [(DIS.sex, SEX), (DIS.age, AGE), (DIS.metric, METRIC), (DIS.measure, MEASURE)]:
+        parts.append(constant(predicate, string_literal(label)))
+    parts.append(triples(DIS.value, _nt_typed_literals(_nt_float_lexical(long["deaths"]), XSD.float)))
+    parts.append(constant(DIS.measureDescription,
+                          string_literal(f"This record represents {MEASURE[1]} measured in {METRIC[1]}")))
+    parts.append(triples(DIS.causeName, _nt_string_literals(long["cause"])))
+    parts.append(constant(DIS.datasetLink, string_literal(DATASET_LINK)))
+
+    snomed_codes = long["cause"].astype(str).str.strip().map(CAUSE_TO_SNOMED)
+    known = snomed_codes.notna()
+    if known.any():
+        parts.append((subjects[known] + _nt_iri(DIS.cause) + " <" + str(SNOMED) + snomed_codes[known]
+                      + "> .\n").str.cat())
+
+    return "".join(parts)
+
+
+def convert_cause_of_deaths_nt(file_path, out) -> int:
+    """ Write the whole table as N-Triples to a text file object, return the number of records """
+    df = read_csv(file_path)
+    out.write(cause_of_deaths_frame_to_ntriples(df))
+    return len(melt_causes(df))
@@ -0,0 +1,173 @@
+import fnmatch
+import io
+import itertools
+import os
+import zipfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(ROOT_DIR, "data"))
+# Where the API reads the side tables the build scripts write at ingest
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+# Dataset kind -> name patterns of the .zip archives (or extracted folders) it ships in.
+# stream_ingest.converters() maps each kind to the converter that loads it; covid_daily has
+# none and is only read by build_timeseries.py.
+DATASET_KINDS = {
+    "ihme": ["IHME-GBD_*"],
+    "malaria": ["global-malaria-deaths-by-world-region*"],
+    "lung": ["lung-cancer-deaths-per-100000-by-sex-*"],
+    "cause_of_deaths": ["CauseOfDeathsAroundTheWorld*"],
+    "covid_daily": ["kaggle-covid-dataset*"],
+}
+
+
+class DataSource:
+    """ One dataset CSV: a file on disk, or a member read straight out of its .zip archive """
+
+    def __init__(self, path: str, member: Optional[str] = None):
+        self.path = path
+        self.member = member
+
+    @property
+    def name(self) -> str:
+        """ CSV file name without the extension """
+        return os.path.splitext(os.path.basename(self.member or self.path))[0]
+
+    def open(self):
+        """ Binary file object of the CSV; a zip member is decompressed while it is read """
+        if self.member is None:
+            return open(self.path, "rb")
+        archive = zipfile.ZipFile(self.path)
+        try:
+            return archive.open(self.member)
+        finally:
+            # the member holds its own reference to the archive file, which is closed with it
+            archive.close()
+
+    def read_csv(self, **kwargs):
+        if self.member is None:
+            return pd.read_csv(self.path, **kwargs)
+        if kwargs.get("chunksize"):
+            return self._read_chunks(**kwargs)
+        with self.open() as f:
+            return pd.read_csv(f, **kwargs)
+
+    def _read_chunks(self, **kwargs):
+        """ pandas never closes a file object it was given; the member is closed once its chunks are consumed """
+        with self.open() as f, pd.read_csv(f, **kwargs) as reader:
+            yield from reader
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, DataSource) and (self.path, self.member) == (other.path, other.member)
+
+    def __hash__(self) -> int:
+        return hash((self.path, self.member))
+
+    def __str__(self) -> str:
+        return self.path if self.member is None else f"{self.path}!{self.member}"
+
+    def __repr__(self) -> str:
+        return f"DataSource({str(self)!r})"
+
+
+def read_csv(source, **kwargs):
+    """ pd.read_csv for a DataSource or a plain path """
+    if isinstance(source, DataSource):
+        return source.read_csv(**kwargs)
+    return pd.read_csv(source, **kwargs)
+
+
+def open_source(source):
+    return source.open() if isinstance(source, DataSource) else open(source, "rb")
+
+
+def csv_records(f) -> Iterator[bytes]:
+    """ Raw records of a binary CSV file object; a newline inside a quoted field does not end one """
+    pending, quotes = [], 0
+    for line in f:
+        quotes += line.count(b'"')
+        if quotes % 2:
+            pending.append(line)
+            continue
+        if pending:
+            pending.append(line)
+            line = b"".join(pending)
+            pending = []
+        quotes = 0
+        yield line
+    if pending:
+        yield b"".join(pending)
+
+
+def record_chunks(source, chunksize: int) -> Iterator[Tuple[bytes, bytes]]:
+    """ (header, records) byte strings of up to chunksize records each, in one streaming pass.
+
+    Nothing is parsed: a chunk can be skipped for free, or sent to another process and
+    turned into a frame there with parse_chunk.
+    """
+    with open_source(source) as f:
+        records = csv_records(f)
+        header = next(records, b"")
+        while True:
+            chunk = b"".join(itertools.islice(records, chunksize))
+            if not chunk:
+                return
+            yield header, chunk
+
+
+def parse_chunk(header: bytes, records: bytes, **kwargs) -> pd.DataFrame:
+    return pd.read_csv(io.BytesIO(header + records), **kwargs)
+
+
+def source_name(source) -> str:
+    if isinstance(source, DataSource):
+        return source.name
+    return DataSource(str(source)).name
+
+
+def dataset_kind(name: str) -> Optional[str]:
+    for kind, patterns in DATASET_KINDS.items():
+        if any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+            return kind
+    return None
+
+
+def discover(data_dir: str = DATA_DIR) -> Dict[str, List[DataSource]]:
+    """ CSVs of every registered dataset under data_dir, by kind.
+
+    A dataset is a folder or a .zip named like one of DATASET_KINDS. A CSV already extracted
+    next to its archive is read from disk; any other CSV in the archive is read from the zip.
+    """
+    sources = {}
+    if not os.path.isdir(data_dir):
+        return sources
+    entries = sorted(os.listdir(data_dir))
+    extracted = set()
+    for entry in entries:
+        folder = os.path.join(data_dir, entry)
+        kind = dataset_kind(entry)
+        if kind is None or not os.path.isdir(folder):
+            continue
+        for root, _, files in os.walk(folder):
+            for file_name in sorted(files):
+                if file_name.lower().endswith(".csv"):
+                    sources.setdefault(kind, []).append(DataSource(os.path.join(root, file_name)))
+                    extracted.add((kind, file_name))
+    for entry in entries:
+        archive = os.path.join(data_dir, entry)
+        kind = dataset_kind(entry[:-len(".zip")]) if entry.lower().endswith(".zip") else None
+        if kind is None:
+            continue
+        with zipfile.ZipFile(archive) as zf:
+            for member in zf.namelist():
+                file_name = os.path.basename(member)
+                if file_name.lower().endswith(".csv") and (kind, file_name) not in extracted:
+                    sources.setdefault(kind, []).append(DataSource(archive, member))
+    return sources
+
+
+def dataset_sources(kind: str, data_dir: str = DATA_DIR) -> List[DataSource]:
+    return discover(data_dir).get(kind, [])
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import defaultdict
+
+import pandas as pd
+import requests
+
+from datasets import DATA_DIR, ROOT_DIR, open_source, read_csv
+from normalize import DIS, GRAPH_ENCODING, IHME_CONVERTERS, dataset_graph, graph_endpoint, invalidate_backend_cache
+from stream_ingest import DEFAULT_CHUNKSIZE, dataset_jobs, load_progress, save_progress, upload_chunk
+
+GRAPHDB_REPOSITORY = "http://localhost:7200/repositories/disease-kg"
+DEFAULT_MANIFEST = os.path.join(ROOT_DIR, "ingest_manifest.json")
+
+# Column every dataset is partitioned on. A partition is the unit of change: when any of its
+# rows changes, all of its records are deleted from the dataset graph and loaded again.
+PARTITION_COLUMNS = ["year", "Year"]
+
+
+def file_sha256(path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open_source(path) as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def partition_column(columns) -> str:
+    for column in PARTITION_COLUMNS:
+        if column in columns:
+            return column
+    raise ValueError(f"no partition column ({', '.join(PARTITION_COLUMNS)}) in {list(columns)}")
+
+
+def partition_hashes(path, chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """ "rows:hash" per partition value; the hash does not depend on row order or chunking.
+
+    Rows are hashed as read from the file (every column as text) and summed per partition.
+    """
+    counts, sums = defaultdict(int), defaultdict(int)
+    for chunk in read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        row_hashes = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        for value, rows in chunk.groupby(partition_column(chunk.columns)).indices.items():
+            counts[value] += len(rows)
+            sums[value] = (sums[value] + int(row_hashes[rows].sum())) % (1 << 64)
+    return {value: f"{counts[value]}:{sums[value]:016x}" for value in sorted(counts)}
+
+
+def sparql_update(session: requests.Session, repository: str, update: str) -> bool:
+    try:
+        r = session.post(f"{repository}/statements", data={"update": update}, timeout=300)
+    except requests.exceptions.RequestException as e:
+        print(f"Update failed: {e}")
+        return False
+    if r.status_code in [200, 204]:
+        return True
+    print(f"Update failed: {r.status_code} - {r.text}")
+    return False
+
+
+def delete_partitions(session: requests.Session, repository: str, graph: str, years) -> bool:
+    """ Delete every record of the given years, and all of its triples, from a dataset graph """
+    values = " ".join(f'"{int(year)}"^^xsd:gYear' for year in sorted(years))
+    return sparql_update(session, repository, f"""
+PREFIX dis: <{DIS}>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+DELETE {{ GRAPH <{graph}> {{ ?record ?p ?o }} }}
+WHERE {{ GRAPH <{graph}> {{ VALUES ?year {{ {values} }} ?record dis:year ?year ; ?p ?o }} }}
+""")
+
+
+def forget_partitions(manifest: dict, key: str, values):
+    """ Drop the hashes of partitions a failed run deleted or partly reloaded """
+    entry = manifest.get(key)
+    if entry is None or "partitions" not in entry:
+        manifest.pop(key, None)
+        return
+    partitions = {value: digest for value, digest in entry["partitions"].items() if value not in values}
+    manifest[key] = {**entry, "sha256": None, "partitions": partitions}
+
+
+def incremental_ingest(file_path, frame_to_ntriples, manifest: dict, repository: str = GRAPHDB_REPOSITORY,
+                       encoding: str = GRAPH_ENCODING, chunksize: int = DEFAULT_CHUNKSIZE,
+                       session: requests.Session = None) -> bool:
+    """ Bring one dataset's named graph up to date with its CSV, touching only what changed.
+
+    A file whose hash matches the manifest is skipped without being parsed. Otherwise the
+    partitions whose hash changed (or that disappeared) are deleted from the graph and only
+    their rows are converted and uploaded. A dataset new to the manifest, or loaded with
+    another encoding, replaces its whole graph. The manifest entry is only written once the
+    graph is up to date; when an update or upload fails, the partitions it may have left
+    half loaded lose their hashes, so the next run reloads them even if the file changes back.
+    Returns False if an update or upload failed.
+    """
+    session = session or requests.Session()
+    start = time.perf_counter()
+    key = str(file_path)
+    graph = dataset_graph(file_path)
+    sha256 = file_sha256(file_path)
+    entry = manifest.get(key, {})
+    if entry.get("sha256") == sha256 and entry.get("encoding") == encoding:
+        print(f"{file_path}: unchanged, skipped in {time.perf_counter() - start:.2f}s")
+        return True
+
+    partitions = partition_hashes(file_path, chunksize)
+    if entry.get("encoding") == encoding and "partitions" in entry:
+        old = entry["partitions"]
+        changed = {value for value, digest in partitions.items() if old.get(value) != digest}
+        removed = set(old) - set(partitions)
+        if (changed or removed) and not delete_partitions(session, repository, graph, changed | removed):
+            forget_partitions(manifest, key, changed | removed)
+            return False
+    else:
+        changed, removed = set(partitions), set()
+        if not sparql_update(session, repository, f"CLEAR SILENT GRAPH <{graph}>"):
+            manifest.pop(key, None)
+            return False
+
+    endpoint = graph_endpoint(f"{repository}/statements", file_path)
+    rows = 0
+    if changed:
+        for chunk in read_csv(file_path, chunksize=chunksize):
+            chunk = chunk[chunk[partition_column(chunk.columns)].astype(str).isin(changed)]
+            if chunk.empty:
+                continue
+            if not upload_chunk(session, frame_to_ntriples(chunk), endpoint):
+                print(f"{file_path}: upload failed, re-run to retry the changed partitions")
+                forget_partitions(manifest, key, changed | removed)
+                return False
+            rows += len(chunk)
+
+    manifest[key] = {"sha256": sha256, "encoding": encoding, "graph": graph, "partitions": partitions}
+    print(f"{file_path}: {len(changed)} of {len(partitions)} partitions reloaded ({rows} rows), "
+          f"{len(removed)} removed, in {time.perf_counter() - start:.2f}s")
+    return True
+
+
+def ingest_changed(jobs, manifest_file: str = DEFAULT_MANIFEST, repository: str = GRAPHDB_REPOSITORY,
+                   encoding: str = GRAPH_ENCODING, chunksize: int = DEFAULT_CHUNKSIZE) -> list:
+    """ incremental_ingest every (path, converter) job, saving the manifest after each; returns failed paths """
+    session = requests.Session()
+    manifest = load_progress(manifest_file)
+    failed, changed = [], False
+    for path, converter in jobs:
+        before = manifest.get(str(path))
+        if not incremental_ingest(path, converter, manifest, repository, encoding, chunksize, session):
+            failed.append(path)
+        if manifest.get(str(path)) != before:
+            changed = True
+            save_progress(manifest_file, manifest)
+    if changed:
+        invalidate_backend_cache()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load only the datasets (and years) that changed since the last run")
+    parser.add_argument("--repository", default=GRAPHDB_REPOSITORY)
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST, help="per-file and per-partition content hashes")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--encoding", choices=list(IHME_CONVERTERS), default=GRAPH_ENCODING,
+                        help="IHME record model, must match the backend's GRAPH_ENCODING")
+    parser.add_argument("--restart", action="store_true", help="forget the manifest and reload every dataset graph")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with the dataset .zip archives")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.manifest):
+        os.remove(args.manifest)
+
+    failed = ingest_changed(dataset_jobs(args.encoding, args.data_dir), args.manifest, args.repository, args.encoding, args.chunksize)
+    if failed:
+        print(f"Failed: {failed}")
+        sys.exit(1)
+    print("Up to date")
@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+from datasets import DATA_DIR
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), "backend")
+
+# A mix of what /ask gets: template questions, sums the rollups answer, COVID trends from the
+# daily series, Macedonian questions and free-form ones the router hands to the model
+QUESTIONS = [
+    "tuberculosis deaths in Africa in 2015",
+    "covid deaths in Europe",
+    "diabetes deaths in 2015",
+    "prostate cancer incidence in Spain 2010",
+    "breast cancer prevalence in women",
+    "total tuberculosis deaths by sex in Europe",
+    "total stroke deaths by location",
+    "average breast cancer prevalence in world",
+    "total leukemia deaths over time",
+    "compare tuberculosis and covid total deaths in Africa",
+    "covid deaths in Spain over time",
+    "weekly covid cases in Europe",
+    "covid new cases 7-day rolling average",
+    "смртност од туберкулоза во Европа",
+    "вкупно умрени од дијабетес по пол",
+    "which countries had the most malaria deaths in the nineties",
+    "how did lung cancer mortality for men change after 1980",
+    "what share of hiv cases are in africa",
+]
+
+# app name -> (uvicorn app, readiness path)
+APPS = {
+    "main": ("main:app", "/health"),
+    "llm_query": ("llm_query:app", "/cache/stats"),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(app: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+                             "--log-level", "warning"], cwd=BACKEND_DIR, env={**os.environ, **env})
+
+
+def start_stub_graphdb(port: int, rows: int, latency: float, data_dir: str) -> subprocess.Popen:
+    """ stub_graphdb.py in its own process, so the store and the load generator do not share a GIL """
+    return subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, "stub_graphdb.py"), "--port", str(port),
+                             "--rows", str(rows), "--latency", str(latency), "--data-dir", data_dir])
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def percentiles(seconds) -> dict:
+    ms = np.asarray(seconds, dtype=float) * 1000
+    if not ms.size:
+        # every request failed
+        return {"count": 0, "mean_ms": None, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"count": int(ms.size), "mean_ms": round(float(ms.mean()), 3), "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3), "p99_ms": round(float(p99), 3)}
+
+
+async def run_level(url: str, questions, concurrency: int, requests: int, timeout: float) -> dict:
+    """ requests questions sent by concurrency workers at once; client latency and server stage timings """
+    pending = iter(itertools.islice(itertools.cycle(questions), requests))
+    client_seconds, stages, sources, errors = [], {}, {}, 0
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for question in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json={"question": question}, headers={"X-Debug-Timing": "1"})
+                body = response.json()
+            except (httpx.HTTPError, ValueError):
+                errors += 1
+                continue
+            client_seconds.append(time.perf_counter() - start)
+            if response.status_code != 200 or "error" in body or "error" in body.get("result", {}):
+                errors += 1
+            source = body.get("source", "graphdb")
+            sources[source] = sources.get(source, 0) + 1
+            for stage, ms in body.get("timings", {}).items():
+                stages.setdefault(stage, []).append(ms / 1000)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(client_seconds),
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "throughput_rps": round(len(client_seconds) / wall, 2) if wall else 0.0,
+        "sources": sources,
+        "latency": {"client": percentiles(client_seconds),
+                    **{stage: percentiles(values) for stage, values in sorted(stages.items())}},
+    }
+
+
+def git_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_level(app: str, level: dict, baseline: dict = None):
+    client = level["latency"]["client"]
+    if not client["count"]:
+        print(f"{app:10} c={level['concurrency']:<4} no successful requests, errors {level['errors']}")
+        return
+    line = (f"{app:10} c={level['concurrency']:<4} {level['throughput_rps']:>8.1f} req/s  "
+            f"p50 {client['p50_ms']:>8.1f}  p95 {client['p95_ms']:>8.1f}  p99 {client['p99_ms']:>8.1f} ms  "
+            f"errors {level['errors']}")
+    if baseline and baseline["latency"]["client"]["count"]:
+        before = baseline["latency"]["client"]
+        line += (f"  (throughput {level['throughput_rps'] / baseline['throughput_rps']:.2f}x, "
+                 f"p95 {client['p95_ms'] / before['p95_ms']:.2f}x vs baseline)")
+    print(line)
+
+
+def baseline_levels(path: str) -> dict:
+    """ (app, concurrency) -> level of an earlier report """
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        report = json.load(f)
+    return {(app, level["concurrency"]): level for app, levels in report["apps"].items() for level in levels}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the /ask apps against a local GraphDB and LLM stand-in")
+    parser.add_argument("--apps", default=",".join(APPS), help="comma-separated: " + ", ".join(APPS))
+    parser.add_argument("--concurrency", default="1,4,16,64", help="comma-separated levels, run in order")
+    parser.add_argument("--requests", type=int, default=200, help="requests per level")
+    parser.add_argument("--rows", type=int, default=2000, help="rows of every dataset loaded into the stub store")
+    parser.add_argument("--graphdb-latency", type=float, default=0.02, help="seconds the stub store adds per query")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds the stub model takes per call")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=0, help="question order")
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--out", default="load_test.json")
+    parser.add_argument("--baseline", default=None, help="earlier --out report to compare against")
+    args = parser.parse_args()
+
+    stub_port = free_port()
+    repository = f"http://127.0.0.1:{stub_port}/repositories/disease-kg"
+    stub = start_stub_graphdb(stub_port, args.rows, args.graphdb_latency, args.data_dir)
+
+    # every run starts from an empty semantic cache, and the one of the dev setup is left alone
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    env = {"GRAPHDB_URL": repository, "GRAPHDB_SPARQL_URL": repository + "/sparql",
+           "LLM_MODEL": "stub", "STUB_LLM_LATENCY": str(args.llm_latency),
+           "SPARQL_CACHE_DB": os.path.join(work_dir, "sparql_cache.sqlite")}
+    questions = list(QUESTIONS)
+    random.Random(args.seed).shuffle(questions)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    baseline = baseline_levels(args.baseline)
+
+    report = {
+        "version": git_version(),
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {"questions": questions, "concurrency": levels, "requests": args.requests, "rows": args.rows,
+                   "graphdb_latency": args.graphdb_latency, "llm_latency": args.llm_latency},
+        "apps": {},
+    }
+    try:
+        # loading the sample into rdflib takes a while
+        wait_ready(f"{repository}/stats", stub, timeout=1800)
+        for name in args.apps.split(","):
+            app, ready_path = APPS[name]
+            port = free_port()
+            process = start_app(app, port, env)
+            try:
+                wait_ready(f"http://127.0.0.1:{port}{ready_path}", process)
+                url = f"http://127.0.0.1:{port}/ask"
+                # one untimed pass, so the levels measure steady state rather than first-query costs
+                asyncio.run(run_level(url, questions, 1, len(questions), args.timeout))
+                report["apps"][name] = []
+                for concurrency in levels:
+                    level = asyncio.run(run_level(url, questions, concurrency, args.requests, args.timeout))
+                    report["apps"][name].append(level)
+                    print_level(name, level, baseline.get((name, concurrency)))
+            finally:
+                process.terminate()
+                process.wait()
+        report["stub_graphdb"] = httpx.get(f"{repository}/stats").json()
+    finally:
+        stub.terminate()
+        stub.wait()
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {args.out}")
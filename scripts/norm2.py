@@ -3,6 +3,8 @@ from rdflib import Graph, Namespace, Literal
 from rdflib.namespace import RDF, XSD
 import requests
 
+from datasets import dataset_sources, read_csv
+
 DIS = Namespace("http://diseases.org/disease-kg/")
 SNOMED = Namespace("http://snomed.info/id/")
 
@@ -12,7 +14,9 @@ CAUSE_TO_SNOMED = {
 }
 
 def convert_malaria_dataset(file_path, g: Graph, dataset_link: str) -> Graph:
-    df = pd.read_csv(file_path)
+    return add_malaria_rows(read_csv(file_path), g, dataset_link)
+
+def add_malaria_rows(df: pd.DataFrame, g: Graph, dataset_link: str) -> Graph:
     for _, row in df.iterrows():
         record_uri = DIS[f"record/{row['Code']}/{row['Year']}/Malaria/all/{dataset_link}"]
         g.add((record_uri, RDF.type, DIS.HealthRecord))
@@ -26,7 +30,9 @@ def convert_malaria_dataset(file_path, g: Graph, dataset_link: str) -> Graph:
     return g
 
 def convert_lung_cancer_dataset(file_path, g: Graph, dataset_link: str) -> Graph:
-    df = pd.read_csv(file_path)
+    return add_lung_cancer_rows(read_csv(file_path), g, dataset_link)
+
+def add_lung_cancer_rows(df: pd.DataFrame, g: Graph, dataset_link: str) -> Graph:
     for _, row in df.iterrows():
         
         record_uri_f = DIS[f"record/{row['Code']}/{row['Year']}/LungCancer/female/{dataset_link}"]
@@ -53,6 +59,12 @@ def convert_lung_cancer_dataset(file_path, g: Graph, dataset_link: str) -> Graph
 
     return g
 
+def malaria_frame_to_ntriples(df: pd.DataFrame, dataset_link: str) -> str:
+    return add_malaria_rows(df, Graph(), dataset_link).serialize(format="nt")
+
+def lung_cancer_frame_to_ntriples(df: pd.DataFrame, dataset_link: str) -> str:
+    return add_lung_cancer_rows(df, Graph(), dataset_link).serialize(format="nt")
+
 def upload_to_graphdb(graph: Graph, endpoint: str):
     ttl_data = graph.serialize(format="turtle")
     headers = {"Content-Type": "text/turtle"}
@@ -62,19 +74,22 @@ def upload_to_graphdb(graph: Graph, endpoint: str):
     else:
         print(f"Upload failed: {r.status_code} - {r.text}")
 
+# found under data/ like every other dataset (see datasets.py); None when it is missing
+MALARIA_CSV = next(iter(dataset_sources("malaria")), None)
+MALARIA_LINK = "https://diseases.org/malaria_data_source"
+LUNG_CSV = next(iter(dataset_sources("lung")), None)
+LUNG_LINK = "https://diseases.org/lung_cancer_data_source"
+
 if __name__ == "__main__":
-    g = Graph()
-    g.bind("dis", DIS)
-    g.bind("snomed", SNOMED)
-
-    malaria_csv = r"data\global-malaria-deaths-by-world-region(ourWorldInData)\global-malaria-deaths-by-world-region.csv"
-    malaria_link = "https://diseases.org/malaria_data_source"
-    g = convert_malaria_dataset(malaria_csv, g, malaria_link)
-    print("added to graph")
-    lung_csv = r"data\lung-cancer-deaths-per-100000-by-sex-1950-2002(ourWorldInData)\lung-cancer-deaths-per-100000-by-sex-1950-2002.csv"
-    lung_link = "https://diseases.org/lung_cancer_data_source"
-    g = convert_lung_cancer_dataset(lung_csv, g, lung_link)
-    print("added to graph")
-    upload_to_graphdb(g, "http://localhost:7200/repositories/disease-kg/statements")
-
-print("Uploaded")
\ No newline at end of file
+    import sys
+    from functools import partial
+    from incremental_ingest import ingest_changed
+
+    # each dataset goes to its own named graph; unchanged files and years are skipped
+    jobs = [(path, converter) for path, converter in [
+        (MALARIA_CSV, partial(malaria_frame_to_ntriples, dataset_link=MALARIA_LINK)),
+        (LUNG_CSV, partial(lung_cancer_frame_to_ntriples, dataset_link=LUNG_LINK))] if path is not None]
+    if ingest_changed(jobs):
+        sys.exit(1)
+
+    print("Uploaded")
\ No newline at end of file
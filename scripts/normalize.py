@@ -1,7 +1,15 @@
 import pandas as pd
 from rdflib import Graph, Namespace, Literal
-from rdflib.namespace import RDF, XSD
+from rdflib.namespace import RDF, RDFS, XSD
 import requests  
+import os
+from urllib.parse import quote
+
+from datasets import dataset_sources, read_csv, source_name
+
+# "literal" stores dimension values on every record, "dimensions" links records to shared
+# dimension entities (see ihme_frame_to_encoded_ntriples); the backend reads the same variable
+GRAPH_ENCODING = os.getenv("GRAPH_ENCODING", "literal")
 
 DIS = Namespace("http://diseases.org/disease-kg/")
 SNOMED = Namespace("http://snomed.info/id/")
@@ -20,11 +28,16 @@ CAUSE_TO_SNOMED = {
     "Schizophrenia": "58214004",
     "Bipolar disorder": "13746004",
     "Bulimia nervosa": "439960005",
-    "Malaria": "1386000"
+    "Malaria": "1386000",
+    # causes of the Kaggle cause_of_deaths table (scripts/cause_of_deaths.py)
+    "Meningitis": "7180009",
+    "Parkinson's Disease": "49049000",
+    "Diabetes Mellitus": "73211009",
+    "Chronic Kidney Disease": "709044004",
 }
 
 def convert_ihme_dataset(file_path, g: Graph) -> Graph:
-    df = pd.read_csv(file_path)
+    df = read_csv(file_path)
 
     for _, row in df.iterrows():
         record_uri = DIS[f"record/{row['location_id']}/{row['year']}/{row['cause_id']}/{row['measure_id']}/{row['sex_id']}/{row['age_id']}"]
@@ -51,6 +64,165 @@ def convert_ihme_dataset(file_path, g: Graph) -> Graph:
 
     return g
 
+# ----------------- Vectorized N-Triples conversion -----------------
+IHME_INTEGER_COLUMNS = [
+    ("measureId", "measure_id"),
+    ("metricId", "metric_id"),
+    ("sexId", "sex_id"),
+    ("ageId", "age_id"),
+]
+
+IHME_STRING_COLUMNS = [
+    ("location", "location_name"),
+    ("sex", "sex_name"),
+    ("age", "age_name"),
+    ("metric", "metric_name"),
+    ("measure", "measure_name"),
+]
+
+def _nt_iri(iri: str) -> str:
+    return f"<{iri}>"
+
+def _nt_string_literals(series: pd.Series) -> pd.Series:
+    """ Escape a column of strings and render them as xsd:string N-Triples literals """
+    escaped = (series.astype(str)
+               .str.replace("\\", "\\\\", regex=False)
+               .str.replace('"', '\\"', regex=False)
+               .str.replace("\n", "\\n", regex=False)
+               .str.replace("\r", "\\r", regex=False))
+    return '"' + escaped + '"^^' + _nt_iri(XSD.string)
+
+def _nt_typed_literals(lexical: pd.Series, datatype) -> pd.Series:
+    return '"' + lexical + '"^^' + _nt_iri(datatype)
+
+def _nt_float_lexical(series: pd.Series) -> pd.Series:
+    """ Same lexical form rdflib produces for Literal(float(x), datatype=XSD.float) """
+    values = series.astype(float)
+    lexical = values.map(float.__repr__)
+    lexical[values.isna()] = "NaN"
+    lexical[values == float("inf")] = "INF"
+    lexical[values == float("-inf")] = "-INF"
+    return lexical
+
+def _ihme_ids(df: pd.DataFrame) -> dict:
+    return {col: df[col].astype(int).astype(str) for col in
+            ["location_id", "year", "cause_id", "measure_id", "sex_id", "age_id", "metric_id"]}
+
+def _ihme_record_subjects(ids: dict) -> pd.Series:
+    return ("<" + str(DIS) + "record/" + ids["location_id"] + "/" + ids["year"] + "/" + ids["cause_id"]
+            + "/" + ids["measure_id"] + "/" + ids["sex_id"] + "/" + ids["age_id"] + "> ")
+
+def ihme_frame_to_ntriples(df: pd.DataFrame) -> str:
+    """ Convert an IHME GBD frame to N-Triples, column by column, without an rdflib Graph.
+
+    Produces exactly the triples convert_ihme_dataset adds for the same rows.
+    """
+    if df.empty:
+        return ""
+
+    ids = _ihme_ids(df)
+    subjects = _ihme_record_subjects(ids)
+
+    def triples(predicate, objects: pd.Series) -> str:
+        return (subjects + (_nt_iri(predicate) + " ") + objects + " .\n").str.cat()
+
+    parts = []
+    for prop, col in IHME_INTEGER_COLUMNS:
+        parts.append(triples(DIS[prop], _nt_typed_literals(ids[col], XSD.integer)))
+
+    parts.append((subjects + f"{_nt_iri(RDF.type)} {_nt_iri(DIS.HealthRecord)} .\n").str.cat())
+    parts.append(triples(DIS.year, _nt_typed_literals(ids["year"], XSD.gYear)))
+    parts.append(triples(DIS.value, _nt_typed_literals(_nt_float_lexical(df["val"]), XSD.float)))
+    for prop, col in IHME_STRING_COLUMNS:
+        parts.append(triples(DIS[prop], _nt_string_literals(df[col])))
+
+    descriptions = ("This record represents " + df["measure_name"].astype(str)
+                    + " measured in " + df["metric_name"].astype(str))
+    parts.append(triples(DIS.measureDescription, _nt_string_literals(descriptions)))
+    parts.append(triples(DIS.causeName, _nt_string_literals(df["cause_name"])))
+
+    snomed_codes = df["cause_name"].astype(str).str.strip().map(CAUSE_TO_SNOMED)
+    known = snomed_codes.notna()
+    if known.any():
+        parts.append((subjects[known] + _nt_iri(DIS.cause) + " <" + str(SNOMED) + snomed_codes[known]
+                      + "> .\n").str.cat())
+
+    return "".join(parts)
+
+# ----------------- Dimension-encoded N-Triples conversion -----------------
+# dimension -> (IHME id column, IHME name column, entity class). A record links to
+# dis:<dimension>/<id> through dis:has<Class>; the entity holds the id and label once.
+IHME_DIMENSIONS = {
+    "cause": ("cause_id", "cause_name", "Cause"),
+    "location": ("location_id", "location_name", "Location"),
+    "measure": ("measure_id", "measure_name", "Measure"),
+    "sex": ("sex_id", "sex_name", "Sex"),
+    "age": ("age_id", "age_name", "Age"),
+    "metric": ("metric_id", "metric_name", "Metric"),
+}
+
+def dimension_iris(dimension: str, ids: pd.Series) -> pd.Series:
+    return "<" + str(DIS) + dimension + "/" + ids + ">"
+
+def ihme_dimensions_to_ntriples(df: pd.DataFrame) -> str:
+    """ Class, id and label of every dimension entity the frame refers to.
+
+    Each chunk repeats the entities it uses, a few hundred triples; the store keeps one copy,
+    so chunks can be converted and loaded independently and in any order.
+    """
+    parts = []
+    for dimension, (id_col, name_col, cls) in IHME_DIMENSIONS.items():
+        entities = df[[id_col, name_col]].drop_duplicates(id_col)
+        ids = entities[id_col].astype(int).astype(str)
+        subjects = dimension_iris(dimension, ids) + " "
+        parts.append((subjects + f"{_nt_iri(RDF.type)} {_nt_iri(DIS[cls])} .\n").str.cat())
+        parts.append((subjects + _nt_iri(DIS.id) + " " + _nt_typed_literals(ids, XSD.integer) + " .\n").str.cat())
+        parts.append((subjects + _nt_iri(RDFS.label) + " " + _nt_string_literals(entities[name_col]) + " .\n").str.cat())
+        if dimension == "cause":
+            snomed_codes = entities[name_col].astype(str).str.strip().map(CAUSE_TO_SNOMED)
+            known = snomed_codes.notna()
+            if known.any():
+                parts.append((subjects[known] + _nt_iri(DIS.cause) + " <" + str(SNOMED) + snomed_codes[known]
+                              + "> .\n").str.cat())
+    return "".join(parts)
+
+def ihme_frame_to_encoded_ntriples(df: pd.DataFrame) -> str:
+    """ Convert an IHME GBD frame to dictionary-encoded N-Triples.
+
+    Records keep their IRI, type, year and value; location, cause, measure, sex, age and
+    metric become links to shared dimension entities instead of per-record literals. The ids and
+    SNOMED link move onto those entities; measureDescription, only the measure and metric labels
+    spelled out, is not stored.
+    """
+    if df.empty:
+        return ""
+
+    ids = _ihme_ids(df)
+    subjects = _ihme_record_subjects(ids)
+
+    def triples(predicate, objects: pd.Series) -> str:
+        return (subjects + (_nt_iri(predicate) + " ") + objects + " .\n").str.cat()
+
+    parts = [ihme_dimensions_to_ntriples(df)]
+    parts.append((subjects + f"{_nt_iri(RDF.type)} {_nt_iri(DIS.HealthRecord)} .\n").str.cat())
+    parts.append(triples(DIS.year, _nt_typed_literals(ids["year"], XSD.gYear)))
+    parts.append(triples(DIS.value, _nt_typed_literals(_nt_float_lexical(df["val"]), XSD.float)))
+    for dimension, (id_col, _, cls) in IHME_DIMENSIONS.items():
+        parts.append(triples(DIS["has" + cls], dimension_iris(dimension, ids[id_col])))
+    return "".join(parts)
+
+# GRAPH_ENCODING -> IHME chunk converter
+IHME_CONVERTERS = {
+    "literal": ihme_frame_to_ntriples,
+    "dimensions": ihme_frame_to_encoded_ntriples,
+}
+
+def convert_ihme_dataset_nt(file_path, out) -> int:
+    """ Write a whole IHME CSV as N-Triples to a text file object, return the number of rows """
+    df = read_csv(file_path)
+    out.write(ihme_frame_to_ntriples(df))
+    return len(df)
+
 def upload_to_graphdb(graph: Graph, endpoint: str):
     """ Upload RDF graph directly as Turtle to GraphDB """
     ttl_data = graph.serialize(format="turtle")
@@ -62,27 +234,73 @@ def upload_to_graphdb(graph: Graph, endpoint: str):
     else:
         print(f"Upload failed: {r.status_code} - {r.text}")
 
+def upload_ntriples_to_graphdb(nt_data: str, endpoint: str):
+    """ Upload N-Triples text directly to GraphDB """
+    headers = {"Content-Type": "application/n-triples"}
+    r = requests.post(endpoint, data=nt_data.encode("utf-8"), headers=headers)
+
+    if r.status_code in [200, 204]:
+        print("Data successfully uploaded to GraphDB")
+    else:
+        print(f"Upload failed: {r.status_code} - {r.text}")
+
+def dataset_graph(path) -> str:
+    """ Named graph holding one dataset's records: dis:graph/<dataset name> """
+    return f"{DIS}graph/{quote(source_name(path))}"
+
+def graph_endpoint(statements_endpoint: str, path) -> str:
+    """ /statements URL that adds uploaded data to the dataset's named graph.
+
+    Every loader writes a dataset to the same graph, so loading it again with another
+    script replaces nothing and duplicates nothing.
+    """
+    return f"{statements_endpoint}?context={quote(f'<{dataset_graph(path)}>')}"
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# Shared with the backend; required by /cache/invalidate when the backend sets it
+CACHE_ADMIN_TOKEN = os.getenv("CACHE_ADMIN_TOKEN", "")
+
+def invalidate_backend_cache(backend_url: str = BACKEND_URL, token: str = CACHE_ADMIN_TOKEN):
+    """ Tell a running backend to drop cached /ask results now that the graph changed """
+    headers = {"X-Cache-Token": token} if token else {}
+    try:
+        r = requests.post(f"{backend_url}/cache/invalidate", headers=headers, timeout=5)
+    except requests.exceptions.RequestException:
+        print(f"Backend not reachable at {backend_url}, cache not invalidated")
+        return
+    if r.status_code == 200:
+        print("Backend result cache invalidated")
+    else:
+        print(f"Cache invalidation refused: {r.status_code} - {r.text}")
+
+# Every IHME GBD CSV under data/, extracted or read from its .zip (see datasets.py)
+IHME_DATASETS = dataset_sources("ihme")
+
 if __name__ == "__main__":
+    from build_rollups import RollupWriter
+    from build_vocabulary import VocabularyWriter
+    from build_statistics import StatisticsWriter
+    from build_dimensions import DimensionWriter
+
+    frame_to_ntriples = IHME_CONVERTERS[GRAPH_ENCODING]
+    rollups = RollupWriter(rebuild=True)
+    vocabulary = VocabularyWriter()
+    statistics = StatisticsWriter()
+    dimensions = DimensionWriter()
+    for dataset in IHME_DATASETS:
+        df = read_csv(dataset)
+        nt_data = frame_to_ntriples(df)
+
+        upload_ntriples_to_graphdb(nt_data, graph_endpoint("http://localhost:7200/repositories/disease-kg/statements",
+                                                           dataset))
+        rollups.add_frame(df, dataset)
+        vocabulary.add_frame(df)
+        statistics.add_frame(df)
+        dimensions.add_frame(df)
+    rollups.close()
+    vocabulary.write()
+    statistics.write()
+    dimensions.write()
+    invalidate_backend_cache()
 
-    datasets = [
-        r"data\IHME-GBD_2021_DATA-4b50b8a1-1-TUBERCULOSIS\IHME-GBD_2021_DATA-4b50b8a1-1.csv",#tuberkuloza OK
-        r"data\IHME-GBD_2021_DATA-9c6c333b-1-BREASTCANCER\IHME-GBD_2021_DATA-9c6c333b-1.csv",#breast cancer OK
-        r"data\IHME-GBD_2021_DATA-09fdc579-1-HIVSIDA\IHME-GBD_2021_DATA-09fdc579-1.csv",#hiv OK
-        r"data\IHME-GBD_2021_DATA-64b6ff04-1-DIABETESTYPE2\IHME-GBD_2021_DATA-64b6ff04-1.csv",#diabetes type 2 OK
-        r"data\IHME-GBD_2021_DATA-99547af3-1-PROSTATECANCER\IHME-GBD_2021_DATA-99547af3-1.csv",#prostate cancer OK
-        r"data\IHME-GBD_2021_DATA-b076edd1-1-STOMACHCANCER\IHME-GBD_2021_DATA-b076edd1-1.csv",#stomach cancer OK
-        r"data\IHME-GBD_2021_DATA-b3342b47-1-LEUKEMIA\IHME-GBD_2021_DATA-b3342b47-1.csv",#leukemia OK
-        r"data\IHME-GBD_2021_DATA-be6216e9-1-STROKE\IHME-GBD_2021_DATA-be6216e9-1.csv",#stroke OK
-        r"data\IHME-GBD_2021_DATA-d484bcec-1-BIP-SHIZ-ANRX-BULIM\IHME-GBD_2021_DATA-d484bcec-1.csv",#bipolar,anorexia,shizof,bulim OK
-        r"data\IHME-GBD_2021_DATA-d28911d8-1-COVID\IHME-GBD_2021_DATA-d28911d8-1.csv"#covid OK 
-    ]
-
-    for dataset in datasets:
-        g = Graph()
-        g.bind("dis", DIS)
-        g.bind("snomed", SNOMED)
-        g = convert_ihme_dataset(dataset, g)
-
-        upload_to_graphdb(g, "http://localhost:7200/repositories/disease-kg/statements")
-
-print("Uploaded")
\ No newline at end of file
+    print("Uploaded")
\ No newline at end of file
@@ -0,0 +1,169 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from datasets import DATA_DIR, parse_chunk, record_chunks
+from normalize import GRAPH_ENCODING, IHME_CONVERTERS, graph_endpoint, invalidate_backend_cache
+from stream_ingest import GRAPHDB_STATEMENTS, DEFAULT_CHUNKSIZE, dataset_jobs, upload_chunk
+
+
+def convert_chunk(file_path, frame_to_ntriples, chunk_index: int, header: bytes, records: bytes):
+    """ Worker task: parse one chunk of raw CSV records and convert it to N-Triples """
+    start = time.perf_counter()
+    df = parse_chunk(header, records)
+    nt_data = frame_to_ntriples(df)
+    return file_path, chunk_index, len(df), nt_data, time.perf_counter() - start
+
+
+def pooled_session(connections: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=connections, pool_maxsize=connections)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def chunk_tasks(jobs, chunksize: int):
+    """ (path, converter, chunk index, header, records) per chunk, reading every CSV once, front to back.
+
+    Splitting is cheap next to parsing and conversion, which the workers do; tasks are
+    generated only as they are submitted, so the reader stays a few chunks ahead of the pool.
+    """
+    for path, converter in jobs:
+        for index, (header, records) in enumerate(record_chunks(path, chunksize)):
+            yield path, converter, index, header, records
+
+
+def parallel_ingest(jobs, endpoint: str = GRAPHDB_STATEMENTS, workers: int = None,
+                    uploaders: int = 4, chunksize: int = DEFAULT_CHUNKSIZE, queue_size: int = 8):
+    """ Convert chunks in a process pool and upload them, each into its dataset's named graph, from a bounded queue.
+
+    At most workers + queue_size converted chunks are held in memory: when the uploaders
+    fall behind, the queue fills up and no new conversions are submitted. An error in an
+    uploader stops the conversions and is raised here. Returns the per-dataset timing stats.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = defaultdict(lambda: {"rows": 0, "chunks": 0, "convert_s": 0.0, "upload_s": 0.0,
+                                 "first_start": None, "last_end": None, "failed": 0})
+    lock = threading.Lock()
+    uploads = queue.Queue(maxsize=queue_size)
+    session = pooled_session(uploaders)
+    # set when an uploader raised (or the producer did), so nobody waits on the queue for a thread that is gone
+    stop = threading.Event()
+    errors = []
+
+    def enqueue(item) -> bool:
+        while not stop.is_set():
+            try:
+                uploads.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def uploader():
+        try:
+            while not stop.is_set():
+                try:
+                    item = uploads.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    break
+                path, nt_data = item
+                start = time.perf_counter()
+                ok = upload_chunk(session, nt_data, graph_endpoint(endpoint, path))
+                end = time.perf_counter()
+                with lock:
+                    stats[path]["upload_s"] += end - start
+                    stats[path]["last_end"] = end
+                    if not ok:
+                        stats[path]["failed"] += 1
+        except Exception as e:
+            with lock:
+                errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=uploader, daemon=True) for _ in range(uploaders)]
+    for t in threads:
+        t.start()
+
+    tasks = chunk_tasks(jobs, chunksize)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            task = next(tasks, None)
+            while (task or pending) and not stop.is_set():
+                while task and len(pending) < workers:
+                    path = task[0]
+                    with lock:
+                        if stats[path]["first_start"] is None:
+                            stats[path]["first_start"] = time.perf_counter()
+                    pending.add(pool.submit(convert_chunk, *task))
+                    task = next(tasks, None)
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, index, rows, nt_data, seconds = future.result()
+                    with lock:
+                        stats[path]["rows"] += rows
+                        stats[path]["chunks"] += 1
+                        stats[path]["convert_s"] += seconds
+                    if not enqueue((path, nt_data)):
+                        break
+            if stop.is_set():
+                pool.shutdown(cancel_futures=True)
+        for _ in threads:
+            enqueue(None)
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for t in threads:
+            t.join()
+    if errors:
+        raise errors[0]
+    return dict(stats)
+
+
+def print_summary(stats: dict, wall_seconds: float, workers: int):
+    print(f"\n{'dataset':<60} {'rows':>9} {'chunks':>6} {'convert s':>10} {'upload s':>9} {'wall s':>8}")
+    total_rows = 0
+    for path, s in stats.items():
+        total_rows += s["rows"]
+        wall = (s["last_end"] or s["first_start"]) - s["first_start"]
+        name = os.path.basename(str(path))[-60:]
+        print(f"{name:<60} {s['rows']:>9} {s['chunks']:>6} {s['convert_s']:>10.2f} {s['upload_s']:>9.2f} {wall:>8.2f}"
+              + (f"  ({s['failed']} chunks failed)" if s["failed"] else ""))
+    print(f"\n{workers} workers: {total_rows} rows in {wall_seconds:.2f}s ({total_rows / wall_seconds:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel multi-dataset ingest into GraphDB")
+    parser.add_argument("--endpoint", default=GRAPHDB_STATEMENTS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="conversion processes")
+    parser.add_argument("--uploaders", type=int, default=4, help="concurrent HTTP uploads")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--queue-size", type=int, default=8, help="converted chunks waiting for upload")
+    parser.add_argument("--encoding", choices=list(IHME_CONVERTERS), default=GRAPH_ENCODING,
+                        help="IHME record model, must match the backend's GRAPH_ENCODING")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with the dataset .zip archives")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = parallel_ingest(dataset_jobs(args.encoding, args.data_dir), args.endpoint, args.workers, args.uploaders,
+                            args.chunksize, args.queue_size)
+    print_summary(stats, time.perf_counter() - start, args.workers)
+
+    if any(s["failed"] for s in stats.values()):
+        sys.exit(1)
+    invalidate_backend_cache()
+    print("Uploaded")
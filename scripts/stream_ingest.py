@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import sys
+import time
+from functools import partial
+
+import requests
+
+from datasets import DATA_DIR, ROOT_DIR, discover, parse_chunk, record_chunks
+from normalize import GRAPH_ENCODING, IHME_CONVERTERS, graph_endpoint, invalidate_backend_cache
+from norm2 import MALARIA_LINK, LUNG_LINK, malaria_frame_to_ntriples, lung_cancer_frame_to_ntriples
+from cause_of_deaths import cause_of_deaths_frame_to_ntriples
+
+GRAPHDB_STATEMENTS = "http://localhost:7200/repositories/disease-kg/statements"
+DEFAULT_CHUNKSIZE = 50000
+DEFAULT_STATE_FILE = os.path.join(ROOT_DIR, "ingest_progress.json")
+
+
+def peak_rss_mb() -> float:
+    """ Peak resident set size of this process in MB (0 where the resource module is missing) """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_progress(state_file: str) -> dict:
+    if state_file and os.path.exists(state_file):
+        with open(state_file, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def save_progress(state_file: str, progress: dict):
+    """ Write the progress file atomically so a crash never leaves it half written """
+    if not state_file:
+        return
+    tmp_file = state_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(progress, f, indent=2)
+    os.replace(tmp_file, state_file)
+
+
+def upload_chunk(session: requests.Session, nt_data: str, endpoint: str, retries: int = 3) -> bool:
+    """ POST one chunk of N-Triples to the /statements endpoint, retrying transient failures """
+    headers = {"Content-Type": "application/n-triples"}
+    for attempt in range(1, retries + 1):
+        try:
+            r = session.post(endpoint, data=nt_data.encode("utf-8"), headers=headers, timeout=300)
+            if r.status_code in [200, 204]:
+                return True
+            print(f"Upload failed: {r.status_code} - {r.text}")
+        except requests.exceptions.RequestException as e:
+            print(f"Upload failed: {e}")
+        if attempt < retries:
+            time.sleep(2 ** attempt)
+    return False
+
+
+def stream_ingest(file_path, frame_to_ntriples, endpoint: str = GRAPHDB_STATEMENTS,
+                  chunksize: int = DEFAULT_CHUNKSIZE, state_file: str = DEFAULT_STATE_FILE,
+                  session: requests.Session = None) -> bool:
+    """ Read a CSV in chunks, convert each chunk to N-Triples and upload it on its own.
+
+    Chunks go to the dataset's named graph (normalize.dataset_graph), one in memory at a time.
+    After every committed chunk its index is written to state_file, and a re-run skips
+    everything up to the last committed chunk without parsing it (resume with the same
+    chunksize). Returns False if a chunk could not be uploaded.
+    """
+    session = session or requests.Session()
+    endpoint = graph_endpoint(endpoint, file_path)
+    progress = load_progress(state_file)
+    key = str(file_path)
+    entry = progress.get(key, {})
+    if entry.get("done"):
+        print(f"{file_path}: already ingested, skipping")
+        return True
+    last_committed = entry.get("last_committed_chunk", -1)
+
+    start = time.perf_counter()
+    resumed_rows = rows = entry.get("rows", 0) if last_committed >= 0 else 0
+    index = -1
+    for index, (header, records) in enumerate(record_chunks(file_path, chunksize)):
+        if index <= last_committed:
+            continue
+
+        chunk = parse_chunk(header, records)
+        rows += len(chunk)
+        nt_data = frame_to_ntriples(chunk)
+        if not upload_chunk(session, nt_data, endpoint):
+            print(f"{file_path}: stopped at chunk {index}, re-run to resume")
+            return False
+
+        progress[key] = {"last_committed_chunk": index, "rows": rows}
+        save_progress(state_file, progress)
+        elapsed = time.perf_counter() - start
+        print(f"{file_path}: chunk {index} committed, {rows} rows, "
+              f"{(rows - resumed_rows) / elapsed:,.0f} rows/s, peak RSS {peak_rss_mb():.0f} MB")
+
+    progress[key] = {"last_committed_chunk": max(index, last_committed), "rows": rows, "done": True}
+    save_progress(state_file, progress)
+    return True
+
+
+def converters(encoding: str = GRAPH_ENCODING) -> dict:
+    """ Chunk converter per dataset kind (datasets.DATASET_KINDS).
+
+    encoding picks the IHME record model (see IHME_CONVERTERS); the other datasets have no
+    dimension ids and are always written with literals.
+    """
+    return {
+        "ihme": IHME_CONVERTERS[encoding],
+        "malaria": partial(malaria_frame_to_ntriples, dataset_link=MALARIA_LINK),
+        "lung": partial(lung_cancer_frame_to_ntriples, dataset_link=LUNG_LINK),
+        "cause_of_deaths": cause_of_deaths_frame_to_ntriples,
+    }
+
+
+def dataset_jobs(encoding: str = GRAPH_ENCODING, data_dir: str = DATA_DIR):
+    """ (source, chunk converter) for every dataset found under data_dir that has a converter """
+    registry = converters(encoding)
+    jobs = []
+    for kind, sources in discover(data_dir).items():
+        if kind not in registry:
+            print(f"no converter for {kind} datasets, skipping {len(sources)} file(s)")
+            continue
+        jobs.extend((source, registry[kind]) for source in sources)
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chunked, resumable CSV to GraphDB ingest")
+    parser.add_argument("--endpoint", default=GRAPHDB_STATEMENTS)
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--state", default=DEFAULT_STATE_FILE, help="progress file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress")
+    parser.add_argument("--encoding", choices=list(IHME_CONVERTERS), default=GRAPH_ENCODING,
+                        help="IHME record model, must match the backend's GRAPH_ENCODING")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="folder with the dataset .zip archives")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.state):
+        os.remove(args.state)
+
+    session = requests.Session()
+    failed = []
+    for path, converter in dataset_jobs(args.encoding, args.data_dir):
+        if not stream_ingest(path, converter, args.endpoint, args.chunksize, args.state, session):
+            failed.append(path)
+
+    if failed:
+        print(f"Failed: {failed}")
+        sys.exit(1)
+    invalidate_backend_cache()
+    print("Uploaded")
@@ -0,0 +1,151 @@
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from rdflib import Graph
+
+from datasets import DATA_DIR, read_csv
+from normalize import GRAPH_ENCODING, IHME_CONVERTERS
+from stream_ingest import dataset_jobs
+
+JSON_RESULTS = "application/sparql-results+json"
+TSV_RESULTS = "text/tab-separated-values"
+
+
+def sample_graph(data_dir: str = DATA_DIR, rows: int = 2000, encoding: str = GRAPH_ENCODING) -> Graph:
+    """ The first rows of every dataset under data_dir, converted the way the ingest loads them """
+    g = Graph()
+    for source, converter in dataset_jobs(encoding, data_dir):
+        nt_data = converter(read_csv(source, nrows=rows))
+        if nt_data:
+            g.parse(data=nt_data, format="nt")
+    return g
+
+
+def tsv_results(result) -> bytes:
+    """ SELECT results as GraphDB writes text/tab-separated-values: ?vars, then N-Triples terms """
+    lines = ["\t".join(f"?{var}" for var in result.vars)]
+    for row in result:
+        lines.append("\t".join("" if term is None else term.n3() for term in row))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+class StubGraphDB:
+    """ Local stand-in for the GraphDB SPARQL endpoint, for load tests without a running store.
+
+    Answers SELECT queries sent by GET or POST to any path, in SPARQL JSON or TSV depending on
+    the Accept header; GET .../stats returns its counters. rdflib evaluates one query at a
+    time, so each distinct query is evaluated once and its serialized result kept; latency
+    adds a fixed delay per request (outside the lock) for the real store's query time.
+    """
+
+    def __init__(self, graph: Graph, latency: float = 0.0, cache_size: int = 1024):
+        self.graph = graph
+        self.latency = latency
+        self.cache_size = cache_size
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.queries = 0
+        self.errors = 0
+        self.server = None
+
+    def answer(self, query: str, accept: str):
+        """ (status, content type, body) """
+        content_type = TSV_RESULTS if TSV_RESULTS in accept else JSON_RESULTS
+        key = (query, content_type)
+        with self.lock:
+            self.queries += 1
+            body = self.results.get(key)
+            if body is None:
+                try:
+                    result = self.graph.query(query)
+                    body = tsv_results(result) if content_type == TSV_RESULTS else result.serialize(format="json")
+                except Exception as e:
+                    self.errors += 1
+                    return 400, "text/plain", f"MALFORMED QUERY: {e}".encode("utf-8")
+                self.results[key] = body
+                if len(self.results) > self.cache_size:
+                    self.results.popitem(last=False)
+            else:
+                self.results.move_to_end(key)
+        if self.latency:
+            time.sleep(self.latency)
+        return 200, content_type, body
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"triples": len(self.graph), "queries": self.queries, "errors": self.errors,
+                    "cached_results": len(self.results)}
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """ Serve in a background thread; returns the repository URL """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def respond(self, params):
+                query = params.get("query", [None])[0]
+                if query is None:
+                    status, content_type, body = 400, "text/plain", b"Missing parameter: query"
+                else:
+                    status, content_type, body = stub.answer(query, self.headers.get("Accept", ""))
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.endswith("/stats"):
+                    body = json.dumps(stub.stats()).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.respond(parse_qs(url.query))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.respond(parse_qs(self.rfile.read(length).decode("utf-8")))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self.server.server_address[1]}/repositories/disease-kg"
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a sample of data/ as a local SPARQL endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7200)
+    parser.add_argument("--rows", type=int, default=2000, help="rows read from every dataset CSV")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every query")
+    parser.add_argument("--encoding", choices=list(IHME_CONVERTERS), default=GRAPH_ENCODING)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = sample_graph(args.data_dir, args.rows, args.encoding)
+    stub = StubGraphDB(graph, args.latency)
+    url = stub.start(args.host, args.port)
+    print(f"{len(graph):,} triples loaded in {time.perf_counter() - start:.1f}s, serving {url}", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.stop()
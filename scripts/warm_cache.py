@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import main  # noqa: E402
+from warmup import history_questions, warmup_questions  # noqa: E402
+
+
+async def run(questions, concurrency: int) -> dict:
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=concurrency)) as client:
+        main.graphdb_backend.client = client
+        try:
+            return await main.warm_up(questions, concurrency)
+        finally:
+            main.graphdb_backend.client = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute /ask answers for the common questions (run from cron "
+                                                 "or before a deploy; the API reads them from WARM_CACHE_DB)")
+    parser.add_argument("--concurrency", type=int, default=main.WARMUP_CONCURRENCY,
+                        help="backend queries in flight at once")
+    parser.add_argument("--max-questions", type=int, default=None, help="only the first, most asked, questions")
+    parser.add_argument("--history", type=int, default=500,
+                        help="most asked questions taken from the semantic cache first (0 for none)")
+    parser.add_argument("--rebuild", action="store_true", help="drop every stored answer first")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        main.warm_cache.invalidate()
+    history = history_questions(limit=args.history) if args.history else []
+    questions = itertools.islice(warmup_questions(main.analyzer, history), args.max_questions)
+
+    start = time.perf_counter()
+    stats = asyncio.run(run(questions, args.concurrency))
+    print(f"{stats['questions']} questions: {stats['queries']} answers computed ({stats['errors']} failed), "
+          f"{stats['cached']} already stored, {stats['skipped']} left to the LLM, rollups or daily series, "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"{main.warm_cache.stats()['size']} answers in {main.warm_cache.db_path}")
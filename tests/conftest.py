@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# caches the backend opens on its own are kept out of backend/ for the whole run
+CACHE_DIR = tempfile.TemporaryDirectory(prefix="disease-kg-tests-")
+os.environ["SPARQL_CACHE_DB"] = os.path.join(CACHE_DIR.name, "sparql_cache.sqlite")
+os.environ["WARM_CACHE_DB"] = os.path.join(CACHE_DIR.name, "warm_cache.sqlite")
+
+# backend/ and scripts/ are run as script directories, not packages; import their modules the same way
+for folder in ("backend", "scripts"):
+    path = os.path.join(ROOT, folder)
+    if path not in sys.path:
+        sys.path.insert(0, path)
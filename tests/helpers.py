@@ -0,0 +1,65 @@
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+from rdflib import Graph
+
+from normalize import ihme_frame_to_ntriples
+
+PREFIXES = """PREFIX dis: <http://diseases.org/disease-kg/>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>"""
+
+CAUSES = [(297, "Tuberculosis"), (298, "HIV/AIDS")]
+LOCATIONS = [(1, "Global"), (4, "Europe"), (166, "Africa")]
+MEASURES = [(1, "Deaths"), (5, "Prevalence")]
+SEXES = [(1, "Male"), (2, "Female"), (3, "Both")]
+YEARS = [2010, 2011, 2012]
+
+
+def ihme_frame(seed: int = 0) -> pd.DataFrame:
+    """ Small IHME GBD table: every cause x location x measure x sex x year, all ages, in numbers """
+    rows = []
+    for (cause_id, cause), (location_id, location), (measure_id, measure), (sex_id, sex), year in itertools.product(
+            CAUSES, LOCATIONS, MEASURES, SEXES, YEARS):
+        rows.append({"measure_id": measure_id, "measure_name": measure, "location_id": location_id,
+                     "location_name": location, "sex_id": sex_id, "sex_name": sex, "age_id": 22,
+                     "age_name": "All ages", "cause_id": cause_id, "cause_name": cause, "metric_id": 1,
+                     "metric_name": "Number", "year": year})
+    df = pd.DataFrame(rows)
+    df["val"] = np.random.default_rng(seed).uniform(1, 1000, len(df)).round(3)
+    return df
+
+
+def graph_of(nt_data: str) -> Graph:
+    g = Graph()
+    g.parse(data=nt_data, format="nt")
+    return g
+
+
+def ihme_graph(df: pd.DataFrame) -> Graph:
+    return graph_of(ihme_frame_to_ntriples(df))
+
+
+def run_sparql(graph: Graph, query: str) -> dict:
+    """ SPARQL JSON results of a query, as GraphDB would return them """
+    return json.loads(graph.query(query).serialize(format="json"))
+
+
+def result_rows(result: dict, digits: int = 3) -> list:
+    """ Rows as sorted tuples of plain values, numbers rounded, for comparing results across backends """
+    variables = result["head"]["vars"]
+    rows = []
+    for binding in result["results"]["bindings"]:
+        row = []
+        for var in variables:
+            cell = binding.get(var)
+            value = None if cell is None else cell["value"]
+            if cell is not None and var == "value":
+                value = round(float(value), digits)
+            elif cell is not None and var == "year":
+                value = int(value)
+            row.append(value)
+        rows.append(tuple(row))
+    return sorted(rows, key=repr)
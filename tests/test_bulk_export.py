@@ -0,0 +1,23 @@
+import zipfile
+
+from bulk_export import bulk_export, shard_prefix, validate
+from datasets import DataSource
+from normalize import dataset_graph, ihme_frame_to_ntriples
+
+from tests.helpers import ihme_frame
+
+
+def test_nquads_export_validates(tmp_path):
+    archive = tmp_path / "IHME-GBD_2021_DATA-test-1.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("IHME-GBD_2021_DATA-test-1.csv", ihme_frame().to_csv(index=False))
+    source = DataSource(str(archive), "IHME-GBD_2021_DATA-test-1.csv")
+    assert shard_prefix(source) == "IHME-GBD_2021_DATA-test-1"
+
+    out_dir = str(tmp_path / "export")
+    manifest = bulk_export([(source, ihme_frame_to_ntriples)], out_dir, workers=1, chunksize=40, shard_size=500)
+    dataset, = manifest["datasets"]
+    assert dataset["graph"] == dataset_graph(source)
+    assert dataset["rows"] == len(ihme_frame())
+    assert [shard["file"] for shard in dataset["shards"]][0] == "IHME-GBD_2021_DATA-test-1-00000.nq.gz"
+    assert validate(out_dir, workers=1)
@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import cache
+import main
+import normalize
+from cache import ResultCache, WarmCache, analysis_key
+
+TOKEN = "s3cret"
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    result_cache, warm_cache = ResultCache(), WarmCache(str(tmp_path / "warm.sqlite"))
+    result_cache.put("key", {"answer": 1})
+    warm_cache.put("key", {"answer": 1})
+    monkeypatch.setattr(main, "result_cache", result_cache)
+    monkeypatch.setattr(main, "warm_cache", warm_cache)
+    return result_cache, warm_cache
+
+
+def invalidate(headers=None, host="127.0.0.1"):
+    async def post():
+        transport = httpx.ASGITransport(app=main.app, client=(host, 50000))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/cache/invalidate", headers=headers or {})
+    return asyncio.run(post())
+
+
+def test_analysis_key_ignores_field_order():
+    assert analysis_key({"a": 1, "b": [2]}, "SELECT") == analysis_key({"b": [2], "a": 1}, "SELECT")
+    assert analysis_key({"a": 1}, "SELECT") != analysis_key({"a": 1}, "ASK")
+
+
+def test_result_cache_evicts_least_recently_used():
+    results = ResultCache(max_size=2)
+    results.put("a", {"n": 1})
+    results.put("b", {"n": 2})
+    assert results.get("a") == {"n": 1}
+    results.put("c", {"n": 3})
+    assert results.get("b") is None and results.get("a") == {"n": 1}
+    assert results.stats()["evictions"] == 1
+
+
+def test_result_cache_entries_expire(monkeypatch):
+    results = ResultCache(ttl=10)
+    results.put("a", {"n": 1})
+    now = cache.time.monotonic()
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now + 11)
+    assert results.get("a") is None
+    assert results.stats()["misses"] == 1
+
+
+def test_result_cache_of_size_zero_stores_nothing():
+    results = ResultCache(max_size=0)
+    results.put("a", {"n": 1})
+    assert results.get("a") is None
+
+
+def test_local_callers_invalidate_without_a_token(caches, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", "")
+    response = invalidate()
+    assert response.status_code == 200
+    assert response.json()["cache"]["invalidations"] == 1
+    result_cache, warm_cache = caches
+    assert result_cache.get("key") is None and warm_cache.get("key") is None
+
+
+def test_remote_callers_need_a_token(caches, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", "")
+    assert invalidate(host="203.0.113.7").status_code == 403
+    assert caches[0].get("key") == {"answer": 1}
+
+
+def test_token_is_checked_when_set(caches, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", TOKEN)
+    assert invalidate().status_code == 403
+    assert invalidate({main.CACHE_TOKEN_HEADER: "wrong"}).status_code == 403
+    assert caches[1].get("key") == {"answer": 1}
+    assert invalidate({main.CACHE_TOKEN_HEADER: TOKEN}, host="203.0.113.7").status_code == 200
+    assert caches[1].get("key") is None
+
+
+def test_ingest_scripts_send_the_token(caches, monkeypatch):
+    monkeypatch.setattr(main, "CACHE_ADMIN_TOKEN", TOKEN)
+    client = TestClient(main.app)
+    monkeypatch.setattr(normalize.requests, "post",
+                        lambda url, headers, timeout: client.post(url.replace("http://backend", ""), headers=headers))
+    normalize.invalidate_backend_cache("http://backend", token=TOKEN)
+    assert caches[0].stats()["invalidations"] == 1
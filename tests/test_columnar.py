@@ -0,0 +1,30 @@
+import json
+
+import pyarrow as pa
+
+from columnar import to_arrow_ipc, to_columns
+from query_backends import XSD
+
+RESULT = {
+    "head": {"vars": ["location", "year", "value"]},
+    "results": {"bindings": [
+        {"location": {"type": "literal", "value": "Europe"},
+         "year": {"type": "literal", "datatype": XSD + "gYear", "value": "2010"},
+         "value": {"type": "literal", "datatype": XSD + "float", "value": "1.5"}},
+        {"location": {"type": "literal", "value": "Africa"},
+         "year": {"type": "literal", "datatype": XSD + "gYear", "value": "2011"}},
+    ]},
+}
+
+
+def test_columnar_json_types_and_missing_values():
+    columns = to_columns(RESULT)
+    assert columns["types"] == {"location": "string", "year": "int64", "value": "float64"}
+    assert columns["columns"] == {"location": ["Europe", "Africa"], "year": [2010, 2011], "value": [1.5, None]}
+    assert columns["rows"] == 2
+
+
+def test_arrow_stream_matches_columnar_json():
+    table = pa.ipc.open_stream(to_arrow_ipc(RESULT, {"source": "local"})).read_all()
+    assert table.to_pydict() == to_columns(RESULT)["columns"]
+    assert json.loads(table.schema.metadata[b"ask"]) == {"source": "local"}
@@ -0,0 +1,64 @@
+import io
+
+import pandas as pd
+import pytest
+from rdflib import Graph
+
+from cause_of_deaths import add_cause_of_deaths_rows, cause_of_deaths_frame_to_ntriples
+from datasets import dataset_sources, read_csv
+from normalize import convert_ihme_dataset, ihme_frame_to_ntriples
+
+
+def ihme_frame(**overrides) -> pd.DataFrame:
+    row = {"measure_id": 1, "measure_name": "Deaths", "location_id": 1, "location_name": "Global",
+           "sex_id": 3, "sex_name": "Both", "age_id": 22, "age_name": "All ages", "cause_id": 297,
+           "cause_name": "Tuberculosis", "metric_id": 1, "metric_name": "Number", "year": 2015,
+           "val": 1234.5, "upper": 1300.0, "lower": 1100.0}
+    rows = []
+    for i, (key, value) in enumerate(overrides.items()):
+        rows.append({**row, "location_id": 100 + i, key: value})
+    return pd.DataFrame(rows or [row])
+
+
+def parsed(nt_data: str) -> set:
+    g = Graph()
+    g.parse(data=nt_data, format="nt")
+    return set(g)
+
+
+def assert_same_triples(df: pd.DataFrame):
+    """ convert_ihme_dataset reads a file, so both paths convert the same CSV text """
+    csv_text = df.to_csv(index=False)
+    reference = set(convert_ihme_dataset(io.StringIO(csv_text), Graph()))
+    assert reference
+    assert parsed(ihme_frame_to_ntriples(pd.read_csv(io.StringIO(csv_text)))) == reference
+
+
+def test_ihme_vectorized_matches_graph_conversion():
+    df = ihme_frame(location_name='Côte d\'Ivoire "CI"', cause_name="Not a SNOMED cause",
+                    sex_name="back\\slash", val=1e-07, age_name="line\nbreak")
+    assert_same_triples(df)
+
+
+def test_ihme_vectorized_empty_frame():
+    assert ihme_frame_to_ntriples(ihme_frame().iloc[:0]) == ""
+
+
+@pytest.mark.parametrize("source", dataset_sources("ihme")[:2], ids=str)
+def test_ihme_vectorized_matches_on_bundled_data(source):
+    assert_same_triples(read_csv(source, nrows=300))
+
+
+def test_cause_of_deaths_vectorized_matches_reference():
+    df = pd.DataFrame({
+        "Country/Territory": ["Afghanistan", "Afghanistan", "World Bank / Region"],
+        "Code": ["AFG", "AFG", None],
+        "Year": [1990, 1991, 1990],
+        "Malaria": [93, None, 1e6],
+        "Meningitis": [2159, 2218, 7.5],
+        "Tuberculosis": [4000, 4100, 9e5],
+        "Alzheimer's Disease and Other Dementias": [1116, 1136, 0],
+    })
+    reference = add_cause_of_deaths_rows(df, Graph())
+    assert len(reference) > 0
+    assert parsed(cause_of_deaths_frame_to_ntriples(df)) == set(reference)
@@ -0,0 +1,61 @@
+import zipfile
+
+import pandas as pd
+
+import stream_ingest
+from datasets import DataSource, parse_chunk, record_chunks
+
+CSV = b'id,name,val\n1,"multi\nline",1.5\n2,"say ""hi""",2.5\n3,plain,3.5\n4,"a,b",4.5\n'
+
+
+def zipped(tmp_path, data: bytes = CSV) -> DataSource:
+    archive = tmp_path / "sample.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("sample.csv", data)
+    return DataSource(str(archive), "sample.csv")
+
+
+def test_record_chunks_keep_quoted_newlines(tmp_path):
+    source = zipped(tmp_path)
+    chunks = [parse_chunk(header, records) for header, records in record_chunks(source, 2)]
+    assert [len(chunk) for chunk in chunks] == [2, 2]
+    whole = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(whole, source.read_csv())
+    assert whole["name"].tolist() == ["multi\nline", 'say "hi"', "plain", "a,b"]
+
+
+def test_zip_member_closes_the_archive(tmp_path):
+    source = zipped(tmp_path)
+    f = source.open()
+    archive_file = f._fileobj._file
+    f.close()
+    assert archive_file.closed
+
+    chunks = source.read_csv(chunksize=3)
+    assert sum(len(chunk) for chunk in chunks) == 4
+
+
+def test_resume_does_not_parse_committed_chunks(tmp_path, monkeypatch):
+    source = zipped(tmp_path)
+    state_file = str(tmp_path / "progress.json")
+    stream_ingest.save_progress(state_file, {str(source): {"last_committed_chunk": 0, "rows": 2}})
+
+    parsed, uploaded = [], []
+    monkeypatch.setattr(stream_ingest, "parse_chunk",
+                        lambda header, records: parsed.append(records) or parse_chunk(header, records))
+    monkeypatch.setattr(stream_ingest, "upload_chunk", lambda session, nt_data, endpoint: uploaded.append(nt_data) or True)
+
+    assert stream_ingest.stream_ingest(source, lambda df: ",".join(df["id"].astype(str)), chunksize=2,
+                                       state_file=state_file, session=object())
+    assert uploaded == ["3,4"]
+    assert len(parsed) == 1
+    assert stream_ingest.load_progress(state_file)[str(source)] == {"last_committed_chunk": 1, "rows": 4, "done": True}
+
+
+def test_parallel_chunk_tasks_cover_every_record_once(tmp_path):
+    from parallel_ingest import chunk_tasks, convert_chunk
+
+    source = zipped(tmp_path)
+    converter = lambda df: ",".join(df["id"].astype(str))  # noqa: E731
+    results = [convert_chunk(*task) for task in chunk_tasks([(source, converter)], 3)]
+    assert [(index, rows, nt_data) for _, index, rows, nt_data, _ in results] == [(0, 3, "1,2,3"), (1, 1, "4")]
@@ -0,0 +1,87 @@
+import pandas as pd
+import pytest
+
+from build_dimensions import DimensionWriter
+from cause_of_deaths import cause_of_deaths_frame_to_ntriples
+from normalize import ihme_frame_to_encoded_ntriples, ihme_frame_to_ntriples
+from query_backends import query_plan
+from sparql_planner import CardinalityStats, DimensionIndex, SparqlPlanner
+
+from tests.helpers import PREFIXES, graph_of, ihme_frame, result_rows, run_sparql
+
+# Kaggle table: Tuberculosis is an IHME cause (SupplementaryRecord), Malaria and Meningitis are not
+KAGGLE_TABLE = pd.DataFrame({"Country/Territory": ["Europe", "Europe", "Africa"], "Code": [None, None, None],
+                             "Year": [2010, 2011, 2010], "Tuberculosis": [5e6, 6e6, 7e6],
+                             "Malaria": [10.0, 20.0, 400.0], "Meningitis": [1.0, 2.0, 3.0]})
+
+
+def analysis(**fields) -> dict:
+    base = {"diseases": [], "locations": [], "measures": [], "time_period": None, "grouping": [], "aggregation": None}
+    return {**base, **fields}
+
+
+QUESTIONS = [
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"], time_period="2011"),
+    analysis(diseases=["Malaria"], locations=["Europe"]),
+    analysis(diseases=["Malaria"], locations=["Europe"], aggregation="sum"),
+    analysis(diseases=["Malaria", "HIV/AIDS"], measures=["Deaths"], aggregation="sum", grouping=["location"]),
+    analysis(diseases=["Tuberculosis", "Meningitis"], locations=["Europe", "Africa"], aggregation="avg",
+             grouping=["sex"]),
+    analysis(measures=["Deaths"], aggregation="sum", grouping=["year"]),
+]
+
+
+@pytest.fixture(scope="module")
+def records():
+    return ihme_frame()
+
+
+@pytest.fixture(scope="module")
+def literal_graph(records):
+    return graph_of(ihme_frame_to_ntriples(records) + cause_of_deaths_frame_to_ntriples(KAGGLE_TABLE))
+
+
+@pytest.fixture(scope="module")
+def encoded_graph(records):
+    return graph_of(ihme_frame_to_encoded_ntriples(records) + cause_of_deaths_frame_to_ntriples(KAGGLE_TABLE))
+
+
+@pytest.fixture(scope="module", params=["indexed", "labels"])
+def dimensions(request, records, tmp_path_factory):
+    """ The ingest-time dimension index, or none, so entities are matched on their labels """
+    path = str(tmp_path_factory.mktemp("dimensions") / "dimensions.tsv")
+    if request.param == "indexed":
+        writer = DimensionWriter()
+        writer.add_frame(records)
+        writer.write(path)
+    return DimensionIndex(path)
+
+
+def rows(graph, planner: SparqlPlanner, question: dict) -> list:
+    # averages add up in a different order on the two graphs
+    return result_rows(run_sparql(graph, planner.render(query_plan(question, None), PREFIXES, "")), digits=2)
+
+
+@pytest.mark.parametrize("question", QUESTIONS, ids=repr)
+def test_encoded_graph_answers_like_literal_graph(literal_graph, encoded_graph, dimensions, question):
+    stats = CardinalityStats(data={})
+    expected = rows(literal_graph, SparqlPlanner(stats=stats, encoding="literal"), question)
+    assert expected
+    encoded = SparqlPlanner(stats=stats, encoding="dimensions", dimensions=dimensions)
+    assert rows(encoded_graph, encoded, question) == expected
+
+
+def test_cause_of_deaths_records_are_counted_when_encoded(encoded_graph, dimensions):
+    planner = SparqlPlanner(stats=CardinalityStats(data={}), encoding="dimensions", dimensions=dimensions)
+    assert rows(encoded_graph, planner, analysis(diseases=["Malaria"], locations=["Europe"], aggregation="sum")) == [(30.0,)]
+
+
+def test_encoded_records_link_every_dimension(records, encoded_graph):
+    literal = run_sparql(graph_of(ihme_frame_to_ntriples(records)), PREFIXES + """
+SELECT ?record ?age ?metric WHERE { ?record a dis:HealthRecord ; dis:age ?age ; dis:metric ?metric }""")
+    encoded = run_sparql(encoded_graph, PREFIXES + """
+SELECT ?record ?age ?metric WHERE {
+    ?record a dis:HealthRecord ; dis:hasAge/rdfs:label ?age ; dis:hasMetric/rdfs:label ?metric .
+}""")
+    assert len(encoded["results"]["bindings"]) == len(records)
+    assert result_rows(encoded) == result_rows(literal)
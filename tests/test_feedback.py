@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import ResultCache
+from query_backends import QueryBackend
+
+QUESTION = "tuberculosis deaths in europe in 2011"
+
+RESULT = {"head": {"vars": ["value"]},
+          "results": {"bindings": [{"value": {"type": "literal", "value": "42.0"}}]}}
+
+
+class FixedBackend(QueryBackend):
+    name = "fixed"
+
+    def run(self, analysis, sparql_query, limit=20, offset=0):
+        return RESULT
+
+
+@pytest.fixture
+def model_calls(monkeypatch):
+    """ Questions sent to the model; each call takes 0.5s """
+    calls = []
+
+    async def call_hf_model(question):
+        calls.append(question)
+        await asyncio.sleep(0.5)
+        return f"feedback on {question}"
+
+    monkeypatch.setattr(main, "call_hf_model", call_hf_model)
+    monkeypatch.setattr(main, "query_backend", FixedBackend())
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    monkeypatch.setattr(main, "cached_answer", lambda cache_key: None)
+    return calls
+
+
+def test_template_answer_does_not_call_model(model_calls):
+    with TestClient(main.app) as client:
+        body = client.post("/ask", json={"question": QUESTION}).json()
+
+    assert body["route"]["path"] == "template"
+    assert body["source"] == "fixed" and body["result"] == RESULT
+    assert body["model_feedback"] is None
+    assert model_calls == []
+
+
+def test_feedback_is_polled_after_the_answer(model_calls):
+    with TestClient(main.app) as client:
+        start = time.perf_counter()
+        body = client.post("/ask", json={"question": QUESTION, "feedback": True}).json()
+        assert time.perf_counter() - start < 0.5
+        assert body["result"] == RESULT
+        assert body["model_feedback"]["status"] == "pending"
+
+        deadline = time.monotonic() + 10
+        while True:
+            job = client.get(body["model_feedback"]["url"]).json()
+            if job["status"] != "pending" or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+
+    assert job == {"id": body["model_feedback"]["id"], "status": "done", "model_feedback": f"feedback on {QUESTION}"}
+    assert model_calls == [QUESTION]
+
+
+def test_unknown_feedback_id_is_404():
+    with TestClient(main.app) as client:
+        assert client.get("/ask/feedback/unknown").status_code == 404
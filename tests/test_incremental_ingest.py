@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+import pytest
+import requests
+
+import incremental_ingest
+import stream_ingest
+from datasets import ROOT_DIR
+
+ROWS = pd.DataFrame({"id": [1, 2, 3, 4], "year": [2010, 2010, 2011, 2011], "val": [1.0, 2.0, 3.0, 4.0]})
+
+
+class Session:
+    """ Records SPARQL updates; raises instead once offline """
+
+    def __init__(self, offline: bool = False):
+        self.offline = offline
+        self.updates = []
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        if self.offline:
+            raise requests.exceptions.ConnectionError("connection refused")
+        self.updates.append(data["update"])
+        response = requests.Response()
+        response.status_code = 204
+        return response
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    uploads = {"rows": [], "fail": False}
+
+    def upload_chunk(session, nt_data, endpoint):
+        if uploads["fail"]:
+            return False
+        uploads["rows"].extend(nt_data.split(","))
+        return True
+
+    monkeypatch.setattr(incremental_ingest, "upload_chunk", upload_chunk)
+    return uploads
+
+
+def ids(df: pd.DataFrame) -> str:
+    return ",".join(df["id"].astype(str))
+
+
+def ingest(path, manifest, session):
+    return incremental_ingest.incremental_ingest(path, ids, manifest, "http://graphdb.test", "literal", 10, session)
+
+
+def test_state_files_default_to_the_repo_root():
+    assert os.path.dirname(incremental_ingest.DEFAULT_MANIFEST) == ROOT_DIR
+    assert os.path.dirname(stream_ingest.DEFAULT_STATE_FILE) == ROOT_DIR
+
+
+def test_unreachable_graphdb_is_reported_not_raised(tmp_path, uploads, capsys):
+    path = tmp_path / "data.csv"
+    ROWS.to_csv(path, index=False)
+    manifest = {}
+    assert not ingest(path, manifest, Session(offline=True))
+    assert "Update failed: connection refused" in capsys.readouterr().out
+    assert manifest == {}
+
+
+def test_failed_partitions_are_reloaded_even_if_the_file_changes_back(tmp_path, uploads):
+    path = tmp_path / "data.csv"
+    ROWS.to_csv(path, index=False)
+    manifest = {}
+    assert ingest(path, manifest, Session())
+    assert set(manifest[str(path)]["partitions"]) == {"2010", "2011"}
+
+    ROWS.assign(val=[1.0, 2.0, 3.0, 5.0]).to_csv(path, index=False)
+    uploads["fail"] = True
+    assert not ingest(path, manifest, Session())
+    assert set(manifest[str(path)]["partitions"]) == {"2010"}
+
+    ROWS.to_csv(path, index=False)
+    uploads["fail"], uploads["rows"] = False, []
+    session = Session()
+    assert ingest(path, manifest, session)
+    assert sorted(uploads["rows"]) == ["3", "4"]
+    assert '"2011"^^xsd:gYear' in session.updates[0]
+
+
+def test_ingest_changed_saves_the_manifest_of_a_failed_dataset(tmp_path, uploads, monkeypatch):
+    path, manifest_file = tmp_path / "data.csv", str(tmp_path / "manifest.json")
+    ROWS.to_csv(path, index=False)
+    monkeypatch.setattr(incremental_ingest.requests, "Session", Session)
+    monkeypatch.setattr(incremental_ingest, "invalidate_backend_cache", lambda: None)
+    assert incremental_ingest.ingest_changed([(path, ids)], manifest_file, "http://graphdb.test", "literal", 10) == []
+
+    ROWS.assign(val=[0.0, 2.0, 3.0, 4.0]).to_csv(path, index=False)
+    uploads["fail"] = True
+    assert incremental_ingest.ingest_changed([(path, ids)], manifest_file, "http://graphdb.test", "literal", 10) == [path]
+    assert set(stream_ingest.load_progress(manifest_file)[str(path)]["partitions"]) == {"2011"}
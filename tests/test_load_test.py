@@ -0,0 +1,84 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from load_test import baseline_levels, percentiles, print_level, run_level
+
+
+class AskHandler(BaseHTTPRequestHandler):
+    """ /ask stand-in: "fail" questions get a 500, "llm" ones come from the model, the rest from GraphDB """
+
+    def do_POST(self):
+        question = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["question"]
+        timed = self.headers.get("X-Debug-Timing") == "1"
+        if question == "fail":
+            status, body = 500, {"error": "boom"}
+        else:
+            status = 200
+            body = {"result": {"head": {"vars": []}, "results": {"bindings": []}},
+                    "timings": {"total": 4.0, "graphdb": 2.0} if timed else {}}
+            if question == "llm":
+                body["source"] = "llm"
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ask_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), AskHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/ask"
+    server.shutdown()
+    server.server_close()
+
+
+def test_percentiles_are_in_milliseconds():
+    stats = percentiles([0.001 * i for i in range(1, 101)])
+    assert stats["count"] == 100
+    assert stats["mean_ms"] == 50.5 and stats["p50_ms"] == 50.5
+    assert stats["p99_ms"] == pytest.approx(99.01)
+
+
+def test_run_level_counts_requests_errors_and_sources(ask_url):
+    level = asyncio.run(run_level(ask_url, ["tb deaths", "llm", "fail"], concurrency=4, requests=9, timeout=10))
+    assert level["concurrency"] == 4
+    assert level["requests"] == 9 and level["errors"] == 3
+    assert level["sources"] == {"graphdb": 6, "llm": 3}
+    assert level["latency"]["client"]["count"] == 9
+    assert level["latency"]["graphdb"] == {"count": 6, "mean_ms": 2.0, "p50_ms": 2.0, "p95_ms": 2.0, "p99_ms": 2.0}
+
+
+def test_unreachable_app_counts_as_errors():
+    level = asyncio.run(run_level("http://127.0.0.1:9/ask", ["tb deaths"], concurrency=2, requests=3, timeout=1))
+    assert level["errors"] == 3 and level["requests"] == 0
+
+
+def test_levels_compare_against_a_baseline_report(tmp_path, capsys):
+    level = {"concurrency": 4, "throughput_rps": 200.0, "errors": 0,
+             "latency": {"client": {"count": 9, "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0}}}
+    before = {**level, "throughput_rps": 100.0, "latency": {"client": {**level["latency"]["client"], "p95_ms": 40.0}}}
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"apps": {"main": [before]}}))
+
+    baseline = baseline_levels(str(path))
+    assert baseline == {("main", 4): before}
+    assert baseline_levels(None) == {}
+    print_level("main", level, baseline[("main", 4)])
+    assert "(throughput 2.00x, p95 0.50x vs baseline)" in capsys.readouterr().out
+
+
+def test_level_without_successful_requests_is_reported(capsys):
+    level = {"concurrency": 2, "errors": 3, "throughput_rps": 0.0, "latency": {"client": percentiles([])}}
+    print_level("main", level, level)
+    assert "no successful requests, errors 3" in capsys.readouterr().out
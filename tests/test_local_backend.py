@@ -0,0 +1,62 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+from query_backends import LocalBackend, query_plan
+from sparql_planner import CardinalityStats, SparqlPlanner
+
+from tests.helpers import PREFIXES, ihme_frame, ihme_graph, result_rows, run_sparql
+
+KAGGLE_TABLE = pd.DataFrame({"Country/Territory": ["Europe", "Europe"], "Code": [None, None], "Year": [2010, 2011],
+                             "Tuberculosis": [5e6, 6e6], "Malaria": [10.0, 20.0]})
+
+
+def analysis(**fields) -> dict:
+    base = {"diseases": [], "locations": [], "measures": [], "time_period": None, "grouping": [], "aggregation": None}
+    return {**base, **fields}
+
+
+@pytest.fixture(scope="module")
+def records():
+    return ihme_frame()
+
+
+@pytest.fixture(scope="module")
+def data_dir(records, tmp_path_factory):
+    """ data/ with one zipped IHME extract and the zipped Kaggle table, as discover() finds them """
+    folder = tmp_path_factory.mktemp("data")
+    with zipfile.ZipFile(folder / "IHME-GBD_2021_DATA-test-1-TUBERCULOSIS.zip", "w") as zf:
+        zf.writestr("IHME-GBD_2021_DATA-test-1.csv", records.to_csv(index=False))
+    with zipfile.ZipFile(folder / "CauseOfDeathsAroundTheWorld(kaggle).zip", "w") as zf:
+        zf.writestr("cause_of_deaths.csv", KAGGLE_TABLE.to_csv(index=False))
+    return str(folder)
+
+
+@pytest.mark.parametrize("question", [
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"], time_period="2011"),
+    analysis(diseases=["Tuberculosis", "HIV/AIDS"], locations=["Africa"], time_period="2010"),
+    analysis(diseases=["HIV/AIDS"], measures=["Prevalence"], aggregation="sum", grouping=["location"]),
+    analysis(diseases=["Tuberculosis"], locations=["Europe", "Global"], aggregation="avg", grouping=["sex"]),
+], ids=repr)
+def test_local_backend_matches_graph(records, data_dir, question):
+    backend = LocalBackend(data_dir)
+    planner = SparqlPlanner(stats=CardinalityStats(data={}), encoding="literal")
+    expected = run_sparql(ihme_graph(records), planner.render(query_plan(question, None), PREFIXES, ""))
+    assert result_rows(backend.run(question, "", limit=None)) == result_rows(expected)
+
+
+def test_load_reads_every_template_dataset(data_dir):
+    backend = LocalBackend(data_dir)
+    malaria = backend.run(analysis(diseases=["Malaria"], locations=["Europe"], aggregation="sum"), "", limit=None)
+    assert result_rows(malaria) == [(30.0,)]
+
+    # the Kaggle tuberculosis records are not HealthRecords, so only the IHME values are summed
+    tuberculosis = analysis(diseases=["Tuberculosis"], locations=["Europe"], aggregation="sum")
+    from_ihme = LocalBackend(frame=backend.frame[backend.frame["value"] < 1e6]).run(tuberculosis, "", limit=None)
+    assert result_rows(backend.run(tuberculosis, "", limit=None)) == result_rows(from_ihme)
+
+
+def test_uncovered_cause_is_an_error(data_dir):
+    result = LocalBackend(data_dir).run(analysis(diseases=["Tuberculosis", "Lung Cancer"]), "")
+    assert result["error"] == "Not covered by the local backend: Lung Cancer"
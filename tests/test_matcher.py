@@ -0,0 +1,54 @@
+import pytest
+
+from matcher import PhraseMatcher, build_phrases
+
+VOCABULARY = {
+    "diseases": {"lung": "Lung", "lung cancer": "Lung Cancer", "cancer": "Neoplasms", "covid-19": "COVID-19",
+                 "malaria": "Malaria", "маларија": "Malaria"},
+    "gender": {"men": "Male", "women": "Female"},
+    "locations": {"new york": "New York", "york": "York", "georgia": "Georgia"},
+    "states": {"georgia": "Georgia (US)"},
+}
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return PhraseMatcher(build_phrases(VOCABULARY))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("deaths among women", [("gender", "Female")]),
+    ("menopause and women", [("gender", "Female")]),
+    ("malarial fever", []),
+    ("Malaria, (COVID-19) and men.", [("diseases", "Malaria"), ("diseases", "COVID-19"), ("gender", "Male")]),
+    ("covid-19s", []),
+])
+def test_phrases_match_on_word_boundaries(matcher, text, expected):
+    assert matcher.find(text) == expected
+
+
+def test_longest_overlapping_phrase_wins(matcher):
+    assert matcher.find("lung cancer deaths") == [("diseases", "Lung Cancer")]
+    assert matcher.find("cases in new york") == [("locations", "New York")]
+
+
+def test_shorter_phrase_matches_when_the_longer_one_is_cut_off(matcher):
+    assert matcher.find("lung cancerous cells") == [("diseases", "Lung")]
+    assert matcher.find("lung and cancer") == [("diseases", "Lung"), ("diseases", "Neoplasms")]
+
+
+def test_phrase_in_several_categories_gets_every_tag(matcher):
+    assert matcher.find("georgia") == [("locations", "Georgia"), ("states", "Georgia (US)")]
+
+
+def test_macedonian_phrases_keep_their_inflection(matcher):
+    assert matcher.find("смртност од маларијата") == [("diseases", "Malaria")]
+    assert matcher.find("антималаријата") == []
+
+
+def test_unmatched_words_skip_matched_phrases(matcher):
+    assert matcher.unmatched_words("Lung cancer deaths among women in New York") == ["deaths", "among", "in"]
+
+
+def test_empty_vocabulary_matches_nothing():
+    assert PhraseMatcher({}).find("anything at all") == []
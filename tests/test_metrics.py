@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import ResultCache
+from metrics import TIMING_HEADER, RequestTimer, StageMetrics
+from query_backends import QueryBackend
+
+RESULT = {"head": {"vars": ["value"]},
+          "results": {"bindings": [{"value": {"type": "literal", "value": "42.0"}}]}}
+
+
+class FixedBackend(QueryBackend):
+    name = "fixed"
+
+    def run(self, analysis, sparql_query, limit=20, offset=0):
+        return RESULT
+
+
+def samples(text: str) -> dict:
+    """ Metric line -> value, comments left out """
+    return dict(line.rsplit(" ", 1) for line in text.splitlines() if line and not line.startswith("#"))
+
+
+def test_buckets_are_cumulative_and_bounds_inclusive():
+    metrics = StageMetrics(name="t", buckets=(0.5, 0.1, 1.0))
+    for seconds in [0.05, 0.1, 0.3, 1.0, 7.0]:
+        metrics.observe("graphdb", seconds)
+    lines = samples(metrics.render())
+    assert lines['t_bucket{stage="graphdb",le="0.1"}'] == "2"
+    assert lines['t_bucket{stage="graphdb",le="0.5"}'] == "3"
+    assert lines['t_bucket{stage="graphdb",le="1.0"}'] == "4"
+    assert lines['t_bucket{stage="graphdb",le="+Inf"}'] == "5"
+    assert lines['t_count{stage="graphdb"}'] == "5"
+    assert float(lines['t_sum{stage="graphdb"}']) == pytest.approx(8.45)
+
+
+def test_render_has_one_header_and_sorted_stages():
+    metrics = StageMetrics(name="t", buckets=(1.0,))
+    metrics.observe("llm", 0.2)
+    metrics.observe("analysis", 0.1)
+    text = metrics.render()
+    assert text.splitlines()[:2] == ["# HELP t Time spent in each /ask pipeline stage.", "# TYPE t histogram"]
+    assert text.index('stage="analysis"') < text.index('stage="llm"')
+    assert StageMetrics(name="t").render().count("\n") == 2
+
+
+def test_timer_adds_repeated_stages():
+    metrics = StageMetrics(name="t")
+    timer = RequestTimer(metrics)
+    timer.record("graphdb", 0.25)
+    timer.record("graphdb", 0.5)
+    assert timer.breakdown() == {"graphdb": 750.0}
+    assert samples(metrics.render())['t_count{stage="graphdb"}'] == "2"
+
+
+def test_metrics_endpoint_renders_ask_stages(monkeypatch):
+    monkeypatch.setattr(main, "stage_metrics", StageMetrics())
+    monkeypatch.setattr(main, "query_backend", FixedBackend())
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    monkeypatch.setattr(main, "cached_answer", lambda cache_key: None)
+    with TestClient(main.app) as client:
+        body = client.post("/ask", json={"question": "hiv prevalence in asia"}, headers={TIMING_HEADER: "1"}).json()
+        response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    lines = samples(response.text)
+    assert set(body["timings"]) <= {key.split('"')[1] for key in lines if key.startswith(main.stage_metrics.name)}
+    assert lines['ask_stage_duration_seconds_count{stage="total"}'] == "1"
@@ -0,0 +1,65 @@
+import threading
+from urllib.parse import unquote
+
+import parallel_ingest
+import stream_ingest
+from normalize import dataset_graph, graph_endpoint
+
+from tests.test_datasets import zipped
+
+STATEMENTS = "http://graphdb/repositories/test/statements"
+
+
+def ids(df) -> str:
+    return ",".join(df["id"].astype(str))
+
+
+def test_graph_endpoint_names_the_dataset_graph(tmp_path):
+    source = zipped(tmp_path)
+    assert dataset_graph(source) == "http://diseases.org/disease-kg/graph/sample"
+    assert unquote(graph_endpoint(STATEMENTS, source)) == f"{STATEMENTS}?context=<{dataset_graph(source)}>"
+
+
+def test_stream_ingest_uploads_into_the_dataset_graph(tmp_path, monkeypatch):
+    source = zipped(tmp_path)
+    endpoints = []
+    monkeypatch.setattr(stream_ingest, "upload_chunk",
+                        lambda session, nt_data, endpoint: endpoints.append(endpoint) or True)
+
+    assert stream_ingest.stream_ingest(source, ids, STATEMENTS, chunksize=2,
+                                       state_file=str(tmp_path / "progress.json"), session=object())
+    assert endpoints == [graph_endpoint(STATEMENTS, source)] * 2
+
+
+def test_parallel_ingest_uploads_into_the_dataset_graph(tmp_path, monkeypatch):
+    source = zipped(tmp_path)
+    endpoints = []
+    monkeypatch.setattr(parallel_ingest, "upload_chunk",
+                        lambda session, nt_data, endpoint: endpoints.append(endpoint) or True)
+
+    stats = parallel_ingest.parallel_ingest([(source, ids)], STATEMENTS, workers=1, uploaders=1, chunksize=2)
+    assert stats[source]["rows"] == 4
+    assert endpoints == [graph_endpoint(STATEMENTS, source)] * 2
+
+
+def test_parallel_ingest_raises_an_uploader_error_instead_of_hanging(tmp_path, monkeypatch):
+    source = zipped(tmp_path, b"id,name\n" + b"".join(b"%d,row %d\n" % (i, i) for i in range(40)))
+
+    def upload_chunk(session, nt_data, endpoint):
+        raise RuntimeError("uploader crashed")
+
+    monkeypatch.setattr(parallel_ingest, "upload_chunk", upload_chunk)
+    outcome = {}
+
+    def run():
+        try:
+            parallel_ingest.parallel_ingest([(source, ids)], STATEMENTS, workers=1, uploaders=1, chunksize=2,
+                                            queue_size=1)
+        except RuntimeError as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert str(outcome["error"]) == "uploader crashed"
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import rollups
+import sparql_planner
+import timeseries
+from build_dimensions import DIMENSIONS_FILE
+from build_rollups import ROLLUP_DB
+from build_statistics import STATISTICS_FILE
+from build_timeseries import TIMESERIES_FILE
+from build_vocabulary import VOCABULARY_FILE
+
+
+@pytest.mark.parametrize("written, read", [
+    (ROLLUP_DB, rollups.ROLLUP_DB),
+    (DIMENSIONS_FILE, sparql_planner.DIMENSIONS_FILE),
+    (STATISTICS_FILE, sparql_planner.STATISTICS_FILE),
+    (TIMESERIES_FILE, timeseries.TIMESERIES_FILE),
+], ids=os.path.basename)
+def test_build_scripts_write_where_the_backend_reads(written, read):
+    assert os.path.isabs(written)
+    assert os.path.realpath(written) == os.path.realpath(read)
+
+
+def test_vocabulary_is_written_where_the_backend_reads():
+    backend_dir = os.path.dirname(os.path.abspath(sparql_planner.__file__))
+    assert os.path.realpath(VOCABULARY_FILE) == os.path.realpath(os.path.join(backend_dir, "vocabulary.tsv"))
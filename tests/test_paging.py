@@ -0,0 +1,94 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import ResultCache
+from paging import decode_cursor, encode_cursor, page_info
+from query_backends import QueryBackend
+
+from tests.helpers import ihme_frame, ihme_graph, result_rows, run_sparql
+
+QUESTION = "tuberculosis deaths in europe"
+# 3 sexes x 3 years of Tuberculosis deaths in Europe
+ROWS = 9
+
+
+class GraphBackend(QueryBackend):
+    """ Runs the generated SPARQL on an in-memory rdflib graph, recording every query """
+    name = "rdflib"
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.queries = []
+
+    def run(self, analysis, sparql_query, limit=20, offset=0):
+        self.queries.append(sparql_query)
+        return run_sparql(self.graph, sparql_query)
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return ihme_graph(ihme_frame())
+
+
+@pytest.fixture
+def backend(graph, monkeypatch):
+    backend = GraphBackend(graph)
+    monkeypatch.setattr(main, "query_backend", backend)
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    monkeypatch.setattr(main, "cached_answer", lambda cache_key: None)
+    monkeypatch.setattr(main.generator, "planner", main.SparqlPlanner(encoding="literal"))
+    return backend
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(40, 20)) == (40, 20)
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor")
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(-1, 20))
+
+
+def test_page_info_has_no_cursor_after_the_last_page():
+    full = {"results": {"bindings": [{}] * 4}}
+    assert decode_cursor(page_info(full, 4, 8)["next_cursor"]) == (12, 4)
+    assert page_info({"results": {"bindings": [{}] * 3}}, 4, 8)["next_cursor"] is None
+
+
+@pytest.mark.parametrize("limit, offset", [(20, 0), (20, 20), (4, 0), (None, 0)])
+def test_every_paginated_query_is_ordered(limit, offset):
+    query, _ = main.generator.generate_query(main.analyzer.analyze_question(QUESTION), limit, offset, paged=True)
+    assert "ORDER BY" in query
+
+
+def test_cursor_pages_cover_every_row_once(backend):
+    with TestClient(main.app) as client:
+        expected = client.post("/ask", json={"question": QUESTION, "page_size": 100}).json()["result"]
+        request, pages = {"question": QUESTION, "page_size": 4}, []
+        while True:
+            body = client.post("/ask", json=request).json()
+            pages.append(body["result"]["results"]["bindings"])
+            if body["page"]["next_cursor"] is None:
+                break
+            request = {"question": QUESTION, "cursor": body["page"]["next_cursor"]}
+
+    assert [len(page) for page in pages] == [4, 4, 1]
+    assert all("ORDER BY" in query for query in backend.queries)
+    paged = {"head": expected["head"], "results": {"bindings": [row for page in pages for row in page]}}
+    assert result_rows(paged) == result_rows(expected)
+    assert len(set(result_rows(paged))) == ROWS
+
+
+def test_ndjson_stream(backend, graph):
+    with TestClient(main.app) as client:
+        response = client.post("/ask", json={"question": QUESTION, "stream": True})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    header, rows, trailer = lines[0], lines[1:-1], lines[-1]
+    assert header["source"] == "rdflib" and "head" in header
+    assert trailer == {"done": True, "rows": ROWS}
+    streamed = {"head": header["head"], "results": {"bindings": rows}}
+    assert result_rows(streamed) == result_rows(run_sparql(graph, backend.queries[0]))
@@ -0,0 +1,108 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from build_rollups import RollupWriter
+from cause_of_deaths import cause_of_deaths_frame_to_ntriples, health_records
+from query_backends import query_plan
+from normalize import ihme_frame_to_ntriples
+from rollups import RollupStore
+from sparql_planner import CardinalityStats, SparqlPlanner
+
+from tests.helpers import PREFIXES, graph_of, ihme_frame, ihme_graph, result_rows, run_sparql
+
+
+def analysis(**fields) -> dict:
+    base = {"diseases": [], "locations": [], "measures": [], "time_period": None, "grouping": [],
+            "aggregation": "sum"}
+    return {**base, **fields}
+
+
+@pytest.fixture(scope="module")
+def records():
+    return ihme_frame()
+
+
+@pytest.fixture(scope="module")
+def graph(records):
+    return ihme_graph(records)
+
+
+@pytest.fixture(scope="module")
+def store(records, tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("rollups") / "rollups.sqlite")
+    writer = RollupWriter(db_path, rebuild=True)
+    # two chunks, so cells are merged across add_frame calls
+    writer.add_frame(records.iloc[:50], "a.csv")
+    writer.add_frame(records.iloc[50:], "a.csv")
+    writer.close()
+    return RollupStore(db_path)
+
+
+def graph_answer(graph, question: dict) -> list:
+    plan = query_plan(question, limit=None)
+    planner = SparqlPlanner(stats=CardinalityStats(data={}), encoding="literal")
+    return result_rows(run_sparql(graph, planner.render(plan, PREFIXES, "")))
+
+
+@pytest.mark.parametrize("question", [
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"]),
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"], grouping=["sex"]),
+    analysis(diseases=["HIV/AIDS"], measures=["Prevalence"], grouping=["location"]),
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], time_period="2011", grouping=["year"]),
+    analysis(diseases=["Tuberculosis", "HIV/AIDS"], measures=["Deaths"], locations=["Africa"]),
+    analysis(diseases=["Tuberculosis"], locations=["Europe", "Africa"], aggregation="avg", grouping=["year"]),
+    analysis(measures=["Deaths"], aggregation="avg"),
+], ids=repr)
+def test_rollup_matches_graph(store, graph, question):
+    assert store.can_answer(question)
+    assert result_rows(store.answer(question, limit=None)) == graph_answer(graph, question)
+
+
+@pytest.mark.parametrize("question", [
+    analysis(diseases=["Malaria"], measures=["Deaths"], locations=["Africa"]),
+    analysis(diseases=["Lung Cancer"]),
+    analysis(diseases=["Malaria"], aggregation="avg", grouping=["year"]),
+    analysis(diseases=["Tuberculosis", "Malaria"]),
+    analysis(diseases=["Tuberculosis"], locations=["Spain"]),
+], ids=repr)
+def test_rollup_refuses_uncovered_filters(store, question):
+    assert not store.can_answer(question)
+    assert store.answer(question) is None
+
+
+def test_location_filter_dropped_by_grouping_is_not_checked(store):
+    question = analysis(diseases=["Tuberculosis"], locations=["Spain"], grouping=["location"])
+    assert store.can_answer(question)
+
+
+def test_rollup_without_coverage_answers_nothing(store, tmp_path):
+    db_path = str(tmp_path / "old.sqlite")
+    with sqlite3.connect(store.db_path) as source, sqlite3.connect(db_path) as copy:
+        source.backup(copy)
+        copy.execute("DROP TABLE rollup_coverage")
+    assert not RollupStore(db_path).can_answer(analysis(diseases=["Tuberculosis"]))
+
+
+def test_cause_of_deaths_records_do_not_add_to_ihme_causes(records, tmp_path):
+    """ The Kaggle table's tuberculosis records stay out of the sums; its other causes are rolled up """
+    table = pd.DataFrame({"Country/Territory": ["Europe", "Europe"], "Code": [None, None], "Year": [2010, 2011],
+                          "Tuberculosis": [5e6, 6e6], "Malaria": [10.0, 20.0]})
+    graph = graph_of(ihme_frame_to_ntriples(records) + cause_of_deaths_frame_to_ntriples(table))
+
+    db_path = str(tmp_path / "rollups.sqlite")
+    writer = RollupWriter(db_path, rebuild=True)
+    writer.add_frame(records, "ihme.csv")
+    writer.add_frame(health_records(table), "cause_of_deaths.csv")
+    writer.close()
+    store = RollupStore(db_path)
+
+    tuberculosis = analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"], grouping=["year"])
+    ihme_only = graph_answer(ihme_graph(records), tuberculosis)
+    assert graph_answer(graph, tuberculosis) == ihme_only
+    assert result_rows(store.answer(tuberculosis, limit=None)) == ihme_only
+
+    malaria = analysis(diseases=["Malaria"], locations=["Europe"])
+    assert graph_answer(graph, malaria) == [(30.0,)]
+    assert result_rows(store.answer(malaria, limit=None)) == [(30.0,)]
@@ -0,0 +1,53 @@
+import pytest
+
+from matcher import PhraseMatcher, build_phrases
+from router import LLM, TEMPLATE, Router
+
+VOCABULARY = {
+    "diseases": {"malaria": "Malaria"},
+    "measures": {"deaths": "Deaths"},
+    "locations": {"europe": "Europe"},
+}
+
+
+def analysis(**fields) -> dict:
+    return {"diseases": [], "measures": [], "locations": [], "grouping": [], **fields}
+
+
+@pytest.fixture
+def router():
+    return Router(PhraseMatcher(build_phrases(VOCABULARY)), threshold=0.8)
+
+
+def test_confidence_at_the_threshold_takes_the_template_path(router):
+    # disease and location with nothing of the question covered: 0.45 + 0.15
+    decision = Router(router.matcher, threshold=0.6).route("xyzzy", analysis(diseases=["Malaria"], locations=["Europe"]))
+    assert decision["confidence"] == 0.6 and decision["path"] == TEMPLATE
+    decision = Router(router.matcher, threshold=0.601).route("xyzzy", analysis(diseases=["Malaria"], locations=["Europe"]))
+    assert decision["path"] == LLM
+
+
+def test_one_unexplained_word_tips_a_question_below_the_threshold(router):
+    found = analysis(diseases=["Malaria"], measures=["Deaths"])
+    covered = router.route("how many malaria deaths were there in 2010", found)
+    assert covered["confidence"] == 0.85 and covered["path"] == TEMPLATE
+    assert covered["signals"]["unmatched"] == []
+
+    uncovered = router.route("malaria deaths ravaging", found)
+    assert uncovered["signals"]["coverage"] == pytest.approx(2 / 3, abs=1e-3)
+    assert uncovered["confidence"] == 0.783 and uncovered["path"] == LLM
+    assert uncovered["signals"]["unmatched"] == ["ravaging"]
+
+
+def test_grouping_by_location_counts_as_a_location(router):
+    grouped = router.score("malaria deaths", analysis(diseases=["Malaria"], grouping=["location"]))
+    assert grouped["signals"]["location"] and grouped["confidence"] == 0.8
+
+
+def test_fallback_moves_the_count_to_the_template_path(router):
+    decision = router.route("malaria ravaging", analysis(diseases=["Malaria"]))
+    assert decision["path"] == LLM
+    router.fallback(decision, "model timed out")
+    assert decision["path"] == TEMPLATE and decision["fallback"] == "model timed out"
+    stats = router.stats()
+    assert (stats[TEMPLATE], stats[LLM], stats["fallbacks"], stats["template_rate"]) == (1, 0, 1, 1.0)
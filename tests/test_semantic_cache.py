@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from matcher import PhraseMatcher, build_phrases
+from semantic_cache import SemanticSparqlCache
+
+VOCABULARY = {
+    "diseases": {"covid": "COVID-19", "malaria": "Malaria"},
+    "locations": {"europe": "Europe", "africa": "Africa"},
+    "measures": {"deaths": "Deaths", "cases": "Prevalence"},
+    "gender": {"women": "Female", "men": "Male"},
+    "aggregation": {"total": "sum"},
+}
+
+SPARQL = "SELECT * WHERE { ?s ?p ?o }"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SemanticSparqlCache(str(tmp_path / "cache.sqlite"), threshold=0.9,
+                                matcher=PhraseMatcher(build_phrases(VOCABULARY)))
+    cache.store("covid deaths among women in europe", SPARQL, "bar")
+    return cache
+
+
+def test_exact_hit_ignores_case_and_punctuation(cache):
+    hit = cache.lookup("Covid deaths among women in Europe?")
+    assert hit["match"] == "exact" and hit["sparql"] == SPARQL
+
+
+def test_similar_hit_with_same_entities(cache):
+    hit = cache.lookup("covid deaths amongst women in europe")
+    assert hit["match"] == "similar" and hit["similarity"] >= 0.9
+
+
+@pytest.mark.parametrize("question", [
+    "covid deaths among men in europe",
+    "covid cases among women in europe",
+    "covid deaths among women in africa",
+    "covid deaths among women in europe 2020",
+])
+def test_similar_question_with_other_entities_misses(cache, question):
+    assert cache.lookup(question) is None
+
+
+def test_use_matcher_reindexes_entries(tmp_path):
+    cache = SemanticSparqlCache(str(tmp_path / "cache.sqlite"), threshold=0.9)
+    cache.store("covid deaths among women in europe", SPARQL, "bar")
+    assert cache.lookup("covid deaths among men in europe") is not None
+
+    cache.use_matcher(PhraseMatcher(build_phrases(VOCABULARY)))
+    assert cache.lookup("covid deaths among men in europe") is None
+
+
+def test_hits_are_written_in_batches(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite")
+    cache = SemanticSparqlCache(db_path, flush_every=3, flush_interval=3600)
+    cache.store("malaria deaths in africa", SPARQL, "bar")
+
+    def stored_hits():
+        with sqlite3.connect(db_path) as conn:
+            return conn.execute("SELECT hits FROM sparql_cache").fetchone()[0]
+
+    cache.lookup("malaria deaths in africa")
+    cache.lookup("malaria deaths in africa")
+    assert stored_hits() == 0
+
+    cache.lookup("malaria deaths in africa")
+    assert stored_hits() == 3
+
+    cache.lookup("malaria deaths in africa")
+    cache.flush()
+    assert stored_hits() == 4
+
+
+def test_llm_query_opens_its_cache_on_first_use(tmp_path):
+    db_path = tmp_path / "sparql_cache.sqlite"
+    script = """
+import os, llm_query
+from matcher import PhraseMatcher
+assert not os.path.exists(os.environ["SPARQL_CACHE_DB"])
+matcher = PhraseMatcher({})
+llm_query.use_matcher(matcher)
+assert llm_query.get_sparql_cache().matcher is matcher
+assert os.path.exists(os.environ["SPARQL_CACHE_DB"])
+"""
+    env = {**os.environ, "SPARQL_CACHE_DB": str(db_path), "PYTHONPATH": os.pathsep.join(sys.path)}
+    subprocess.run([sys.executable, "-c", script], env=env, check=True)
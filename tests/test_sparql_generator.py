@@ -0,0 +1,50 @@
+import pytest
+
+from main import SPARQLGenerator
+from sparql_planner import CardinalityStats, SparqlPlanner
+
+from tests.helpers import ihme_frame, ihme_graph, result_rows, run_sparql
+
+
+def analysis(**fields) -> dict:
+    base = {"diseases": [], "locations": [], "measures": [], "time_period": None, "grouping": [],
+            "aggregation": None, "visualization": "table"}
+    return {**base, **fields}
+
+
+QUESTIONS = [
+    analysis(diseases=["Tuberculosis"], measures=["Deaths"], locations=["Europe"], time_period="2011"),
+    analysis(diseases=["Tuberculosis", "HIV/AIDS"], locations=["Africa"], time_period="2010"),
+    analysis(diseases=["HIV/AIDS"], locations=["Europe", "Global", "Africa"], measures=["Deaths", "Prevalence"]),
+    analysis(diseases=["Tuberculosis"], aggregation="sum", time_period="2012"),
+    analysis(diseases=["Tuberculosis", "HIV/AIDS"], measures=["Deaths"], aggregation="sum"),
+    analysis(diseases=["HIV/AIDS"], locations=["Europe", "Africa"], aggregation="avg", grouping=["sex"]),
+    analysis(diseases=["Tuberculosis"], locations=["Europe"], measures=["Prevalence"], aggregation="sum",
+             grouping=["location", "year"]),
+]
+
+
+@pytest.fixture(scope="module")
+def graph():
+    return ihme_graph(ihme_frame())
+
+
+@pytest.mark.parametrize("question", QUESTIONS, ids=repr)
+def test_legacy_templates_match_planner(graph, question):
+    planner = SPARQLGenerator(planner=SparqlPlanner(stats=CardinalityStats(data={}), encoding="literal"))
+    legacy = SPARQLGenerator(optimize=False)
+
+    planned_query, planned_visualization = planner.generate_query(question, None)
+    legacy_query, legacy_visualization = legacy.generate_query(question, None)
+
+    expected = result_rows(run_sparql(graph, planned_query))
+    assert expected
+    assert result_rows(run_sparql(graph, legacy_query)) == expected
+    assert legacy_visualization == planned_visualization
+
+
+def test_legacy_templates_use_every_entity(graph):
+    legacy = SPARQLGenerator(optimize=False)
+    query, _ = legacy.generate_query(analysis(diseases=["Tuberculosis", "HIV/AIDS"], aggregation="sum"), None)
+    causes = {row[0] for row in result_rows(run_sparql(graph, query))}
+    assert causes == {"Tuberculosis", "HIV/AIDS"}
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from bench_timeseries import pandas_trend
+from build_timeseries import METRICS, to_arrays, write
+from timeseries import TimeSeriesStore
+
+LOCATIONS = ["Global", "Spain", "Italy", "Americas"]
+DATES = pd.date_range("2020-01-22", "2021-02-10")
+
+
+@pytest.fixture(scope="module")
+def daily():
+    """ One row per location and day, the shape build_timeseries reads and the graph returns """
+    rng = np.random.default_rng(0)
+    frame = pd.MultiIndex.from_product([LOCATIONS, DATES], names=["location", "date"]).to_frame(index=False)
+    for metric in METRICS:
+        frame[metric] = rng.integers(0, 1000, len(frame))
+    return frame
+
+
+@pytest.fixture(scope="module")
+def store(daily, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("timeseries") / "timeseries.npz")
+    write(to_arrays(daily), path)
+    return TimeSeriesStore(path)
+
+
+@pytest.mark.parametrize("locations, metric, interval, window", [
+    (["Global"], "New cases", "month", None),
+    (["Spain"], "New deaths", "week", None),
+    (["Italy", "Spain"], "New cases", "day", 7),
+    (["Americas", "Global"], "Active", "month", None),
+    (["Spain"], "Confirmed", "week", None),
+    (["Italy"], "New recovered", "year", 14),
+], ids=repr)
+def test_trends_match_pandas(daily, store, locations, metric, interval, window):
+    _, values = store.trend(locations, metric, interval=interval, window=window)
+    assert np.allclose(values, pandas_trend(daily, locations, metric, interval, window))
+
+
+def trend(**fields) -> dict:
+    return {"query_type": "trend", "diseases": ["COVID-19"], "locations": ["Spain"], "measures": ["Deaths"], **fields}
+
+
+def test_yearly_answers_have_a_year_column(daily, store):
+    result = store.answer(trend(interval="year"))
+    assert result["head"]["vars"] == ["causeName", "location", "measure", "year", "value"]
+    years = [binding["year"]["value"] for binding in result["results"]["bindings"]]
+    assert years == ["2020", "2021"]
+    expected = pandas_trend(daily, ["Spain"], "New deaths", "year", None)[0]
+    assert [float(binding["value"]["value"]) for binding in result["results"]["bindings"]] == list(expected)
+
+
+def test_shorter_periods_have_a_date_column(store):
+    result = store.answer(trend(interval="month", time_period="2020"))
+    assert result["head"]["vars"] == ["causeName", "location", "measure", "date", "value"]
+    dates = [binding["date"]["value"] for binding in result["results"]["bindings"]]
+    assert dates[:2] == ["2020-01-01", "2020-02-01"] and len(dates) == 12
+
+
+def test_questions_outside_the_series_fall_back(store):
+    assert store.answer(trend(time_period="2019")) is None
+    assert store.answer(trend(locations=["Atlantis"])) is None
+    assert store.answer(trend(diseases=["Malaria"])) is None
@@ -0,0 +1,21 @@
+from build_vocabulary import VocabularyWriter
+from matcher import load_vocabulary
+
+
+def test_written_index_loads_back(tmp_path):
+    path = str(tmp_path / "vocabulary.tsv")
+    writer = VocabularyWriter()
+    writer.add_values("locations", ["Côte d'Ivoire", "Global"])
+    writer.add_values("diseases", ["Malaria"])
+    assert writer.write(path) == len(writer.entries())
+
+    vocabularies = load_vocabulary(path)
+    assert vocabularies["locations"]["côte d'ivoire"] == "Côte d'Ivoire"
+    assert vocabularies["locations"]["world"] == "Global"
+    assert vocabularies["diseases"]["malaria"] == "Malaria"
+
+
+def test_missing_or_empty_index_loads_as_nothing(tmp_path):
+    assert load_vocabulary(str(tmp_path / "missing.tsv")) == {}
+    (tmp_path / "empty.tsv").write_text("")
+    assert load_vocabulary(str(tmp_path / "empty.tsv")) == {}
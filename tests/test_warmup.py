@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import cache
+import main
+from cache import ResultCache, WarmCache
+from query_backends import QueryBackend
+
+RESULT = {"head": {"vars": ["value"]},
+          "results": {"bindings": [{"value": {"type": "literal", "value": "42.0"}}]}}
+
+
+class FixedBackend(QueryBackend):
+    name = "fixed"
+
+    def __init__(self):
+        self.queries = []
+
+    def run(self, analysis, sparql_query, limit=20, offset=0):
+        self.queries.append(sparql_query)
+        return RESULT
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = FixedBackend()
+    monkeypatch.setattr(main, "query_backend", backend)
+    monkeypatch.setattr(main, "result_cache", ResultCache())
+    monkeypatch.setattr(main, "warm_cache", WarmCache(str(tmp_path / "warm.sqlite"), ttl=3600))
+    return backend
+
+
+def slow_questions(count: int, seconds: float):
+    """ Template questions that take seconds each to produce, like reading a large history """
+    for i in range(count):
+        time.sleep(seconds)
+        yield f"tuberculosis deaths in europe in {2000 + i % 20}"
+
+
+def test_warm_up_stores_answers_once(backend):
+    questions = ["tuberculosis deaths in europe", "Tuberculosis deaths in Europe?", "hiv deaths in africa in 2011"]
+    stats = asyncio.run(main.warm_up(questions, batch_size=2))
+    assert stats == {"questions": 3, "queries": 2, "cached": 0, "skipped": 0, "errors": 0}
+    assert len(backend.queries) == 2
+
+    assert asyncio.run(main.warm_up(questions))["cached"] == 2
+    assert len(backend.queries) == 2
+
+
+def test_warm_up_does_not_stall_requests(backend):
+    async def scenario():
+        warm_up = asyncio.create_task(main.warm_up(slow_questions(200, 0.005), batch_size=16))
+        await asyncio.sleep(0.05)
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            response = await client.post("/ask", json={"question": "hiv prevalence in asia"})
+            latency = time.perf_counter() - start
+        finished_first = warm_up.done()
+        await warm_up
+        return response, latency, finished_first
+
+    response, latency, finished_first = asyncio.run(scenario())
+    assert response.status_code == 200 and response.json()["result"] == RESULT
+    assert not finished_first
+    assert latency < 0.5
+
+
+def test_warm_cache_entries_expire(tmp_path, monkeypatch):
+    warm = WarmCache(str(tmp_path / "warm.sqlite"), ttl=60)
+    warm.put("key", {"answer": 1})
+    assert "key" in warm and warm.get("key") == {"answer": 1}
+
+    now = time.time()
+    monkeypatch.setattr(cache.time, "time", lambda: now + 61)
+    assert "key" not in warm and warm.get("key") is None
+
+    forever = WarmCache(str(tmp_path / "warm.sqlite"))
+    assert forever.get("key") == {"answer": 1}